@@ -0,0 +1,51 @@
+"""Add change log
+
+Revision ID: 02344064353a
+Revises: a44a676ca269
+Create Date: 2025-10-14 11:27:40.918265
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "02344064353a"
+down_revision: Union[str, Sequence[str], None] = "a44a676ca269"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "change_log",
+        sa.Column("seq", sa.Integer(), primary_key=True),
+        sa.Column("entity", sa.String(16), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("operation", sa.String(8), nullable=False),
+        sa.Column("changed_at", sa.DateTime(timezone=True), nullable=False),
+        sqlite_autoincrement=True,
+    )
+    op.create_index(
+        "ix_change_log_entity", "change_log", ["entity", "entity_id", "seq"]
+    )
+    op.create_index("ix_change_log_changed_at", "change_log", ["changed_at"])
+    op.create_table(
+        "change_log_compactions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("compacted_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("horizon", sa.Integer(), nullable=False),
+        sa.Column("superseded", sa.Integer(), nullable=False),
+        sa.Column("expired", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("change_log_compactions")
+    op.drop_index("ix_change_log_changed_at", table_name="change_log")
+    op.drop_index("ix_change_log_entity", table_name="change_log")
+    op.drop_table("change_log")
@@ -0,0 +1,37 @@
+"""Drop activity name trigram index
+
+Revision ID: 5d0c2f9a71be
+Revises: 02344064353a
+Create Date: 2025-10-15 09:12:44.207615
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5d0c2f9a71be"
+down_revision: Union[str, Sequence[str], None] = "02344064353a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Названия видов деятельности ищутся по снимку дерева в памяти
+    # (database/tree.py); индекс только замедлял запись
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_activities_name_trgm")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_activities_name_trgm "
+        "ON activities USING gin (name gin_trgm_ops)"
+    )
@@ -0,0 +1,41 @@
+"""Add trigram name indexes
+
+Revision ID: 84146ba1c197
+Revises: fa701d0736fb
+Create Date: 2025-10-08 11:27:15.904117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "84146ba1c197"
+down_revision: Union[str, Sequence[str], None] = "fa701d0736fb"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # GIN gin_trgm_ops обслуживает ILIKE '%...%', который B-tree не умеет
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_organizations_name_trgm "
+        "ON organizations USING gin (name gin_trgm_ops)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_activities_name_trgm "
+        "ON activities USING gin (name gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_activities_name_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_organizations_name_trgm")
@@ -0,0 +1,82 @@
+"""Create initial schema
+
+Revision ID: 8b26e357482c
+Revises:
+Create Date: 2025-10-12 10:03:27.114502
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "8b26e357482c"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Таблицы раньше создавал create_all при импорте приложения; в базах,
+    # поднятых так, они уже есть. Колонки и таблицы, появившиеся позже
+    # (activities.level, activity_closure, api_keys), добавляют следующие миграции
+    if sa.inspect(op.get_bind()).has_table("organizations"):
+        return
+    op.create_table(
+        "buildings",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("address", sa.String()),
+        sa.Column("latitude", sa.Float()),
+        sa.Column("longitude", sa.Float()),
+    )
+    op.create_index("ix_buildings_id", "buildings", ["id"])
+    op.create_table(
+        "activities",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("parent_id", sa.Integer(), sa.ForeignKey("activities.id")),
+    )
+    op.create_index("ix_activities_id", "activities", ["id"])
+    op.create_index("ix_activities_name", "activities", ["name"])
+    op.create_table(
+        "organizations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("building_id", sa.Integer(), sa.ForeignKey("buildings.id")),
+    )
+    op.create_index("ix_organizations_id", "organizations", ["id"])
+    op.create_index("ix_organizations_name", "organizations", ["name"])
+    op.create_table(
+        "phone_numbers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("number", sa.String()),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organizations.id")),
+    )
+    op.create_index("ix_phone_numbers_id", "phone_numbers", ["id"])
+    op.create_table(
+        "organization_activity",
+        sa.Column(
+            "organization_id",
+            sa.Integer(),
+            sa.ForeignKey("organizations.id"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "activity_id",
+            sa.Integer(),
+            sa.ForeignKey("activities.id"),
+            primary_key=True,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("organization_activity")
+    op.drop_table("phone_numbers")
+    op.drop_table("organizations")
+    op.drop_table("activities")
+    op.drop_table("buildings")
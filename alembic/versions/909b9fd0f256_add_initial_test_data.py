@@ -1,43 +1,122 @@
 """Add initial test data
 
 Revision ID: 909b9fd0f256
-Revises: 
+Revises: 8b26e357482c
 Create Date: 2025-10-01 00:34:55.668821
 
 """
 
+import random
 from typing import Sequence, Union
-from sqlalchemy.orm import Session
-from database.models import Base
 from alembic import op
-from database import models
-from tests import utils
-from database.connection import get_db
 import sqlalchemy as sa
 
-
 # revision identifiers, used by Alembic.
 revision: str = "909b9fd0f256"
-down_revision: Union[str, Sequence[str], None] = None
+down_revision: Union[str, Sequence[str], None] = "8b26e357482c"
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
+# Набор задан здесь, а не через database.seed: миграция должна давать те же
+# строки, как бы ни менялся генератор приложения
+ACTIVITY_ROOTS = ["Еда", "Автомобили", "Строительство", "Образование", "Медицина"]
+ORGANIZATION_WORDS = ["Рога и Копыта", "Север", "Вектор", "Альфа", "Гранит"]
+STREETS = ["Ленина", "Блюхера", "Мира", "Гагарина", "Садовая"]
+BUILDINGS = 20
+ORGANIZATIONS = 100
+
+activities = sa.table(
+    "activities", sa.column("id"), sa.column("name"), sa.column("parent_id")
+)
+buildings = sa.table(
+    "buildings",
+    sa.column("id"),
+    sa.column("address"),
+    sa.column("latitude"),
+    sa.column("longitude"),
+)
+organizations = sa.table(
+    "organizations", sa.column("id"), sa.column("name"), sa.column("building_id")
+)
+phone_numbers = sa.table(
+    "phone_numbers", sa.column("number"), sa.column("organization_id")
+)
+organization_activity = sa.table(
+    "organization_activity", sa.column("organization_id"), sa.column("activity_id")
+)
+
 
 def upgrade() -> None:
     """Upgrade schema."""
-    bind = op.get_bind()
-    session = Session(bind=bind)
-
-    utils.create_test_organization(
-        session,
-        name="Organization 1",
-    )
-    utils.create_test_building(
-        session, address="Building 1 Address", latitude=1.0, longitude=1.0
+    # Небольшой связанный набор одной загрузкой. Уровни и замыкание дерева
+    # видов деятельности строит миграция fa701d0736fb по parent_id
+    rng = random.Random(42)
+    activity_rows = []
+    for root in ACTIVITY_ROOTS:
+        activity_rows.append(
+            {"id": len(activity_rows) + 1, "name": root, "parent_id": None}
+        )
+        parent_id = activity_rows[-1]["id"]
+        for child in range(1, 3):
+            activity_rows.append(
+                {
+                    "id": len(activity_rows) + 1,
+                    "name": f"{root} {child}",
+                    "parent_id": parent_id,
+                }
+            )
+            activity_rows.append(
+                {
+                    "id": len(activity_rows) + 1,
+                    "name": f"{root} {child}.1",
+                    "parent_id": activity_rows[-1]["id"],
+                }
+            )
+    op.bulk_insert(activities, activity_rows)
+    op.bulk_insert(
+        buildings,
+        [
+            {
+                "id": id,
+                "address": f"г. Москва, ул. {rng.choice(STREETS)}, "
+                f"д. {rng.randint(1, 200)}",
+                "latitude": round(rng.uniform(55.55, 55.95), 6),
+                "longitude": round(rng.uniform(37.35, 37.85), 6),
+            }
+            for id in range(1, BUILDINGS + 1)
+        ],
     )
-    utils.create_test_activity(session, name="Activity 1")
-
-    session.commit()
+    organization_rows, phone_rows, activity_links = [], [], []
+    for id in range(1, ORGANIZATIONS + 1):
+        organization_rows.append(
+            {
+                "id": id,
+                "name": f"ООО «{rng.choice(ORGANIZATION_WORDS)} {id}»",
+                "building_id": rng.randint(1, BUILDINGS),
+            }
+        )
+        for _ in range(rng.randint(1, 2)):
+            phone_rows.append(
+                {
+                    "number": f"+7 9{rng.randint(0, 99):02d} "
+                    f"{rng.randint(0, 999):03d}-{rng.randint(0, 9999):04d}",
+                    "organization_id": id,
+                }
+            )
+        for activity_id in sorted(
+            set(rng.choices(range(1, len(activity_rows) + 1), k=rng.randint(1, 3)))
+        ):
+            activity_links.append({"organization_id": id, "activity_id": activity_id})
+    op.bulk_insert(organizations, organization_rows)
+    op.bulk_insert(phone_numbers, phone_rows)
+    op.bulk_insert(organization_activity, activity_links)
+    if op.get_bind().dialect.name == "postgresql":
+        # id заданы явно: последовательности сдвигаются за максимум
+        for table in ("organizations", "buildings", "activities"):
+            op.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+            )
 
 
 def downgrade() -> None:
@@ -0,0 +1,72 @@
+"""Add organization counters
+
+Revision ID: 98b1bf9121f6
+Revises: acae6a725b02
+Create Date: 2025-10-12 10:41:07.316542
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "98b1bf9121f6"
+down_revision: Union[str, Sequence[str], None] = "acae6a725b02"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "building_stats",
+        sa.Column(
+            "building_id",
+            sa.Integer(),
+            sa.ForeignKey("buildings.id"),
+            primary_key=True,
+        ),
+        sa.Column("organizations", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_table(
+        "activity_stats",
+        sa.Column(
+            "activity_id",
+            sa.Integer(),
+            sa.ForeignKey("activities.id"),
+            primary_key=True,
+        ),
+        sa.Column("organizations", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "subtree_organizations", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+    # Начальные значения - те же подсчёты, что у database.counters.reconcile
+    op.execute(
+        "INSERT INTO building_stats (building_id, organizations) "
+        "SELECT building_id, COUNT(*) FROM organizations "
+        "WHERE building_id IS NOT NULL GROUP BY building_id"
+    )
+    op.execute(
+        "INSERT INTO activity_stats "
+        "(activity_id, organizations, subtree_organizations) "
+        "SELECT activities.id, "
+        "(SELECT COUNT(*) FROM organization_activity AS direct "
+        "WHERE direct.activity_id = activities.id), "
+        "(SELECT COUNT(DISTINCT subtree.organization_id) "
+        "FROM activity_closure JOIN organization_activity AS subtree "
+        "ON subtree.activity_id = activity_closure.descendant_id "
+        "WHERE activity_closure.ancestor_id = activities.id) "
+        "FROM activities WHERE EXISTS "
+        "(SELECT 1 FROM activity_closure JOIN organization_activity AS used "
+        "ON used.activity_id = activity_closure.descendant_id "
+        "WHERE activity_closure.ancestor_id = activities.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("activity_stats")
+    op.drop_table("building_stats")
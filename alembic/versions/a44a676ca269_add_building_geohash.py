@@ -0,0 +1,79 @@
+"""Add building geohash
+
+Revision ID: a44a676ca269
+Revises: 98b1bf9121f6
+Create Date: 2025-10-13 16:05:52.481930
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a44a676ca269"
+down_revision: Union[str, Sequence[str], None] = "98b1bf9121f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Должны совпадать с database.geo.GEOHASH_PRECISION и geo.geohash
+GEOHASH_PRECISION = 12
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def _geohash(latitude: float, longitude: float) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    code, bits, value, even = [], 0, 0, True
+    while len(code) < GEOHASH_PRECISION:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            code.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(code)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("buildings", sa.Column("geohash", sa.String(12), nullable=True))
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        # PostGIS установлен миграцией caf7176e10e6
+        op.execute(
+            "UPDATE buildings SET geohash = ST_GeoHash("
+            "ST_SetSRID(ST_MakePoint(longitude, latitude), 4326), "
+            f"{GEOHASH_PRECISION}) "
+            "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+        )
+    else:
+        # В SQLite нет функции geohash: значения считаются здесь
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, latitude, longitude FROM buildings "
+                "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+            )
+        ).all()
+        if rows:
+            bind.execute(
+                sa.text("UPDATE buildings SET geohash = :geohash WHERE id = :id"),
+                [
+                    {"id": id, "geohash": _geohash(latitude, longitude)}
+                    for id, latitude, longitude in rows
+                ],
+            )
+    op.create_index("ix_buildings_geohash", "buildings", ["geohash"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_buildings_geohash", table_name="buildings")
+    op.drop_column("buildings", "geohash")
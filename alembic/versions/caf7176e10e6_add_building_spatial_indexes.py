@@ -0,0 +1,41 @@
+"""Add building spatial indexes
+
+Revision ID: caf7176e10e6
+Revises: 909b9fd0f256
+Create Date: 2025-10-05 12:10:41.218304
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "caf7176e10e6"
+down_revision: Union[str, Sequence[str], None] = "909b9fd0f256"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_buildings_lat_lon "
+        "ON buildings (latitude, longitude)"
+    )
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    # Выражение должно совпадать с database.geo.location_expression
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_buildings_location ON buildings "
+        "USING gist (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_buildings_location")
+    op.execute("DROP INDEX IF EXISTS ix_buildings_lat_lon")
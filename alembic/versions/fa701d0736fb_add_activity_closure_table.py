@@ -0,0 +1,82 @@
+"""Add activity closure table
+
+Revision ID: fa701d0736fb
+Revises: caf7176e10e6
+Create Date: 2025-10-06 18:42:03.551820
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "fa701d0736fb"
+down_revision: Union[str, Sequence[str], None] = "caf7176e10e6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("activities")}
+    if "level" not in columns:
+        op.add_column(
+            "activities",
+            sa.Column("level", sa.Integer(), nullable=False, server_default="1"),
+        )
+    if not inspector.has_table("activity_closure"):
+        op.create_table(
+            "activity_closure",
+            sa.Column(
+                "ancestor_id",
+                sa.Integer(),
+                sa.ForeignKey("activities.id"),
+                primary_key=True,
+            ),
+            sa.Column(
+                "descendant_id",
+                sa.Integer(),
+                sa.ForeignKey("activities.id"),
+                primary_key=True,
+            ),
+            sa.Column("depth", sa.Integer(), nullable=False),
+        )
+        op.create_index(
+            "ix_activity_closure_descendant",
+            "activity_closure",
+            ["descendant_id", "depth"],
+        )
+
+    # Заполняем замыкание и уровни по уже существующему дереву
+    op.execute("DELETE FROM activity_closure")
+    op.execute(
+        """
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM activities
+            UNION ALL
+            SELECT tree.ancestor_id, activities.id, tree.depth + 1
+            FROM tree JOIN activities ON activities.parent_id = tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """
+    )
+    op.execute(
+        """
+        UPDATE activities SET level = (
+            SELECT MAX(depth) + 1 FROM activity_closure
+            WHERE activity_closure.descendant_id = activities.id
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_activity_closure_descendant", table_name="activity_closure")
+    op.drop_table("activity_closure")
+    op.drop_column("activities", "level")
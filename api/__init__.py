@@ -1,11 +1,13 @@
 from fastapi import FastAPI
-from routers import organizations, buildings, activities
+from api.routers import organizations, buildings, activities, changes, monitoring
 routers = []
 
 def register_routers(app: FastAPI):
     routers.append(organizations.router)
     routers.append(buildings.router)
     routers.append(activities.router) 
+    routers.append(changes.router)
+    routers.append(monitoring.router)
 
     for router in routers:
         app.include_router(router)
@@ -0,0 +1,31 @@
+from typing import List, Type
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel
+
+from api import fieldsets
+from config import settings
+from database import schemas
+
+
+async def respond(
+    repo,
+    batch: schemas.BatchRequest,
+    schema: Type[BaseModel],
+    method: str = "get_many",
+) -> Response:
+    """Записи по batch.ids в порядке запроса: один IN запрос на все id,
+    связи организаций - по запросу на связь для всей пачки.
+
+    method - метод репозитория, который возвращает {id: запись}.
+    """
+    if len(batch.ids) > settings.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Не больше {settings.BATCH_MAX_IDS} id за запрос",
+        )
+    found = await getattr(repo, method)(ids=batch.ids)
+    return fieldsets.render(
+        List[schemas.BatchItem[schema]],
+        [{"id": id, "found": id in found, "item": found.get(id)} for id in batch.ids],
+    )
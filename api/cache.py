@@ -0,0 +1,540 @@
+import base64
+import hashlib
+import inspect
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from threading import Lock
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+
+from api.repositories import events
+from config import settings
+
+# Теги записей кэша. Запись помечается сущностями, которые в неё попали
+# (organization:5, building:3, activity:7), и "областями" - выборками, состав
+# которых меняется при создании новых строк. Запись сбрасывается, если
+# изменилась любая из её сущностей или областей.
+ORGANIZATION_PAGES = "organizations:pages"
+ORGANIZATION_SEARCH = "organizations:search"
+BUILDING_PAGES = "buildings:pages"
+# Кластеры карты: число зданий и организаций в ячейках
+BUILDING_CLUSTERS = "buildings:clusters"
+ACTIVITY_PAGES = "activities:pages"
+
+
+def organization_tag(id: int) -> str:
+    return f"organization:{id}"
+
+
+def building_tag(id: int) -> str:
+    return f"building:{id}"
+
+
+def activity_tag(id: int) -> str:
+    return f"activity:{id}"
+
+
+def building_organizations_tag(building_id: int) -> str:
+    return f"organizations:building:{building_id}"
+
+
+def activity_organizations_tag(activity_id: int) -> str:
+    return f"organizations:activity:{activity_id}"
+
+
+def activity_tree_tag(id: int) -> str:
+    return f"activities:tree:{id}"
+
+
+def _as_list(payload) -> list:
+    return payload if isinstance(payload, list) else [payload]
+
+
+def organization_tags(payload) -> Set[str]:
+    tags = set()
+    for organization in _as_list(payload):
+        tags.add(organization_tag(organization.id))
+        # При fields= в ответе может не быть связей: теги только по тому, что есть
+        building = getattr(organization, "building", None)
+        building_id = getattr(organization, "building_id", None)
+        if building is not None or building_id is not None:
+            tags.add(building_tag(building_id or building.id))
+        tags.update(
+            activity_tag(activity.id)
+            for activity in getattr(organization, "activities", ())
+        )
+    return tags
+
+
+def building_tags(payload) -> Set[str]:
+    return {building_tag(building.id) for building in _as_list(payload)}
+
+
+def activity_tags(payload) -> Set[str]:
+    return {activity_tag(activity.id) for activity in _as_list(payload)}
+
+
+def activity_tree_tags(payload) -> Set[str]:
+    return activity_tags(payload) | {
+        activity_tree_tag(activity.id) for activity in _as_list(payload)
+    }
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    body: bytes
+    etag: str
+    last_modified: float
+    headers: Tuple[Tuple[str, str], ...] = ()
+    tags: FrozenSet[str] = field(default_factory=frozenset)
+
+    def encode(self) -> bytes:
+        return json.dumps(
+            {
+                "body": base64.b64encode(self.body).decode(),
+                "etag": self.etag,
+                "last_modified": self.last_modified,
+                "headers": self.headers,
+                "tags": sorted(self.tags),
+            }
+        ).encode()
+
+    @classmethod
+    def decode(cls, raw: bytes) -> "CacheEntry":
+        data = json.loads(raw)
+        return cls(
+            body=base64.b64decode(data["body"]),
+            etag=data["etag"],
+            last_modified=data["last_modified"],
+            headers=tuple(tuple(header) for header in data["headers"]),
+            tags=frozenset(data["tags"]),
+        )
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def invalidate(self, tags: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return None
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        pass
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """LRU в памяти процесса с ограничением по числу записей и времени жизни."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, CacheEntry]]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            for tag in entry.tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _drop(self, key: str) -> None:
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        for tag in item[1].tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+class LocalKeyValueStore:
+    """Замена redis для разработки и тестов: то же подмножество команд."""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[Optional[float], Any]] = {}
+        self._lock = Lock()
+
+    def _alive(self, name: str):
+        item = self._values.get(name)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._values[name]
+            return None
+        return value
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            return self._alive(name)
+
+    def set(self, name: str, value: bytes, ex: Optional[int] = None) -> None:
+        with self._lock:
+            expires_at = time.monotonic() + ex if ex else None
+            self._values[name] = (expires_at, value)
+
+    def delete(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._values.pop(name, None)
+
+    def sadd(self, name: str, *values: str) -> None:
+        with self._lock:
+            members = self._alive(name)
+            if members is None:
+                members = set()
+                self._values[name] = (None, members)
+            members.update(values)
+
+    def smembers(self, name: str) -> Set[str]:
+        with self._lock:
+            return set(self._alive(name) or ())
+
+    def expire(self, name: str, seconds: int) -> None:
+        with self._lock:
+            if self._alive(name) is not None:
+                self._values[name] = (time.monotonic() + seconds, self._values[name][1])
+
+    def scan_iter(self, match: str):
+        prefix = match.rstrip("*")
+        with self._lock:
+            names = [name for name in self._values if name.startswith(prefix)]
+        return iter(names)
+
+
+class SharedCache(CacheBackend):
+    """Кэш во внешнем хранилище, общий для всех процессов и реплик.
+
+    Записи и множества ключей по тегам хранятся в redis (или совместимом
+    клиенте), поэтому сброс по тегу на одной реплике виден остальным.
+    """
+
+    def __init__(self, client, ttl: int = 60, prefix: str = "response-cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: Optional[str], ttl: int = 60) -> "SharedCache":
+        if not url:
+            return cls(LocalKeyValueStore(), ttl=ttl)
+        try:
+            import redis
+        except ImportError as error:
+            raise RuntimeError(
+                "Для CACHE_BACKEND=shared с CACHE_URL установите пакет redis"
+            ) from error
+        return cls(redis.Redis.from_url(url), ttl=ttl)
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.prefix}entry:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raw = self.client.get(self._entry_key(key))
+        return CacheEntry.decode(raw) if raw is not None else None
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        self.client.set(self._entry_key(key), entry.encode(), ex=self.ttl)
+        for tag in entry.tags:
+            self.client.sadd(self._tag_key(tag), key)
+            self.client.expire(self._tag_key(tag), self.ttl)
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            keys = [
+                self._entry_key(key.decode() if isinstance(key, bytes) else key)
+                for key in self.client.smembers(tag_key)
+            ]
+            self.client.delete(*keys, tag_key)
+
+    def clear(self) -> None:
+        names = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if names:
+            self.client.delete(*names)
+
+
+def create_backend() -> CacheBackend:
+    if settings.CACHE_BACKEND == "none":
+        return NullCache()
+    if settings.CACHE_BACKEND == "shared":
+        return SharedCache.from_url(settings.CACHE_URL, ttl=settings.CACHE_TTL)
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCache(
+            max_entries=settings.CACHE_MAX_ENTRIES, ttl=settings.CACHE_TTL
+        )
+    raise ValueError(f"Неизвестный CACHE_BACKEND: {settings.CACHE_BACKEND}")
+
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+# Заголовки ответа, которые обработчик может выставить и которые хранятся в кэше
+_STORED_HEADERS = {"x-next-cursor"}
+
+
+def _adapter(model) -> TypeAdapter:
+    adapter = _adapters.get(model)
+    if adapter is None:
+        adapter = _adapters[model] = TypeAdapter(model)
+    return adapter
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def etag_response(request: Request, body: bytes, etag: str) -> Response:
+    """JSON ответ с готовым ETag и 304 по If-None-Match, без кэша ответов:
+    для данных, которые и так лежат в памяти уже сериализованными."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _not_modified(request: Request, entry: CacheEntry) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, entry.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(entry.last_modified) <= since
+    return False
+
+
+class ResponseCache:
+    """Кэш сериализованных ответов GET с ETag/Last-Modified и сбросом по тегам."""
+
+    def __init__(self, backend: CacheBackend, replica_lag: float = 0.0):
+        self.backend = backend
+        # GET читают с реплик: сразу после изменения реплика может его ещё
+        # не видеть, и прочитанный с неё ответ нельзя сохранять под новым
+        # поколением - он отдавался бы до следующего изменения
+        self.replica_lag = replica_lag
+        self._generation = 0
+        self._invalidated_at = float("-inf")
+
+    def invalidate(self, *tags: str) -> None:
+        self._generation += 1
+        self._invalidated_at = time.monotonic()
+        self.backend.invalidate(tags)
+
+    @staticmethod
+    def key(request: Request) -> str:
+        query = "&".join(sorted(request.url.query.split("&")))
+        return f"{request.url.path}?{query}"
+
+    async def respond(
+        self,
+        request: Request,
+        model,
+        load: Callable[[Response], Any],
+        tags: Callable[[Any], Iterable[str]],
+        scope: Iterable[str] = (),
+        key: Optional[str] = None,
+    ) -> Response:
+        """Ответ из кэша или через load(response) с последующим сохранением.
+
+        load получает Response, в который может выставить заголовки
+        (например, X-Next-Cursor), и возвращает ORM объекты для model.
+        key заменяет ключ из URL, если разные запросы дают один ответ.
+        """
+        key = key or self.key(request)
+        entry = self.backend.get(key)
+        if entry is None:
+            generation = self._generation
+            lagging = time.monotonic() - self._invalidated_at < self.replica_lag
+            collected = Response()
+            result = load(collected)
+            if inspect.isawaitable(result):
+                result = await result
+            adapter = _adapter(model)
+            validated = adapter.validate_python(result, from_attributes=True)
+            body = adapter.dump_json(validated)
+            entry = CacheEntry(
+                body=body,
+                etag=_etag(body),
+                last_modified=time.time(),
+                headers=tuple(
+                    (name, value)
+                    for name, value in collected.headers.items()
+                    if name in _STORED_HEADERS
+                ),
+                tags=frozenset(tags(validated)) | frozenset(scope),
+            )
+            # Если за время загрузки были изменения, ответ мог устареть
+            if generation == self._generation and not lagging:
+                self.backend.set(key, entry)
+        return self._response(request, entry)
+
+    @staticmethod
+    def _response(request: Request, entry: CacheEntry) -> Response:
+        headers = {
+            "ETag": entry.etag,
+            "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+            **dict(entry.headers),
+        }
+        if _not_modified(request, entry):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(
+    create_backend(),
+    replica_lag=settings.CACHE_REPLICA_LAG if settings.REPLICA_URLS else 0.0,
+)
+
+
+@events.listens_for(events.ORGANIZATION_CREATED)
+def _on_organization_created(building_id: int, **_):
+    response_cache.invalidate(
+        ORGANIZATION_PAGES,
+        ORGANIZATION_SEARCH,
+        BUILDING_CLUSTERS,
+        building_organizations_tag(building_id),
+    )
+
+
+@events.listens_for(events.ORGANIZATION_UPDATED)
+def _on_organization_updated(
+    id: int,
+    name: str,
+    building_id: int,
+    previous_name: str,
+    previous_building_id: int,
+    **_,
+):
+    tags = [organization_tag(id)]
+    if name != previous_name:
+        tags.append(ORGANIZATION_SEARCH)
+    if building_id != previous_building_id:
+        tags.append(building_organizations_tag(previous_building_id))
+        tags.append(building_organizations_tag(building_id))
+        tags.append(BUILDING_CLUSTERS)
+    response_cache.invalidate(*tags)
+
+
+@events.listens_for(events.ORGANIZATION_DELETED)
+def _on_organization_deleted(id: int, **_):
+    # Удаление сдвигает страницы, запрошенные через skip
+    response_cache.invalidate(
+        organization_tag(id), ORGANIZATION_PAGES, BUILDING_CLUSTERS
+    )
+
+
+@events.listens_for(events.BUILDING_CREATED)
+def _on_building_created(**_):
+    response_cache.invalidate(BUILDING_PAGES, BUILDING_CLUSTERS)
+
+
+@events.listens_for(events.ACTIVITY_CREATED)
+def _on_activity_created(parent_id: Optional[int], **_):
+    tags = [ACTIVITY_PAGES]
+    if parent_id is not None:
+        # Поддеревья, в которые входит родитель, получили новый узел
+        tags.append(activity_tree_tag(parent_id))
+    response_cache.invalidate(*tags)
+
+
+@events.listens_for(events.ORGANIZATIONS_IMPORTED)
+def _on_organizations_imported(organizations, activity_ids=(), **_):
+    response_cache.invalidate(
+        ORGANIZATION_PAGES,
+        ORGANIZATION_SEARCH,
+        BUILDING_CLUSTERS,
+        *{
+            building_organizations_tag(building_id)
+            for _, _, building_id in organizations
+        },
+        *(activity_organizations_tag(id) for id in activity_ids),
+    )
+
+
+@events.listens_for(events.BUILDINGS_IMPORTED)
+def _on_buildings_imported(**_):
+    response_cache.invalidate(BUILDING_PAGES, BUILDING_CLUSTERS)
+
+
+@events.listens_for(events.ACTIVITIES_IMPORTED)
+def _on_activities_imported(activities, **_):
+    response_cache.invalidate(
+        ACTIVITY_PAGES,
+        *{
+            activity_tree_tag(parent_id)
+            for _, _, parent_id in activities
+            if parent_id is not None
+        },
+    )
@@ -0,0 +1,92 @@
+import csv
+import io
+from typing import Callable, Iterator, List, Literal, Optional, Type
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from api.importers import LIST_SEPARATOR
+from api.repositories.crud_resquests import BaseRepository
+from config import settings
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# Колонки CSV совпадают с колонками загрузки, плюс id и вложенные поля
+ORGANIZATION_COLUMNS = [
+    "id",
+    "name",
+    "building_id",
+    "address",
+    "latitude",
+    "longitude",
+    "phone_numbers",
+    "activity_ids",
+]
+BUILDING_COLUMNS = ["id", "address", "latitude", "longitude"]
+ACTIVITY_COLUMNS = ["id", "name", "parent_id", "level"]
+
+
+def _join(values) -> str:
+    return LIST_SEPARATOR.join(str(value) for value in values)
+
+
+def organization_row(item: dict) -> list:
+    building = item["building"]
+    return [
+        item["id"],
+        item["name"],
+        item["building_id"],
+        building["address"],
+        building["latitude"],
+        building["longitude"],
+        _join(phone["number"] for phone in item["phone_numbers"]),
+        _join(activity["id"] for activity in item["activities"]),
+    ]
+
+
+def _chunks(
+    repo: BaseRepository,
+    schema: Type[BaseModel],
+    format: ExportFormat,
+    columns: List[str],
+    to_row: Optional[Callable[[dict], list]],
+) -> Iterator[bytes]:
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue().encode()
+    for batch in repo.stream(settings.EXPORT_BATCH_SIZE):
+        items = [schema.model_validate(obj, from_attributes=True) for obj in batch]
+        if format == "ndjson":
+            yield "".join(item.model_dump_json() + "\n" for item in items).encode()
+            continue
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for item in items:
+            data = item.model_dump()
+            writer.writerow(
+                to_row(data) if to_row else [data[column] for column in columns]
+            )
+        yield buffer.getvalue().encode()
+
+
+def export_response(
+    repo: BaseRepository,
+    schema: Type[BaseModel],
+    format: ExportFormat,
+    columns: List[str],
+    to_row: Optional[Callable[[dict], list]] = None,
+) -> StreamingResponse:
+    """Потоковая выгрузка всех записей в NDJSON или CSV.
+
+    Генератор синхронный: Starlette выполняет его в пуле потоков, пачка
+    за пачкой, и отправляет клиенту каждую пачку сразу после сериализации.
+    """
+    return StreamingResponse(
+        _chunks(repo, schema, format, columns, to_row),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="export.{format}"'},
+    )
@@ -0,0 +1,101 @@
+from functools import lru_cache
+from typing import Callable, FrozenSet, List, Optional, Type, get_args, get_origin
+
+from fastapi import HTTPException, Query, Response, status
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+
+# id нужен всегда: по нему строятся курсор, теги кэша и связи страницы
+REQUIRED_FIELDS = frozenset({"id"})
+
+
+def relations(schema: Type[BaseModel]) -> FrozenSet[str]:
+    """Поля-связи схемы: вложенная схема или список вложенных схем."""
+    names = set()
+    for name, field in schema.model_fields.items():
+        annotation = field.annotation
+        if get_origin(annotation) in (list, List):
+            annotation = get_args(annotation)[0]
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            names.add(name)
+    return frozenset(names)
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema: Type[BaseModel], names: FrozenSet[str]) -> Type[BaseModel]:
+    """Схема ответа только с полями names, в порядке полей исходной схемы."""
+    if names >= schema.model_fields.keys():
+        return schema
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (field.annotation, field)
+            for name, field in schema.model_fields.items()
+            if name in names
+        },
+    )
+
+
+def _split(value: Optional[str]) -> FrozenSet[str]:
+    if not value:
+        return frozenset()
+    return frozenset(name.strip() for name in value.split(",") if name.strip())
+
+
+def select_fields(
+    schema: Type[BaseModel], fields: Optional[str], include: Optional[str]
+) -> Type[BaseModel]:
+    """Схема ответа по параметрам fields и include.
+
+    fields - поля верхнего уровня (id добавляется всегда), include - связи.
+    Если задан только include, возвращаются все простые поля и эти связи;
+    без обоих параметров - полная схема.
+    """
+    if fields is None and include is None:
+        return schema
+    requested, included = _split(fields), _split(include)
+    unknown = (requested | included) - schema.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестные поля: {', '.join(sorted(unknown))}",
+        )
+    nested = relations(schema)
+    if included - nested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="include принимает только связи: " + ", ".join(sorted(nested)),
+        )
+    if fields is None:
+        requested = schema.model_fields.keys() - nested
+    return sparse_schema(schema, frozenset(requested | included | REQUIRED_FIELDS))
+
+
+def fieldset(schema: Type[BaseModel]) -> Callable[..., Type[BaseModel]]:
+    """Зависимость, возвращающая схему ответа по fields/include запроса."""
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None, title="Поля ответа через запятую, например id,name"
+        ),
+        include: Optional[str] = Query(
+            None, title="Связи ответа через запятую, например building"
+        ),
+    ) -> Type[BaseModel]:
+        return select_fields(schema, fields, include)
+
+    return dependency
+
+
+@lru_cache(maxsize=256)
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def render(model, payload) -> Response:
+    """JSON ответ по схеме model для эндпоинтов без кэша ответов."""
+    adapter = _adapter(model)
+    return Response(
+        adapter.dump_json(adapter.validate_python(payload, from_attributes=True)),
+        media_type="application/json",
+    )
@@ -0,0 +1,175 @@
+import codecs
+import csv
+import json
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from fastapi import HTTPException, Query, Request
+from pydantic import BaseModel, ValidationError
+
+from config import settings
+from database import schemas
+
+ImportFormat = Literal["ndjson", "csv"]
+
+# Колонки CSV со списками: значения внутри ячейки разделяются ";"
+LIST_SEPARATOR = ";"
+
+
+def import_format(
+    request: Request,
+    format: Optional[ImportFormat] = Query(
+        None, title="ndjson или csv, по умолчанию - по Content-Type"
+    ),
+) -> ImportFormat:
+    if format is not None:
+        return format
+    content_type = request.headers.get("content-type", "")
+    return "csv" if "csv" in content_type else "ndjson"
+
+
+async def read_lines(request: Request) -> AsyncIterator[Tuple[int, str]]:
+    """Строки тела запроса с номерами, без чтения всего тела в память."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, number = "", 0
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            number += 1
+            yield number, line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield number + 1, buffer
+
+
+async def ndjson_rows(lines: AsyncIterator[Tuple[int, str]]):
+    async for number, line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as error:
+            yield number, error
+
+
+async def csv_rows(lines: AsyncIterator[Tuple[int, str]]):
+    """Записи CSV по заголовку; запись в кавычках может занимать несколько строк."""
+    header = None
+    record, start = "", 0
+    async for number, line in lines:
+        if not record:
+            start = number
+        record += line
+        if record.count('"') % 2:
+            continue
+        values, record = next(csv.reader([record])), ""
+        if not any(values):
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+        elif len(values) != len(header):
+            yield start, ValueError(
+                f"Ожидалось колонок: {len(header)}, получено: {len(values)}"
+            )
+        else:
+            yield start, {
+                name: value for name, value in zip(header, values) if value != ""
+            }
+    if record:
+        yield start, ValueError("Незакрытые кавычки в последней записи")
+
+
+def _split(value):
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+    return value
+
+
+def organization_from_csv(data: dict) -> dict:
+    if "phone_numbers" in data:
+        data["phone_numbers"] = [
+            {"number": number} for number in _split(data["phone_numbers"])
+        ]
+    if "activity_ids" in data:
+        data["activity_ids"] = _split(data["activity_ids"])
+    return data
+
+
+async def run_import(
+    request: Request,
+    format: ImportFormat,
+    schema: Type[BaseModel],
+    insert_batch: Callable[[List[BaseModel]], Awaitable[List]],
+    from_csv: Callable[[dict], dict] = lambda data: data,
+) -> schemas.ImportReport:
+    """Читает тело потоком, проверяет строки и пишет их пачками.
+
+    insert_batch получает проверенные строки пачки и возвращает для каждой
+    id созданной записи или текст ошибки. Ошибки одной строки не прерывают
+    загрузку; в отчёт попадают первые IMPORT_MAX_ERRORS из них.
+    """
+    report = schemas.ImportReport()
+
+    def fail(number: int, error: str):
+        report.failed += 1
+        if len(report.errors) < settings.IMPORT_MAX_ERRORS:
+            report.errors.append(schemas.ImportRowError(row=number, error=error))
+        else:
+            report.errors_truncated = True
+
+    batch: List[BaseModel] = []
+    numbers: List[int] = []
+
+    async def flush():
+        results = await insert_batch(batch)
+        for number, result in zip(numbers, results):
+            if isinstance(result, str):
+                fail(number, result)
+            else:
+                report.inserted += 1
+        batch.clear()
+        numbers.clear()
+
+    lines = read_lines(request)
+    rows = csv_rows(lines) if format == "csv" else ndjson_rows(lines)
+    async for number, data in rows:
+        report.processed += 1
+        if isinstance(data, Exception):
+            fail(number, str(data))
+            continue
+        try:
+            if format == "csv":
+                data = from_csv(data)
+            batch.append(schema.model_validate(data))
+        except (ValidationError, ValueError, TypeError) as error:
+            fail(number, _describe(error))
+            continue
+        numbers.append(number)
+        if len(batch) >= settings.IMPORT_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    if report.processed == 0:
+        raise HTTPException(status_code=400, detail="Файл не содержит строк")
+    # Ошибки записи приходят после ошибок проверки из той же пачки
+    report.errors.sort(key=lambda error: error.row)
+    return report
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            ": ".join(filter(None, [".".join(map(str, item["loc"])), item["msg"]]))
+            for item in error.errors()
+        )
+    return str(error)
@@ -0,0 +1,217 @@
+import time
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database import pool
+from database.pool import Histogram
+
+# Границы корзин, секунды / штуки
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Запросы без подходящего маршрута сводятся к одной метке, чтобы
+# случайные пути не раздували число временных рядов
+UNMATCHED_ROUTE = "unmatched"
+# SQL вне HTTP-запроса: миграции, фоновые задачи
+NO_ROUTE = "none"
+
+
+class LabeledHistogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str],
+        buckets,
+        series: Optional[Dict[Tuple[str, ...], Histogram]] = None,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = buckets
+        self._series = series if series is not None else {}
+        self._lock = Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        histogram = self._series.get(labels)
+        if histogram is None:
+            with self._lock:
+                histogram = self._series.setdefault(labels, Histogram(self.buckets))
+        histogram.observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, histogram in sorted(self._series.items()):
+            labels = dict(zip(self.labels, values))
+            cumulative = histogram.cumulative()
+            for bound, count in zip(histogram.buckets, cumulative):
+                lines.append(
+                    f"{self.name}_bucket{_labels(labels, le=_number(bound))} {count}"
+                )
+            lines.append(
+                f'{self.name}_bucket{_labels(labels, le="+Inf")} {cumulative[-1]}'
+            )
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(histogram.sum)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {histogram.count}")
+        return lines
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict, **extra) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in items.items()) + "}"
+
+
+request_duration = LabeledHistogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ("method", "route", "status"),
+    LATENCY_BUCKETS,
+)
+request_sql_duration = LabeledHistogram(
+    "http_request_sql_duration_seconds",
+    "Суммарное время SQL за один HTTP-запрос",
+    ("method", "route"),
+    LATENCY_BUCKETS,
+)
+request_sql_statements = LabeledHistogram(
+    "http_request_sql_statements",
+    "Число SQL-запросов за один HTTP-запрос",
+    ("method", "route"),
+    STATEMENT_COUNT_BUCKETS,
+)
+statement_duration = LabeledHistogram(
+    "db_statement_duration_seconds",
+    "Время выполнения одного SQL-запроса по маршруту, который его вызвал",
+    ("route",),
+    STATEMENT_BUCKETS,
+)
+
+
+class _RequestStats:
+    __slots__ = ("statements",)
+
+    def __init__(self):
+        # Длительности SQL-запросов; маршрут известен только после роутинга,
+        # поэтому в гистограмму они попадают в конце запроса
+        self.statements: List[float] = []
+
+
+# Контекст копируется в пул потоков и в greenlet AsyncSession.run_sync,
+# поэтому SQL из репозиториев попадает в статистику своего запроса
+_current: ContextVar[Optional[_RequestStats]] = ContextVar(
+    "metrics_request", default=None
+)
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE) if route else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI middleware: время запроса по шаблону маршрута и коду ответа,
+    плюс число и время SQL-запросов, выполненных при его обработке."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = _RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            method, route = scope["method"], _route(scope)
+            request_duration.observe((method, route, str(status)), elapsed)
+            request_sql_statements.observe((method, route), len(stats.statements))
+            request_sql_duration.observe((method, route), sum(stats.statements))
+            for duration in stats.statements:
+                statement_duration.observe((route,), duration)
+
+
+def instrument(engine: Engine) -> None:
+    """Замер SQL-запросов engine (для async - sync_engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        stats = _current.get()
+        if stats is not None:
+            stats.statements.append(elapsed)
+        else:
+            statement_duration.observe((NO_ROUTE,), elapsed)
+
+
+def _pool_lines() -> List[str]:
+    gauges = ("checked_out", "checked_in", "overflow", "size")
+    counters = ("checkouts", "timeouts", "opened", "closed", "invalidated")
+    snapshots = [pool_metrics.snapshot() for pool_metrics in pool.pools.values()]
+    lines = []
+    for name in gauges:
+        lines.append(f"# TYPE db_pool_{name} gauge")
+        for snapshot in snapshots:
+            if name in snapshot:
+                labels = _labels({"pool": snapshot["name"]})
+                lines.append(f"db_pool_{name}{labels} {snapshot[name]}")
+    for name in counters:
+        lines.append(f"# TYPE db_pool_{name}_total counter")
+        for snapshot in snapshots:
+            labels = _labels({"pool": snapshot["name"]})
+            lines.append(f"db_pool_{name}_total{labels} {snapshot[name]}")
+    wait = LabeledHistogram(
+        "db_pool_wait_seconds",
+        "Ожидание свободного соединения в пуле",
+        ("pool",),
+        pool.WAIT_BUCKETS,
+        series={
+            (name,): pool_metrics.wait for name, pool_metrics in pool.pools.items()
+        },
+    )
+    return lines + wait.render()
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    for histogram in (
+        request_duration,
+        request_sql_duration,
+        request_sql_statements,
+        statement_duration,
+    ):
+        lines.extend(histogram.render())
+    lines.extend(_pool_lines())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,74 @@
+from typing import Callable, Optional, Type, TypeVar, Union
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from api.repositories import crud_resquests
+
+T = TypeVar("T")
+
+
+class AsyncRepository:
+    """Асинхронный вариант репозитория для async def роутеров.
+
+    Запросы по-прежнему описаны в синхронных репозиториях crud_resquests,
+    здесь решается только где их выполнить: с AsyncSession (asyncpg) - через
+    run_sync в greenlet, с обычной Session (psycopg2) - в пуле потоков.
+    Любой публичный метод синхронного репозитория доступен как корутина.
+    row_schema заменяет схему, в которой репозиторий отдаёт записи (fields=).
+    """
+
+    repository_class: Type[crud_resquests.BaseRepository]
+
+    def __init__(
+        self,
+        db: Union[AsyncSession, Session],
+        row_schema: Optional[Type[BaseModel]] = None,
+    ):
+        self.db = db
+        self.row_schema = row_schema
+
+    def _repository(self, session: Session) -> crud_resquests.BaseRepository:
+        repository = self.repository_class(session)
+        if self.row_schema is not None:
+            repository.row_schema = self.row_schema
+        return repository
+
+    async def run(self, call: Callable[[crud_resquests.BaseRepository], T]) -> T:
+        if isinstance(self.db, AsyncSession):
+            return await self.db.run_sync(
+                lambda session: call(self._repository(session))
+            )
+        return await run_in_threadpool(call, self._repository(self.db))
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or not callable(
+            getattr(self.repository_class, name, None)
+        ):
+            raise AttributeError(name)
+
+        async def method(*args, **kwargs):
+            return await self.run(
+                lambda repository: getattr(repository, name)(*args, **kwargs)
+            )
+
+        method.__name__ = name
+        return method
+
+
+class AsyncOrganizationRepository(AsyncRepository):
+    repository_class = crud_resquests.OrganizationRepository
+
+
+class AsyncBuildingRepository(AsyncRepository):
+    repository_class = crud_resquests.BuildingRepository
+
+
+class AsyncActivityRepository(AsyncRepository):
+    repository_class = crud_resquests.ActivityRepository
+
+
+class AsyncChangeLogRepository(AsyncRepository):
+    repository_class = crud_resquests.ChangeLogRepository
@@ -1,7 +1,23 @@
+import math
 from abc import ABC, abstractmethod
-from typing import List, Optional, Generic, TypeVar, Type
-from sqlalchemy.orm import Session
-from database import models, schemas
+from collections import Counter
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Generic,
+    Tuple,
+    TypeVar,
+    Type,
+    Union,
+)
+from sqlalchemy import and_, func, insert, literal, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from database import changes, counters, geo, models, schemas, search, tree
+from api.repositories import events, planner
+from config import settings
 from fastapi import HTTPException, status
 
 from sqlalchemy.orm import DeclarativeMeta
@@ -10,18 +26,106 @@ ModelType = TypeVar("ModelType", bound=DeclarativeMeta)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=schemas.BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=schemas.BaseModel)
 
+# Глубина поиска по дочерним видам деятельности в search_by_activity
+SEARCH_MAX_DEPTH = 3
+# Сколько результатов вернуть при поиске с ранжированием, если limit не задан
+SEARCH_DEFAULT_LIMIT = 100
+SUGGEST_DEFAULT_LIMIT = 10
+
+# Результат массовой вставки для каждой строки: id или текст ошибки
+ImportResult = Union[int, str]
+
 
 class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType], ABC):
+    # Связи, которые подгружаются пачкой при выгрузке через stream
+    stream_profile: tuple = ()
+    # Схема ответа списков. Строки списков выбираются колонками и собираются
+    # в схему через model_construct: без ORM объектов и без повторной
+    # проверки данных, которые только что пришли из БД
+    row_schema: Optional[Type[schemas.BaseModel]] = None
+
     def __init__(self, db: Session, model: Type[ModelType]):
         self.db = db
         self.model = model
 
+    @property
+    def dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+    def _query(self, profile: tuple = ()):
+        return self.db.query(self.model).options(*profile)
+
+    def _profile(self) -> tuple:
+        """Опции загрузки get(): с урезанной row_schema - только её колонки."""
+        if self.row_schema is type(self).row_schema:
+            return ()
+        return (
+            load_only(
+                *[getattr(self.model, name) for name in self.row_schema.model_fields]
+            ),
+        )
+
+    def _paginate(
+        self,
+        query,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> List[ModelType]:
+        # Порядок по первичному ключу стабилен при вставках; after - keyset,
+        # skip - OFFSET для старых клиентов
+        query = query.order_by(self.model.id)
+        if after is not None:
+            query = query.filter(self.model.id > after)
+        elif skip:
+            query = query.offset(skip)
+        if limit is not None:
+            query = query.limit(limit)
+        return self._load(query)
+
+    def _load(self, query) -> list:
+        """Выполняет запрос списка: схемы row_schema или ORM объекты."""
+        if self.row_schema is None:
+            return query.all()
+        columns = [getattr(self.model, name) for name in self.row_schema.model_fields]
+        construct = self.row_schema.model_construct
+        return [construct(**row._mapping) for row in query.with_entities(*columns)]
+
+    def stream(self, batch_size: int) -> Iterator[List[ModelType]]:
+        """Все записи по id пачками из серверного курсора.
+
+        yield_per включает stream_results, поэтому в памяти одновременно
+        находится только текущая пачка; selectinload грузит связи на пачку.
+        """
+        query = (
+            select(self.model)
+            .options(*self.stream_profile)
+            .order_by(self.model.id)
+            .execution_options(yield_per=batch_size)
+        )
+        # identity map хранит объекты по слабым ссылкам: обработанные пачки
+        # освобождаются сборщиком мусора
+        yield from self.db.scalars(query).partitions()
+
+    def get_many(self, ids: List[int]) -> dict:
+        """Записи по id одним IN запросом (связи - пачкой): {id: запись}."""
+        if not ids:
+            return {}
+        query = self._query().filter(self.model.id.in_(set(ids)))
+        return {obj.id: obj for obj in self._load(query)}
+
+    def _get_ordered(self, ids: List[int]) -> list:
+        found = self.get_many(ids)
+        return [found[id] for id in ids if id in found]
+
     @abstractmethod
     def get(self, id: int) -> Optional[ModelType]:
         raise NotImplementedError
 
     @abstractmethod
-    def get_multi(self, skip: int = 0, limit: int = 100) -> List[ModelType]:
+    def get_multi(
+        self, skip: int = 0, limit: int = 100, after: Optional[int] = None
+    ) -> List[ModelType]:
         raise NotImplementedError
 
     @abstractmethod
@@ -37,24 +141,289 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType], ABC
         raise NotImplementedError
 
 
+def _building_index(db: Session) -> geo.GridIndex:
+    # Запасной вариант для баз без PostGIS: сетка строится один раз на процесс
+    if not geo.building_index.loaded:
+        geo.building_index.load(
+            db.query(
+                models.Building.id, models.Building.latitude, models.Building.longitude
+            ).filter(
+                models.Building.latitude.isnot(None),
+                models.Building.longitude.isnot(None),
+            )
+        )
+    return geo.building_index
+
+
+# Профили загрузки связей. Схема ответа Organization читает building,
+# activities и phone_numbers; без профиля каждая строка страницы догружает их
+# отдельными запросами. С профилем страница любого размера - 3 запроса.
+ORGANIZATION_RELATIONS = {
+    "building": joinedload(models.Organization.building),
+    "activities": selectinload(models.Organization.activities),
+    "phone_numbers": selectinload(models.Organization.phone_numbers),
+}
+ORGANIZATION_FULL = tuple(ORGANIZATION_RELATIONS.values())
+
+
+def _name_index(db: Session, model, index: search.NgramIndex) -> search.NgramIndex:
+    # Запасной вариант для баз без pg_trgm, как и _building_index
+    if not index.loaded:
+        index.load(db.query(model.id, model.name))
+    return index
+
+
+def _name_filter(
+    db: Session, model, index: search.NgramIndex, term: str, fuzzy: bool = False
+):
+    if db.get_bind().dialect.name == "postgresql":
+        # ILIKE '%...%' и %> обслуживаются GIN индексом gin_trgm_ops
+        clause = model.name.ilike(f"%{term}%")
+        if fuzzy:
+            clause = or_(clause, model.name.op("%>")(term))
+        return clause
+    return model.id.in_(_name_index(db, model, index).search(term, fuzzy=fuzzy))
+
+
+def _suggest_index(db: Session) -> search.PrefixIndex:
+    # В отличие от _name_index строится при любой БД: подсказки на каждое
+    # нажатие клавиши отдаются без запросов
+    index = search.organization_suggest_index
+    if not index.loaded:
+        index.load(db.query(models.Organization.id, models.Organization.name))
+    return index
+
+
+def _activity_tree_rows(db: Session) -> List[tree.Row]:
+    return db.query(
+        models.Activity.id,
+        models.Activity.name,
+        models.Activity.parent_id,
+        models.Activity.level,
+    ).all()
+
+
+def _activity_tree(db: Session) -> tree.ActivityTree:
+    # Всё дерево одним запросом; дальше предки и потомки без обращений к БД
+    return tree.activity_tree.get(
+        lambda: _activity_tree_rows(db), settings.ACTIVITY_TREE_TTL
+    )
+
+
+def _activity_tree_node(db: Session, id: int) -> tree.ActivityTree:
+    activity_tree = _activity_tree(db)
+    # Узел мог создать другой процесс после чтения снимка: снимок
+    # перечитывается, только если узел есть в БД, - иначе запросы
+    # несуществующих id перечитывали бы всё дерево
+    if id not in activity_tree and db.get(models.Activity, id) is not None:
+        activity_tree = tree.activity_tree.reload(
+            lambda: _activity_tree_rows(db), activity_tree
+        )
+    if id not in activity_tree:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Вид деятельности не найден",
+        )
+    return activity_tree
+
+
+def _distance_order(dialect: str, latitude: float, longitude: float):
+    """Выражение для сортировки зданий от точки, ближние первыми."""
+    building = models.Building
+    if dialect == "postgresql":
+        return geo.knn_distance(
+            geo.location_expression(building.latitude, building.longitude),
+            latitude,
+            longitude,
+        )
+    # Без PostGIS - квадрат расстояния на плоскости с поправкой долготы на
+    # широту точки: для сортировки в пределах города порядок тот же
+    scale = math.cos(math.radians(latitude))
+    d_lat = building.latitude - latitude
+    d_lon = (building.longitude - longitude) * scale
+    return d_lat * d_lat + d_lon * d_lon
+
+
+def warm_up(db: Session) -> None:
+    """Строит индексы в памяти при запуске, а не на первом запросе."""
+    _activity_tree(db)
+    _suggest_index(db)
+    if db.get_bind().dialect.name == "postgresql":
+        # PostGIS и pg_trgm: запасные индексы в памяти не используются
+        return
+    _building_index(db)
+    _name_index(db, models.Organization, search.organization_name_index)
+
+
+# Индексы в памяти догружаются по событиям, только если уже построены:
+# иначе они будут загружены целиком при первом обращении
+@events.listens_for(events.BUILDING_CREATED)
+def _index_building(id: int, latitude: float, longitude: float, **_):
+    if geo.building_index.loaded and latitude is not None and longitude is not None:
+        geo.building_index.add(id, latitude, longitude)
+
+
+@events.listens_for(events.ORGANIZATION_CREATED, events.ORGANIZATION_UPDATED)
+def _index_organization_name(id: int, name: str, **_):
+    if search.organization_name_index.loaded:
+        search.organization_name_index.add(id, name)
+
+
+@events.listens_for(events.ORGANIZATION_CREATED, events.ORGANIZATION_UPDATED)
+def _index_organization_suggestion(id: int, name: str, **_):
+    if search.organization_suggest_index.loaded:
+        search.organization_suggest_index.add(id, name)
+
+
+@events.listens_for(events.ORGANIZATION_DELETED)
+def _unindex_organization_name(id: int, **_):
+    search.organization_name_index.remove(id)
+    search.organization_suggest_index.remove(id)
+
+
+@events.listens_for(events.ACTIVITY_CREATED)
+def _add_activity_to_tree(id: int, name: str, parent_id: Optional[int], **_):
+    tree.activity_tree.add([(id, name, parent_id)])
+
+
+@events.listens_for(events.BUILDINGS_IMPORTED)
+def _index_buildings(buildings, **_):
+    for id, latitude, longitude in buildings:
+        _index_building(id, latitude, longitude)
+
+
+@events.listens_for(events.ORGANIZATIONS_IMPORTED)
+def _index_organization_names(organizations, **_):
+    for id, name, _building_id in organizations:
+        _index_organization_name(id, name)
+        _index_organization_suggestion(id, name)
+
+
+@events.listens_for(events.ACTIVITIES_IMPORTED)
+def _add_activities_to_tree(activities, **_):
+    tree.activity_tree.add(activities)
+
+
 class OrganizationRepository(
     BaseRepository[
         models.Organization, schemas.OrganizationCreate, schemas.OrganizationUpdate
     ]
 ):
+    stream_profile = ORGANIZATION_FULL
+    row_schema = schemas.Organization
+
     def __init__(self, db: Session):
         super().__init__(db, models.Organization)
 
+    def _profile(self) -> tuple:
+        if self.row_schema is type(self).row_schema:
+            return ORGANIZATION_FULL
+        fields = self.row_schema.model_fields
+        columns = [
+            getattr(self.model, name)
+            for name in fields
+            if name not in ORGANIZATION_RELATIONS
+        ]
+        return (load_only(*columns),) + tuple(
+            loader for name, loader in ORGANIZATION_RELATIONS.items() if name in fields
+        )
+
+    def _load(self, query) -> List[schemas.Organization]:
+        """Страница организаций запросами по колонкам.
+
+        Связи выбираются отдельными запросами по id страницы, как в
+        ORGANIZATION_FULL, но без объектов ORM и identity map, и только
+        те, что есть в row_schema.
+        """
+        fields = self.row_schema.model_fields
+        scalars = [name for name in fields if name not in ORGANIZATION_RELATIONS]
+        columns = {name: getattr(self.model, name) for name in scalars}
+        if "building" in fields:
+            columns.setdefault("building_id", self.model.building_id)
+        rows = query.with_entities(*columns.values()).all()
+        if not rows:
+            return []
+        ids = [row.id for row in rows]
+
+        related = {}
+        if "building" in fields:
+            buildings = self._load_buildings({row.building_id for row in rows})
+            related["building"] = lambda row: buildings[row.building_id]
+        if "activities" in fields:
+            activities = self._load_activities(ids)
+            related["activities"] = lambda row: activities[row.id]
+        if "phone_numbers" in fields:
+            phones = self._load_phones(ids)
+            related["phone_numbers"] = lambda row: phones[row.id]
+
+        construct = self.row_schema.model_construct
+        return [
+            construct(
+                **{name: row._mapping[name] for name in scalars},
+                **{name: load(row) for name, load in related.items()},
+            )
+            for row in rows
+        ]
+
+    def _load_buildings(self, ids) -> Dict[int, schemas.Building]:
+        columns = [
+            getattr(models.Building, name) for name in schemas.Building.model_fields
+        ]
+        return {
+            row.id: schemas.Building.model_construct(**row._mapping)
+            for row in self.db.execute(
+                select(*columns).where(models.Building.id.in_(ids))
+            )
+        }
+
+    def _load_phones(self, ids: List[int]) -> Dict[int, List[schemas.PhoneNumber]]:
+        phones = {id: [] for id in ids}
+        phone = models.PhoneNumber
+        for row in self.db.execute(
+            select(phone.id, phone.number, phone.organization_id)
+            .where(phone.organization_id.in_(ids))
+            .order_by(phone.id)
+        ):
+            phones[row.organization_id].append(
+                schemas.PhoneNumber.model_construct(**row._mapping)
+            )
+        return phones
+
+    def _load_activities(self, ids: List[int]) -> Dict[int, List[schemas.Activity]]:
+        activities = {id: [] for id in ids}
+        association = models.organization_activity_association
+        activity = models.Activity
+        for row in self.db.execute(
+            select(
+                association.c.organization_id,
+                activity.id,
+                activity.name,
+                activity.parent_id,
+                activity.level,
+            )
+            .join(activity, activity.id == association.c.activity_id)
+            .where(association.c.organization_id.in_(ids))
+            .order_by(activity.id)
+        ):
+            activities[row.organization_id].append(
+                schemas.Activity.model_construct(
+                    id=row.id, name=row.name, parent_id=row.parent_id, level=row.level
+                )
+            )
+        return activities
+
     def get(self, id: int) -> Optional[models.Organization]:
-        organization = self.db.query(self.model).filter(self.model.id == id).first()
+        organization = self._query(self._profile()).filter(self.model.id == id).first()
         if organization is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Организация не найдена"
             )
         return organization
 
-    def get_multi(self, skip: int = 0, limit: int = 100) -> List[models.Organization]:
-        return self.db.query(self.model).offset(skip).limit(limit).all()
+    def get_multi(
+        self, skip: int = 0, limit: int = 100, after: Optional[int] = None
+    ) -> List[schemas.Organization]:
+        return self._paginate(self._query(), skip=skip, limit=limit, after=after)
 
     def create(self, obj_in: schemas.OrganizationCreate) -> models.Organization:
         db_organization = models.Organization(
@@ -67,94 +436,729 @@ class OrganizationRepository(
             self.db.add(db_phone_number)
 
         self.db.add(db_organization)
+        counters.apply(self.db, buildings=Counter([obj_in.building_id]))
+        self.db.flush()
+        changes.record(
+            self.db, changes.ORGANIZATION, changes.CREATE, [db_organization.id]
+        )
         self.db.commit()
-        self.db.refresh(db_organization)
-        return db_organization
+        events.emit(
+            events.ORGANIZATION_CREATED,
+            id=db_organization.id,
+            name=obj_in.name,
+            building_id=obj_in.building_id,
+        )
+        return self.get(db_organization.id)
+
+    def create_many(self, rows: List[schemas.OrganizationImport]) -> List[ImportResult]:
+        """Вставляет пачку одним executemany на таблицу и одним commit.
+
+        Строки со ссылками на несуществующие здания или виды деятельности
+        пропускаются с ошибкой, остальные записываются.
+        """
+        building_ids = {row.building_id for row in rows}
+        activity_ids = {id for row in rows for id in row.activity_ids}
+        known_buildings = set(
+            self.db.scalars(
+                select(models.Building.id).where(models.Building.id.in_(building_ids))
+            )
+        )
+        known_activities = set(
+            self.db.scalars(
+                select(models.Activity.id).where(models.Activity.id.in_(activity_ids))
+            )
+        )
+        results: List[Optional[ImportResult]] = []
+        valid = []
+        for row in rows:
+            missing = set(row.activity_ids) - known_activities
+            if row.building_id not in known_buildings:
+                results.append(f"Здание {row.building_id} не найдено")
+            elif missing:
+                results.append(f"Виды деятельности не найдены: {sorted(missing)}")
+            else:
+                results.append(None)
+                valid.append(row)
+        if not valid:
+            return results
+
+        try:
+            ids = self.db.scalars(
+                insert(self.model).returning(
+                    self.model.id, sort_by_parameter_order=True
+                ),
+                [{"name": row.name, "building_id": row.building_id} for row in valid],
+            ).all()
+            phone_numbers = [
+                {"number": phone_number.number, "organization_id": id}
+                for id, row in zip(ids, valid)
+                for phone_number in row.phone_numbers
+            ]
+            if phone_numbers:
+                self.db.execute(insert(models.PhoneNumber), phone_numbers)
+            links = [
+                {"organization_id": id, "activity_id": activity_id}
+                for id, row in zip(ids, valid)
+                for activity_id in dict.fromkeys(row.activity_ids)
+            ]
+            if links:
+                self.db.execute(insert(models.organization_activity_association), links)
+            counters.apply(
+                self.db,
+                buildings=Counter(row.building_id for row in valid),
+                activities=[((), row.activity_ids) for row in valid],
+            )
+            # Выборки по виду деятельности с детьми видят организацию и у
+            # всех предков её видов: их кэш тоже устарел
+            closure = models.ActivityClosure
+            touched_activities = self.db.scalars(
+                select(closure.ancestor_id)
+                .where(
+                    closure.descendant_id.in_({link["activity_id"] for link in links})
+                )
+                .distinct()
+            ).all()
+            changes.record(self.db, changes.ORGANIZATION, changes.CREATE, ids)
+            self.db.commit()
+        except SQLAlchemyError as error:
+            self.db.rollback()
+            message = f"Ошибка записи пачки: {error.__class__.__name__}"
+            return [result or message for result in results]
+
+        events.emit(
+            events.ORGANIZATIONS_IMPORTED,
+            organizations=[
+                (id, row.name, row.building_id) for id, row in zip(ids, valid)
+            ],
+            activity_ids=sorted(touched_activities),
+        )
+        created = iter(ids)
+        return [result or next(created) for result in results]
 
     def update(
         self, id: int, obj_in: schemas.OrganizationUpdate
     ) -> models.Organization:
         db_organization = self.get(id)
+        previous_name = db_organization.name
+        previous_building_id = db_organization.building_id
         for key, value in obj_in.model_dump(exclude_unset=True).items():
             setattr(db_organization, key, value)
+        if db_organization.building_id != previous_building_id:
+            counters.apply(
+                self.db,
+                buildings=Counter(
+                    {previous_building_id: -1, db_organization.building_id: 1}
+                ),
+            )
+        changes.record(self.db, changes.ORGANIZATION, changes.UPDATE, [id])
         self.db.commit()
-        self.db.refresh(db_organization)
+        db_organization = self.get(id)
+        events.emit(
+            events.ORGANIZATION_UPDATED,
+            id=id,
+            name=db_organization.name,
+            building_id=db_organization.building_id,
+            previous_name=previous_name,
+            previous_building_id=previous_building_id,
+        )
         return db_organization
 
     def delete(self, id: int) -> dict:
         db_organization = self.get(id)
+        name, building_id = db_organization.name, db_organization.building_id
+        association = models.organization_activity_association
+        activity_ids = self.db.scalars(
+            select(association.c.activity_id).where(association.c.organization_id == id)
+        ).all()
+        counters.apply(
+            self.db,
+            buildings=Counter({building_id: -1}),
+            activities=[(activity_ids, ())],
+        )
         self.db.delete(db_organization)
+        changes.record(self.db, changes.ORGANIZATION, changes.DELETE, [id])
         self.db.commit()
+        events.emit(
+            events.ORGANIZATION_DELETED, id=id, name=name, building_id=building_id
+        )
         return {"message": "Организация успешно удалена"}
 
-    def get_by_building(self, building_id: int) -> List[models.Organization]:
-        return (
-            self.db.query(self.model)
-            .filter(self.model.building_id == building_id)
-            .all()
+    def get_by_building(
+        self,
+        building_id: int,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> List[schemas.Organization]:
+        query = self._query().filter(self.model.building_id == building_id)
+        return self._paginate(query, limit=limit, after=after)
+
+    def get_by_activity(
+        self,
+        activity_id: int,
+        include_children: bool = False,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> List[schemas.Organization]:
+        activity_tree = _activity_tree_node(self.db, activity_id)
+        activity_ids = (
+            activity_tree.descendants(activity_id)
+            if include_children
+            else [activity_id]
         )
+        return self._get_by_activity_ids(activity_ids, limit=limit, after=after)
+
+    def search_by_activity(
+        self,
+        activity_name: str,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> List[schemas.Organization]:
+        activity_tree = _activity_tree(self.db)
+        activity_ids = {
+            descendant
+            for id in activity_tree.search(activity_name)
+            for descendant in activity_tree.descendants(id, SEARCH_MAX_DEPTH)
+        }
+        if not activity_ids:
+            return []
+        return self._get_by_activity_ids(sorted(activity_ids), limit=limit, after=after)
 
-    def get_by_activity(self, activity_id: int) -> List[models.Organization]:
-        activity = (
-            self.db.query(models.Activity)
-            .filter(models.Activity.id == activity_id)
-            .first()
+    def _get_by_activity_ids(
+        self,
+        activity_ids,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> List[schemas.Organization]:
+        association = models.organization_activity_association
+        organization_ids = select(association.c.organization_id).where(
+            association.c.activity_id.in_(activity_ids)
         )
-        if not activity:
-            raise HTTPException(status_code=404, detail="Вид деятельности не найден")
-        return activity.organizations
+        query = self._query().filter(self.model.id.in_(organization_ids))
+        return self._paginate(query, limit=limit, after=after)
+
+    def suggest(
+        self, prefix: str, limit: int = SUGGEST_DEFAULT_LIMIT
+    ) -> List[schemas.OrganizationSuggestion]:
+        """Подсказки для строки поиска: организации, в названии которых
+        есть слово, начинающееся с prefix. Отвечает индекс в памяти."""
+        return [
+            schemas.OrganizationSuggestion.model_construct(id=id, name=name)
+            for id, name in _suggest_index(self.db).suggest(prefix, limit)
+        ]
+
+    def search_by_name(
+        self,
+        name: str,
+        limit: Optional[int] = None,
+        after: Optional[int] = None,
+        ranked: bool = False,
+    ) -> List[schemas.Organization]:
+        """Организации, в названии которых есть name.
+
+        ranked=True - сначала наиболее похожие названия, затем названия с
+        опечатками (см. search.FUZZY_THRESHOLD), курсор не используется.
+        """
+        limit = limit or (SEARCH_DEFAULT_LIMIT if ranked else None)
+        if ranked and self.dialect != "postgresql":
+            ids = _name_index(
+                self.db, self.model, search.organization_name_index
+            ).search(name, fuzzy=True)
+            return self._get_ordered(ids[:limit])
 
-    def search_by_activity(self, activity_name: str) -> List[models.Organization]:
-        activities = (
-            self.db.query(models.Activity)
-            .filter(models.Activity.name.ilike(f"%{activity_name}%"))
-            .all()
+        query = self._query().filter(
+            _name_filter(
+                self.db,
+                self.model,
+                search.organization_name_index,
+                name,
+                fuzzy=ranked,
+            )
         )
-        organizations = set()
-        for activity in activities:
-            organizations.update(activity.organizations)
+        if ranked:
+            return self._load(
+                query.order_by(
+                    func.word_similarity(name, self.model.name).desc(), self.model.id
+                ).limit(limit)
+            )
+        return self._paginate(query, limit=limit, after=after)
 
-            def get_child_organizations(parent_activity, level):
-                if level > 3:
-                    return
-                for child_activity in parent_activity.children:
-                    organizations.update(child_activity.organizations)
-                    get_child_organizations(child_activity, level + 1)
+    def _search_filters(
+        self,
+        name: Optional[str] = None,
+        activity_id: Optional[int] = None,
+        include_children: bool = True,
+        activity_name: Optional[str] = None,
+        building_id: Optional[int] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        estimate: bool = False,
+    ) -> List[planner.Filter]:
+        """Фильтры поиска в порядке перечисления.
 
-            get_child_organizations(activity, 1)
+        Точные оценки индексов в памяти есть всегда; оценки по счётчикам
+        нужны только explain и собираются одним запросом при estimate=True.
+        """
+        association = models.organization_activity_association
+        filters, estimates = [], []
 
-        return list(organizations)
+        def by_activities(ids: List[int]):
+            return self.model.id.in_(
+                select(association.c.organization_id).where(
+                    association.c.activity_id.in_(ids)
+                )
+            )
 
-    def search_by_name(self, name: str) -> List[models.Organization]:
-        return (
-            self.db.query(self.model).filter(self.model.name.ilike(f"%{name}%")).all()
+        if building_id is not None:
+            filters.append(
+                planner.Filter("building", self.model.building_id == building_id, None)
+            )
+            estimates.append(
+                (
+                    filters[-1],
+                    select(models.BuildingStats.organizations)
+                    .where(models.BuildingStats.building_id == building_id)
+                    .scalar_subquery(),
+                )
+            )
+        if activity_id is not None:
+            activity_tree = _activity_tree_node(self.db, activity_id)
+            ids = (
+                activity_tree.descendants(activity_id)
+                if include_children
+                else [activity_id]
+            )
+            stats = models.ActivityStats
+            filters.append(planner.Filter("activity", by_activities(ids), None))
+            estimates.append(
+                (
+                    filters[-1],
+                    select(
+                        stats.subtree_organizations
+                        if include_children
+                        else stats.organizations
+                    )
+                    .where(stats.activity_id == activity_id)
+                    .scalar_subquery(),
+                )
+            )
+        if activity_name is not None:
+            activity_tree = _activity_tree(self.db)
+            ids = sorted(
+                {
+                    descendant
+                    for id in activity_tree.search(activity_name)
+                    for descendant in activity_tree.descendants(id, SEARCH_MAX_DEPTH)
+                }
+            )
+            filters.append(
+                planner.Filter("activity_name", by_activities(ids), None, exact=not ids)
+            )
+            if ids:
+                # Сумма прямых счётчиков - оценка сверху: организация с
+                # несколькими видами из списка считается несколько раз
+                estimates.append(
+                    (
+                        filters[-1],
+                        select(func.sum(models.ActivityStats.organizations))
+                        .where(models.ActivityStats.activity_id.in_(ids))
+                        .scalar_subquery(),
+                    )
+                )
+            else:
+                filters[-1].estimate = 0
+        if name is not None:
+            if self.dialect == "postgresql":
+                # Доля совпадений по триграммам заранее неизвестна
+                filters.append(
+                    planner.Filter(
+                        "name",
+                        _name_filter(
+                            self.db, self.model, search.organization_name_index, name
+                        ),
+                        None,
+                    )
+                )
+            else:
+                ids = _name_index(
+                    self.db, self.model, search.organization_name_index
+                ).search(name)
+                filters.append(
+                    planner.Filter("name", self.model.id.in_(ids), len(ids), exact=True)
+                )
+        if radius_km is not None:
+            building = models.Building
+            if self.dialect == "postgresql":
+                location = geo.location_expression(
+                    building.latitude, building.longitude
+                )
+                clause, _ = geo.radius_clause(location, latitude, longitude, radius_km)
+                # Оценка по счётчикам повторила бы поиск зданий в радиусе
+                filters.append(planner.Filter("location", clause, None))
+            else:
+                building_ids = [
+                    id
+                    for id, _ in _building_index(self.db).nearby(
+                        latitude, longitude, radius_km
+                    )
+                ]
+                filters.append(
+                    planner.Filter(
+                        "location",
+                        self.model.building_id.in_(building_ids),
+                        None,
+                        exact=not building_ids,
+                    )
+                )
+                if not building_ids:
+                    filters[-1].estimate = 0
+                else:
+                    estimates.append(
+                        (
+                            filters[-1],
+                            select(func.sum(models.BuildingStats.organizations))
+                            .where(models.BuildingStats.building_id.in_(building_ids))
+                            .scalar_subquery(),
+                        )
+                    )
+
+        if estimate and estimates:
+            values = self.db.execute(
+                select(*[func.coalesce(value, 0) for _, value in estimates])
+            ).one()
+            for (item, _), value in zip(estimates, values):
+                item.estimate = int(value)
+        return filters
+
+    def _search_query(
+        self,
+        filters: List[planner.Filter],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        sort: str = "id",
+        limit: int = 100,
+        after: Optional[int] = None,
+    ):
+        query = self._query()
+        if latitude is not None:
+            # Точка задана: расстояние и фильтр по радиусу - по зданию
+            query = query.join(
+                models.Building, models.Building.id == self.model.building_id
+            )
+        for item in filters:
+            query = query.filter(item.clause)
+        if sort == "distance":
+            query = query.order_by(
+                _distance_order(self.dialect, latitude, longitude), self.model.id
+            )
+        elif sort == "name":
+            query = query.order_by(self.model.name, self.model.id)
+        else:
+            if after is not None:
+                query = query.filter(self.model.id > after)
+            query = query.order_by(self.model.id)
+        return query.limit(limit)
+
+    def search(
+        self,
+        sort: str = "id",
+        limit: int = 100,
+        after: Optional[int] = None,
+        **filters,
+    ) -> List[schemas.Organization]:
+        """Организации по любому сочетанию фильтров одним запросом.
+
+        filters - аргументы _search_filters; sort: id, name или distance
+        (от точки latitude/longitude, ближние первыми); after - только для id.
+        """
+        planned = self._search_filters(**filters)
+        if planner.is_empty(planned):
+            return []
+        return self._load(
+            self._search_query(
+                planned,
+                filters.get("latitude"),
+                filters.get("longitude"),
+                sort=sort,
+                limit=limit,
+                after=after,
+            )
+        )
+
+    def explain_search(
+        self,
+        sort: str = "id",
+        limit: int = 100,
+        after: Optional[int] = None,
+        **filters,
+    ) -> dict:
+        """Фильтры с оценками, SQL запроса search и его план."""
+        planned = self._search_filters(estimate=True, **filters)
+        statement = (
+            self._search_query(
+                planned,
+                filters.get("latitude"),
+                filters.get("longitude"),
+                sort=sort,
+                limit=limit,
+                after=after,
+            )
+            .with_entities(self.model.id)
+            .statement
+        )
+        return {
+            "filters": [
+                {"filter": item.name, "estimate": item.estimate, "exact": item.exact}
+                for item in planned
+            ],
+            "skipped": planner.is_empty(planned),
+            "sql": planner.compile_sql(self.db, statement),
+            "plan": planner.explain(self.db, statement),
+        }
+
+    def get_nearby(
+        self, latitude: float, longitude: float, radius_km: float, limit: int = 100
+    ) -> List[schemas.Organization]:
+        if self.dialect == "postgresql":
+            location = geo.location_expression(
+                models.Building.latitude, models.Building.longitude
+            )
+            clause, distance = geo.radius_clause(
+                location, latitude, longitude, radius_km
+            )
+            return self._load(
+                self._query()
+                .join(self.model.building)
+                .filter(clause)
+                .order_by(distance, self.model.id)
+                .limit(limit)
+            )
+        distances = dict(
+            _building_index(self.db).nearby(latitude, longitude, radius_km)
+        )
+        if not distances:
+            return []
+        organizations = self._load(
+            self._query().filter(self.model.building_id.in_(list(distances)))
         )
+        organizations.sort(key=lambda org: (distances[org.building_id], org.id))
+        return organizations[:limit]
+
+    def get_in_bbox(
+        self,
+        min_latitude: float,
+        min_longitude: float,
+        max_latitude: float,
+        max_longitude: float,
+        limit: int = 100,
+    ) -> List[schemas.Organization]:
+        query = self._query()
+        if self.dialect == "postgresql":
+            location = geo.location_expression(
+                models.Building.latitude, models.Building.longitude
+            )
+            query = query.join(self.model.building).filter(
+                geo.bbox_clause(
+                    location, min_latitude, min_longitude, max_latitude, max_longitude
+                )
+            )
+        else:
+            building_ids = _building_index(self.db).in_bbox(
+                min_latitude, min_longitude, max_latitude, max_longitude
+            )
+            if not building_ids:
+                return []
+            query = query.filter(self.model.building_id.in_(building_ids))
+        return self._load(query.order_by(self.model.id).limit(limit))
 
 
 class BuildingRepository(BaseRepository[models.Building, schemas.BuildingCreate, None]):
+    row_schema = schemas.Building
+
     def __init__(self, db: Session):
         super().__init__(db, models.Building)
 
     def get(self, id: int) -> Optional[models.Building]:
-        building = self.db.query(self.model).filter(self.model.id == id).first()
+        building = self._query(self._profile()).filter(self.model.id == id).first()
         if building is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Здание не найдено"
             )
         return building
 
-    def get_multi(self, skip: int = 0, limit: int = 100) -> List[models.Building]:
-        return self.db.query(self.model).offset(skip).limit(limit).all()
+    def get_multi(
+        self, skip: int = 0, limit: int = 100, after: Optional[int] = None
+    ) -> List[schemas.Building]:
+        return self._paginate(self._query(), skip=skip, limit=limit, after=after)
 
     def create(self, obj_in: schemas.BuildingCreate) -> models.Building:
         db_building = models.Building(
-            address=obj_in.address, latitude=obj_in.latitude, longitude=obj_in.longitude
+            address=obj_in.address,
+            latitude=obj_in.latitude,
+            longitude=obj_in.longitude,
+            geohash=geo.geohash(obj_in.latitude, obj_in.longitude),
         )
         self.db.add(db_building)
+        self.db.flush()
+        changes.record(self.db, changes.BUILDING, changes.CREATE, [db_building.id])
         self.db.commit()
         self.db.refresh(db_building)
+        events.emit(
+            events.BUILDING_CREATED,
+            id=db_building.id,
+            latitude=db_building.latitude,
+            longitude=db_building.longitude,
+        )
         return db_building
 
+    def create_many(self, rows: List[schemas.BuildingCreate]) -> List[ImportResult]:
+        try:
+            ids = self.db.scalars(
+                insert(self.model).returning(
+                    self.model.id, sort_by_parameter_order=True
+                ),
+                [
+                    {
+                        **row.model_dump(),
+                        "geohash": geo.geohash(row.latitude, row.longitude),
+                    }
+                    for row in rows
+                ],
+            ).all()
+            changes.record(self.db, changes.BUILDING, changes.CREATE, ids)
+            self.db.commit()
+        except SQLAlchemyError as error:
+            self.db.rollback()
+            return [f"Ошибка записи пачки: {error.__class__.__name__}"] * len(rows)
+        events.emit(
+            events.BUILDINGS_IMPORTED,
+            buildings=[(id, row.latitude, row.longitude) for id, row in zip(ids, rows)],
+        )
+        return ids
+
+    def get_nearby(
+        self, latitude: float, longitude: float, radius_km: float, limit: int = 100
+    ) -> List[schemas.Building]:
+        if self.dialect == "postgresql":
+            location = geo.location_expression(
+                self.model.latitude, self.model.longitude
+            )
+            clause, distance = geo.radius_clause(
+                location, latitude, longitude, radius_km
+            )
+            return self._load(
+                self._query()
+                .filter(clause)
+                .order_by(distance, self.model.id)
+                .limit(limit)
+            )
+        found = _building_index(self.db).nearby(latitude, longitude, radius_km)
+        return self._get_ordered([id for id, _ in found[:limit]])
+
+    def get_in_bbox(
+        self,
+        min_latitude: float,
+        min_longitude: float,
+        max_latitude: float,
+        max_longitude: float,
+        limit: int = 100,
+    ) -> List[schemas.Building]:
+        if self.dialect == "postgresql":
+            location = geo.location_expression(
+                self.model.latitude, self.model.longitude
+            )
+            return self._load(
+                self._query()
+                .filter(
+                    geo.bbox_clause(
+                        location,
+                        min_latitude,
+                        min_longitude,
+                        max_latitude,
+                        max_longitude,
+                    )
+                )
+                .order_by(self.model.id)
+                .limit(limit)
+            )
+        ids = _building_index(self.db).in_bbox(
+            min_latitude, min_longitude, max_latitude, max_longitude
+        )
+        return self._get_ordered(sorted(ids)[:limit])
+
+    def get_clusters(
+        self,
+        precision: int,
+        min_latitude: float,
+        min_longitude: float,
+        max_latitude: float,
+        max_longitude: float,
+    ) -> List[schemas.BuildingCluster]:
+        """Здания прямоугольника, сгруппированные по префиксу geohash длины
+        precision, одним GROUP BY; организации - из счётчиков building_stats."""
+        if self.dialect == "postgresql":
+            location = geo.location_expression(
+                self.model.latitude, self.model.longitude
+            )
+            inside = geo.bbox_clause(
+                location, min_latitude, min_longitude, max_latitude, max_longitude
+            )
+        else:
+            inside = and_(
+                self.model.latitude.between(min_latitude, max_latitude),
+                self.model.longitude.between(min_longitude, max_longitude),
+            )
+        cell = func.substr(self.model.geohash, 1, precision)
+        stats = models.BuildingStats
+        rows = self.db.execute(
+            select(
+                cell,
+                func.avg(self.model.latitude),
+                func.avg(self.model.longitude),
+                func.count(),
+                func.coalesce(func.sum(stats.organizations), 0),
+                func.min(self.model.id),
+            )
+            .outerjoin(stats, stats.building_id == self.model.id)
+            .where(inside, self.model.geohash.isnot(None))
+            .group_by(cell)
+            .order_by(cell)
+        )
+        return [
+            schemas.BuildingCluster.model_construct(
+                geohash=geohash,
+                latitude=latitude,
+                longitude=longitude,
+                buildings=buildings,
+                organizations=organizations,
+                building_id=building_id if buildings == 1 else None,
+            )
+            for geohash, latitude, longitude, buildings, organizations, building_id in rows
+        ]
+
+    def get_stats_many(self, ids: List[int]) -> Dict[int, schemas.BuildingStats]:
+        """Счётчики существующих зданий из ids одним запросом."""
+        stats = models.BuildingStats
+        rows = self.db.execute(
+            select(self.model.id, func.coalesce(stats.organizations, 0))
+            .outerjoin(stats, stats.building_id == self.model.id)
+            .where(self.model.id.in_(ids))
+        )
+        return {
+            id: schemas.BuildingStats.model_construct(
+                building_id=id, organizations=organizations
+            )
+            for id, organizations in rows
+        }
+
+    def get_stats(self, id: int) -> schemas.BuildingStats:
+        stats = self.get_stats_many([id])
+        if id not in stats:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Здание не найдено"
+            )
+        return stats[id]
+
     def update(self, id: int, obj_in: None) -> models.Building:
         raise NotImplementedError("Метод Update для Building не реализован")
 
@@ -165,11 +1169,13 @@ class BuildingRepository(BaseRepository[models.Building, schemas.BuildingCreate,
 class ActivityRepository(
     BaseRepository[models.Activity, schemas.ActivityCreate, None]
 ):  # Update не нужен
+    row_schema = schemas.Activity
+
     def __init__(self, db: Session):
         super().__init__(db, models.Activity)
 
     def get(self, id: int) -> Optional[models.Activity]:
-        activity = self.db.query(self.model).filter(self.model.id == id).first()
+        activity = self._query(self._profile()).filter(self.model.id == id).first()
         if activity is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -177,18 +1183,189 @@ class ActivityRepository(
             )
         return activity
 
-    def get_multi(self, skip: int = 0, limit: int = 100) -> List[models.Activity]:
-        return self.db.query(self.model).offset(skip).limit(limit).all()
+    def get_multi(
+        self, skip: int = 0, limit: int = 100, after: Optional[int] = None
+    ) -> List[schemas.Activity]:
+        return self._paginate(self._query(), skip=skip, limit=limit, after=after)
 
     def create(self, obj_in: schemas.ActivityCreate) -> models.Activity:
-        db_activity = models.Activity(name=obj_in.name, parent_id=obj_in.parent_id)
-        self.db.add(db_activity)
+        parent = self.get(obj_in.parent_id) if obj_in.parent_id is not None else None
+        db_activity = self._add(obj_in.name, parent)
+        changes.record(self.db, changes.ACTIVITY, changes.CREATE, [db_activity.id])
         self.db.commit()
         self.db.refresh(db_activity)
+        events.emit(
+            events.ACTIVITY_CREATED,
+            id=db_activity.id,
+            name=db_activity.name,
+            parent_id=db_activity.parent_id,
+        )
+        return db_activity
+
+    def create_many(
+        self, rows: List[schemas.ActivityImport], keys: Dict[str, int]
+    ) -> List[ImportResult]:
+        """Вставляет пачку по порядку строк, чтобы родитель шёл раньше потомков.
+
+        keys - соответствие key строки файла и id, общее для всех пачек
+        загрузки; пополняется после успешного commit пачки.
+        """
+        results: List[ImportResult] = []
+        created = []
+        batch_keys = {}
+        try:
+            for row in rows:
+                parent_id = row.parent_id
+                if row.parent_key is not None:
+                    parent_id = batch_keys.get(row.parent_key, keys.get(row.parent_key))
+                    if parent_id is None:
+                        results.append(
+                            f"Родитель с key={row.parent_key} не найден выше в файле"
+                        )
+                        continue
+                parent = None
+                if parent_id is not None:
+                    parent = self.db.get(self.model, parent_id)
+                    if parent is None:
+                        results.append(f"Вид деятельности {parent_id} не найден")
+                        continue
+                db_activity = self._add(row.name, parent)
+                if row.key is not None:
+                    batch_keys[row.key] = db_activity.id
+                created.append((db_activity.id, row.name, parent_id))
+                results.append(db_activity.id)
+            changes.record(
+                self.db, changes.ACTIVITY, changes.CREATE, [id for id, _, _ in created]
+            )
+            self.db.commit()
+        except SQLAlchemyError as error:
+            self.db.rollback()
+            message = f"Ошибка записи пачки: {error.__class__.__name__}"
+            # Ошибка могла прервать цикл: строки после неё тоже не записаны
+            return [
+                result if isinstance(result, str) else message for result in results
+            ] + [message] * (len(rows) - len(results))
+
+        keys.update(batch_keys)
+        events.emit(events.ACTIVITIES_IMPORTED, activities=created)
+        return results
+
+    def _add(self, name: str, parent: Optional[models.Activity]) -> models.Activity:
+        db_activity = models.Activity(
+            name=name,
+            parent_id=parent.id if parent is not None else None,
+            level=parent.level + 1 if parent is not None else 1,
+        )
+        self.db.add(db_activity)
+        self.db.flush()
+
+        # Новый узел наследует всех предков родителя и становится предком себе
+        closure = models.ActivityClosure
+        self.db.add(
+            closure(ancestor_id=db_activity.id, descendant_id=db_activity.id, depth=0)
+        )
+        if parent is not None:
+            self.db.execute(
+                insert(closure).from_select(
+                    ["ancestor_id", "descendant_id", "depth"],
+                    select(
+                        closure.ancestor_id,
+                        literal(db_activity.id),
+                        closure.depth + 1,
+                    ).where(closure.descendant_id == parent.id),
+                )
+            )
         return db_activity
 
+    def get_tree_json(self) -> Tuple[bytes, str]:
+        """Дерево целиком в JSON и его ETag; сериализуется раз на снимок."""
+        activity_tree = _activity_tree(self.db)
+        return activity_tree.body, activity_tree.etag
+
+    def _from_tree(
+        self, activity_tree: tree.ActivityTree, ids: List[int]
+    ) -> List[schemas.Activity]:
+        fields = self.row_schema.model_fields
+        return [
+            self.row_schema.model_construct(
+                **{
+                    name: value
+                    for name, value in activity_tree.record(id).items()
+                    if name in fields
+                }
+            )
+            for id in ids
+        ]
+
+    def get_subtree(self, id: int) -> List[schemas.Activity]:
+        activity_tree = _activity_tree_node(self.db, id)
+        return self._from_tree(activity_tree, activity_tree.descendants(id))
+
+    def get_ancestors(self, id: int) -> List[schemas.Activity]:
+        activity_tree = _activity_tree_node(self.db, id)
+        return self._from_tree(activity_tree, activity_tree.ancestors(id))
+
+    def get_stats_many(self, ids: List[int]) -> Dict[int, schemas.ActivityStats]:
+        """Счётчики существующих видов деятельности из ids одним запросом."""
+        stats = models.ActivityStats
+        rows = self.db.execute(
+            select(
+                self.model.id,
+                func.coalesce(stats.organizations, 0),
+                func.coalesce(stats.subtree_organizations, 0),
+            )
+            .outerjoin(stats, stats.activity_id == self.model.id)
+            .where(self.model.id.in_(ids))
+        )
+        return {
+            id: schemas.ActivityStats.model_construct(
+                activity_id=id,
+                organizations=organizations,
+                subtree_organizations=subtree_organizations,
+            )
+            for id, organizations, subtree_organizations in rows
+        }
+
+    def get_stats(self, id: int) -> schemas.ActivityStats:
+        stats = self.get_stats_many([id])
+        if id not in stats:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Вид деятельности не найден",
+            )
+        return stats[id]
+
     def update(self, id: int, obj_in: None) -> models.Activity:
         raise NotImplementedError("Метод Update для Activity не реализован")
 
     def delete(self, id: int) -> dict:
         raise NotImplementedError("Метод Delete для Activity не реализован")
+
+
+class ChangeLogRepository:
+    """Чтение журнала изменений; пишут в него репозитории сущностей."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_changes(self, since: int, limit: int) -> schemas.ChangeFeed:
+        horizon = changes.horizon(self.db)
+        if since < horizon:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail=f"Журнал изменений до seq {horizon} сжат: "
+                "выполните полную синхронизацию и продолжите с GET /changes/head",
+            )
+        rows = changes.read(self.db, since, limit)
+        return schemas.ChangeFeed.model_construct(
+            changes=[schemas.Change.model_construct(**row._mapping) for row in rows],
+            next_since=rows[-1].seq if rows else since,
+            has_more=len(rows) == limit,
+        )
+
+    def get_head(self) -> schemas.ChangeLogHead:
+        horizon = changes.horizon(self.db)
+        # Журнал может быть сжат целиком: продолжать тогда с горизонта
+        return schemas.ChangeLogHead.model_construct(
+            seq=max(changes.head(self.db), horizon), horizon=horizon
+        )
@@ -0,0 +1,44 @@
+from collections import defaultdict
+from typing import Callable, DefaultDict, List
+
+# Репозитории вызывают emit после успешного commit. Подписчики - индексы
+# и кэши в памяти процесса - получают только простые значения (id, имена),
+# а не ORM объекты, чтобы не провоцировать ленивые загрузки.
+ORGANIZATION_CREATED = "organization.created"
+ORGANIZATION_UPDATED = "organization.updated"
+ORGANIZATION_DELETED = "organization.deleted"
+BUILDING_CREATED = "building.created"
+ACTIVITY_CREATED = "activity.created"
+# Массовая загрузка: одно событие на пачку со списком кортежей
+# (id, name, building_id) / (id, latitude, longitude) / (id, name, parent_id)
+# Импорт организаций также передаёт activity_ids - связанные виды
+# деятельности вместе с их предками
+ORGANIZATIONS_IMPORTED = "organizations.imported"
+BUILDINGS_IMPORTED = "buildings.imported"
+ACTIVITIES_IMPORTED = "activities.imported"
+
+_listeners: DefaultDict[str, List[Callable[..., None]]] = defaultdict(list)
+
+
+def subscribe(event: str, listener: Callable[..., None]) -> None:
+    if listener not in _listeners[event]:
+        _listeners[event].append(listener)
+
+
+def unsubscribe(event: str, listener: Callable[..., None]) -> None:
+    if listener in _listeners[event]:
+        _listeners[event].remove(listener)
+
+
+def listens_for(*events: str):
+    def decorator(listener: Callable[..., None]) -> Callable[..., None]:
+        for event in events:
+            subscribe(event, listener)
+        return listener
+
+    return decorator
+
+
+def emit(event: str, **payload) -> None:
+    for listener in list(_listeners[event]):
+        listener(**payload)
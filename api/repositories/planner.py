@@ -0,0 +1,64 @@
+"""Планировщик составного поиска организаций.
+
+Каждый фильтр поиска - условие WHERE и оценка числа организаций, которые
+он оставляет. Порядок условий в WHERE выбирает сам PostgreSQL, поэтому
+оценки не меняют запрос: фильтр с точной нулевой оценкой по индексу в
+памяти делает его ненужным, остальные оценки показывает explain. Они
+читают только счётчики building_stats и activity_stats и не повторяют
+подзапросы самих фильтров.
+"""
+
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from sqlalchemy.exc import CompileError
+from sqlalchemy.orm import Session
+
+
+@dataclass
+class Filter:
+    name: str
+    clause: Any
+    # Сколько организаций оставляет фильтр; None - оценки нет
+    estimate: Optional[int]
+    # Оценка точная (индекс в памяти), а не по счётчикам, которые могут
+    # отставать после записи в обход API: только точный ноль отменяет запрос
+    exact: bool = False
+
+
+def is_empty(filters: List[Filter]) -> bool:
+    return any(item.exact and item.estimate == 0 for item in filters)
+
+
+def compile_sql(db: Session, statement) -> str:
+    """SQL запроса с подставленными значениями - для чтения человеком."""
+    dialect = db.get_bind().dialect
+    try:
+        return str(
+            statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        )
+    except (CompileError, NotImplementedError):
+        # Значения, которые нельзя записать литералом, остаются параметрами
+        return str(statement.compile(dialect=dialect))
+
+
+def explain(db: Session, statement) -> list:
+    """План выполнения запроса: EXPLAIN в PostgreSQL, EXPLAIN QUERY PLAN
+    в SQLite. План строится с теми же параметрами, с которыми запрос
+    выполнит поиск."""
+    dialect = db.get_bind().dialect
+    compiled = statement.compile(
+        dialect=dialect, compile_kwargs={"render_postcompile": True}
+    )
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    if dialect.name == "postgresql":
+        rows = db.connection().exec_driver_sql(
+            "EXPLAIN (FORMAT JSON) " + compiled.string, params
+        )
+        return rows.scalar()
+    rows = db.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + compiled.string, params
+    )
+    return [row[-1] for row in rows]
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Query, Request, Response
+from typing import List, Type
+from pydantic import BaseModel
 from database import schemas
-from database.connection import get_db
+from database.connection import get_read_db, get_read_session, get_session
+from api import batch, cache, exporters, fieldsets, importers
+from api.cache import response_cache
 from api.security import api_key
-from api.repositories import crud_resquests
+from api.repositories.async_repositories import AsyncActivityRepository
+from api.repositories.crud_resquests import ActivityRepository
+from api.routers.params import PageParams
 from typing import List
 
 from database import schemas
@@ -17,11 +21,6 @@ router = APIRouter(
 )
 
 
-@router.get("/", tags=["Root"])
-async def read_root():
-    return {"message": "Добро пожаловать в API справочника Организаций!"}
-
-
 @router.get(
     "/protected-route",
     tags=["Protected"],
@@ -33,32 +32,172 @@ async def get_protected_data():
     }
 
 
-def get_activity_repository(db: Session = Depends(get_db)):
-    return crud_resquests.ActivityRepository(db)
+def get_activity_repository(db=Depends(get_session)):
+    return AsyncActivityRepository(db)
+
+
+activity_fields = fieldsets.fieldset(schemas.Activity)
+
+
+def get_activity_reader(db=Depends(get_read_session), fields=Depends(activity_fields)):
+    """Репозиторий для чтения: записи в схеме из fields/include запроса."""
+    return AsyncActivityRepository(db, row_schema=fields)
+
+
+def get_activity_plain_reader(db=Depends(get_read_session)):
+    """Репозиторий для чтения в полной схеме: для ответов без fields/include."""
+    return AsyncActivityRepository(db)
 
 
 @router.post("/", response_model=schemas.Activity)
-def create_activity(
+async def create_activity(
     activity: schemas.ActivityCreate,
-    repo: crud_resquests.ActivityRepository = Depends(get_activity_repository),
+    repo: AsyncActivityRepository = Depends(get_activity_repository),
+):
+    return await repo.create(obj_in=activity)
+
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_activities(
+    request: Request,
+    format: importers.ImportFormat = Depends(importers.import_format),
+    repo: AsyncActivityRepository = Depends(get_activity_repository),
+):
+    """Массовая загрузка из NDJSON или CSV (колонки name, parent_id, key,
+    parent_key). Родитель, заданный через parent_key, должен идти в файле
+    раньше потомков."""
+    keys = {}
+    return await importers.run_import(
+        request,
+        format,
+        schemas.ActivityImport,
+        lambda rows: repo.create_many(rows=rows, keys=keys),
+    )
+
+
+@router.post("/batch", response_model=List[schemas.BatchItem[schemas.Activity]])
+async def read_activities_batch(
+    ids: schemas.BatchRequest,
+    fields: Type[BaseModel] = Depends(activity_fields),
+    repo: AsyncActivityRepository = Depends(get_activity_reader),
 ):
-    return repo.create(obj_in=activity)
+    """До BATCH_MAX_IDS видов деятельности по списку id одним запросом.
+
+    Ответ в порядке ids, для ненайденных id - found=false.
+    """
+    return await batch.respond(repo, ids, fields)
+
+
+@router.post("/stats", response_model=List[schemas.BatchItem[schemas.ActivityStats]])
+async def read_activities_stats(
+    ids: schemas.BatchRequest,
+    repo: AsyncActivityRepository = Depends(get_activity_plain_reader),
+):
+    """Счётчики организаций для списка id видов деятельности одним запросом."""
+    return await batch.respond(
+        repo, ids, schemas.ActivityStats, method="get_stats_many"
+    )
 
 
 @router.get("/", response_model=List[schemas.Activity])
-def read_activities(
-    skip: int = 0,
-    limit: int = 100,
-    repo: crud_resquests.ActivityRepository = Depends(get_activity_repository),
+async def read_activities(
+    request: Request,
+    page: PageParams = Depends(),
+    fields: Type[BaseModel] = Depends(activity_fields),
+    repo: AsyncActivityRepository = Depends(get_activity_reader),
 ):
-    activities = repo.get_multi(skip=skip, limit=limit)
-    return activities
+    async def load(response: Response):
+        activities = await repo.get_multi(
+            skip=page.skip, limit=page.limit, after=page.after
+        )
+        return page.respond(response, activities)
+
+    return await response_cache.respond(
+        request,
+        List[fields],
+        load,
+        cache.activity_tags,
+        scope=[cache.ACTIVITY_PAGES],
+    )
+
+
+@router.get("/tree", response_model=List[schemas.ActivityNode])
+async def read_activity_tree(
+    request: Request,
+    repo: AsyncActivityRepository = Depends(get_activity_plain_reader),
+):
+    """Всё дерево видов деятельности: корни с вложенными children.
+
+    Отдаётся из снимка в памяти процесса без запросов к БД; ETag зависит
+    только от содержимого дерева, If-None-Match с ним даёт 304.
+    """
+    body, etag = await repo.get_tree_json()
+    return cache.etag_response(request, body, etag)
+
+
+@router.get("/export")
+def export_activities(
+    format: exporters.ExportFormat = Query("ndjson"),
+    db=Depends(get_read_db),
+):
+    return exporters.export_response(
+        ActivityRepository(db),
+        schemas.Activity,
+        format,
+        exporters.ACTIVITY_COLUMNS,
+    )
 
 
 @router.get("/{activity_id}", response_model=schemas.Activity)
-def read_activity(
+async def read_activity(
+    activity_id: int,
+    request: Request,
+    fields: Type[BaseModel] = Depends(activity_fields),
+    repo: AsyncActivityRepository = Depends(get_activity_reader),
+):
+    return await response_cache.respond(
+        request,
+        fields,
+        lambda response: repo.get(id=activity_id),
+        cache.activity_tags,
+    )
+
+
+@router.get("/{activity_id}/subtree", response_model=List[schemas.Activity])
+async def read_activity_subtree(
+    activity_id: int,
+    request: Request,
+    fields: Type[BaseModel] = Depends(activity_fields),
+    repo: AsyncActivityRepository = Depends(get_activity_reader),
+):
+    return await response_cache.respond(
+        request,
+        List[fields],
+        lambda response: repo.get_subtree(id=activity_id),
+        cache.activity_tree_tags,
+    )
+
+
+@router.get("/{activity_id}/ancestors", response_model=List[schemas.Activity])
+async def read_activity_ancestors(
+    activity_id: int,
+    request: Request,
+    fields: Type[BaseModel] = Depends(activity_fields),
+    repo: AsyncActivityRepository = Depends(get_activity_reader),
+):
+    return await response_cache.respond(
+        request,
+        List[fields],
+        lambda response: repo.get_ancestors(id=activity_id),
+        cache.activity_tags,
+    )
+
+
+@router.get("/{activity_id}/stats", response_model=schemas.ActivityStats)
+async def read_activity_stats(
     activity_id: int,
-    repo: crud_resquests.ActivityRepository = Depends(get_activity_repository),
+    repo: AsyncActivityRepository = Depends(get_activity_plain_reader),
 ):
-    activity = repo.get(id=activity_id)
-    return activity
+    """Число организаций без выборки самих организаций: счётчики
+    обновляются при их записи."""
+    return await repo.get_stats(id=activity_id)
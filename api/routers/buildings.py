@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Query, Request, Response
+from typing import List, Type
+from pydantic import BaseModel
 from database import schemas
-from database.connection import get_db
+from database.connection import get_read_db, get_read_session, get_session
+from api import batch, cache, exporters, fieldsets, importers
+from api.cache import response_cache
 from api.security import api_key
-from api.repositories import crud_resquests
+from api.repositories.async_repositories import AsyncBuildingRepository
+from api.repositories.crud_resquests import BuildingRepository
+from api.routers.params import ClusterParams, NearbyParams, PageParams
 from typing import List
 
 from database import schemas
@@ -17,32 +21,153 @@ router = APIRouter(
 )
 
 
-def get_building_repository(db: Session = Depends(get_db)):
-    return crud_resquests.BuildingRepository(db)
+def get_building_repository(db=Depends(get_session)):
+    return AsyncBuildingRepository(db)
+
+
+building_fields = fieldsets.fieldset(schemas.Building)
+
+
+def get_building_reader(db=Depends(get_read_session), fields=Depends(building_fields)):
+    """Репозиторий для чтения: записи в схеме из fields/include запроса."""
+    return AsyncBuildingRepository(db, row_schema=fields)
+
+
+def get_building_plain_reader(db=Depends(get_read_session)):
+    """Репозиторий для чтения в полной схеме: для ответов без fields/include."""
+    return AsyncBuildingRepository(db)
 
 
 @router.post("/", response_model=schemas.Building)
-def create_building(
+async def create_building(
     building: schemas.BuildingCreate,
-    repo: crud_resquests.BuildingRepository = Depends(get_building_repository),
+    repo: AsyncBuildingRepository = Depends(get_building_repository),
+):
+    return await repo.create(obj_in=building)
+
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_buildings(
+    request: Request,
+    format: importers.ImportFormat = Depends(importers.import_format),
+    repo: AsyncBuildingRepository = Depends(get_building_repository),
+):
+    """Массовая загрузка из NDJSON или CSV (колонки address, latitude, longitude)."""
+    return await importers.run_import(
+        request,
+        format,
+        schemas.BuildingCreate,
+        lambda rows: repo.create_many(rows=rows),
+    )
+
+
+@router.post("/batch", response_model=List[schemas.BatchItem[schemas.Building]])
+async def read_buildings_batch(
+    ids: schemas.BatchRequest,
+    fields: Type[BaseModel] = Depends(building_fields),
+    repo: AsyncBuildingRepository = Depends(get_building_reader),
 ):
-    return repo.create(obj_in=building)
+    """До BATCH_MAX_IDS зданий по списку id одним запросом.
+
+    Ответ в порядке ids, для ненайденных id - found=false.
+    """
+    return await batch.respond(repo, ids, fields)
+
+
+@router.post("/stats", response_model=List[schemas.BatchItem[schemas.BuildingStats]])
+async def read_buildings_stats(
+    ids: schemas.BatchRequest,
+    repo: AsyncBuildingRepository = Depends(get_building_plain_reader),
+):
+    """Счётчики организаций для списка id зданий одним запросом."""
+    return await batch.respond(
+        repo, ids, schemas.BuildingStats, method="get_stats_many"
+    )
 
 
 @router.get("/", response_model=List[schemas.Building])
-def read_buildings(
-    skip: int = 0,
-    limit: int = 100,
-    repo: crud_resquests.BuildingRepository = Depends(get_building_repository),
+async def read_buildings(
+    request: Request,
+    page: PageParams = Depends(),
+    fields: Type[BaseModel] = Depends(building_fields),
+    repo: AsyncBuildingRepository = Depends(get_building_reader),
+):
+    async def load(response: Response):
+        buildings = await repo.get_multi(
+            skip=page.skip, limit=page.limit, after=page.after
+        )
+        return page.respond(response, buildings)
+
+    return await response_cache.respond(
+        request,
+        List[fields],
+        load,
+        cache.building_tags,
+        scope=[cache.BUILDING_PAGES],
+    )
+
+
+@router.get("/export")
+def export_buildings(
+    format: exporters.ExportFormat = Query("ndjson"),
+    db=Depends(get_read_db),
+):
+    return exporters.export_response(
+        BuildingRepository(db),
+        schemas.Building,
+        format,
+        exporters.BUILDING_COLUMNS,
+    )
+
+
+@router.get("/nearby", response_model=List[schemas.Building])
+async def read_buildings_nearby(
+    params: NearbyParams = Depends(),
+    fields: Type[BaseModel] = Depends(building_fields),
+    repo: AsyncBuildingRepository = Depends(get_building_reader),
 ):
-    buildings = repo.get_multi(skip=skip, limit=limit)
-    return buildings
+    return fieldsets.render(List[fields], await params.fetch(repo))
+
+
+@router.get("/clusters", response_model=List[schemas.BuildingCluster])
+async def read_building_clusters(
+    request: Request,
+    params: ClusterParams = Depends(),
+    repo: AsyncBuildingRepository = Depends(get_building_plain_reader),
+):
+    """Кластеры зданий для карты: ячейки geohash, длина которых зависит от
+    zoom, с центром, числом зданий и организаций. Ячейка с одним зданием
+    содержит его building_id."""
+    return await response_cache.respond(
+        request,
+        List[schemas.BuildingCluster],
+        lambda response: params.fetch(repo),
+        lambda payload: (),
+        scope=[cache.BUILDING_CLUSTERS],
+        key=params.cache_key,
+    )
 
 
 @router.get("/{building_id}", response_model=schemas.Building)
-def read_building(
+async def read_building(
+    building_id: int,
+    request: Request,
+    fields: Type[BaseModel] = Depends(building_fields),
+    repo: AsyncBuildingRepository = Depends(get_building_reader),
+):
+    return await response_cache.respond(
+        request,
+        fields,
+        lambda response: repo.get(id=building_id),
+        cache.building_tags,
+    )
+
+
+@router.get("/{building_id}/stats", response_model=schemas.BuildingStats)
+async def read_building_stats(
     building_id: int,
-    repo: crud_resquests.BuildingRepository = Depends(get_building_repository),
+    repo: AsyncBuildingRepository = Depends(get_building_plain_reader),
 ):
-    building = repo.get(id=building_id)
-    return building
+    """Число организаций без выборки самих организаций: счётчики
+    обновляются при их записи."""
+    return await repo.get_stats(id=building_id)
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, Query
+
+from api import fieldsets
+from api.repositories.async_repositories import AsyncChangeLogRepository
+from api.security import api_key
+from config import settings
+from database import schemas
+from database.connection import get_read_session
+
+router = APIRouter(
+    prefix="/changes",
+    tags=["Changes"],
+    dependencies=[Depends(api_key.verify_api_key)],
+)
+
+
+def get_change_log_reader(db=Depends(get_read_session)):
+    return AsyncChangeLogRepository(db)
+
+
+@router.get("", response_model=schemas.ChangeFeed)
+async def read_changes(
+    since: int = Query(..., ge=0, title="Последний обработанный seq"),
+    limit: int = Query(1000, ge=1, le=settings.CHANGES_MAX_LIMIT),
+    repo: AsyncChangeLogRepository = Depends(get_change_log_reader),
+):
+    """Изменения организаций, зданий и видов деятельности после since
+    в порядке seq. Потребитель повторяет запрос с next_since, пока has_more;
+    на 410 - полная синхронизация списками и продолжение с /changes/head."""
+    return fieldsets.render(
+        schemas.ChangeFeed, await repo.get_changes(since, limit=limit)
+    )
+
+
+@router.get("/head", response_model=schemas.ChangeLogHead)
+async def read_changes_head(
+    repo: AsyncChangeLogRepository = Depends(get_change_log_reader),
+):
+    """Последний seq журнала: запоминается до начала полной синхронизации."""
+    return await repo.get_head()
@@ -0,0 +1,57 @@
+import asyncio
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.exc import SQLAlchemyError
+
+from api import metrics, startup
+from api.security import api_key
+from database import pool
+
+router = APIRouter(tags=["Monitoring"])
+
+# Сколько ждать SELECT 1 в проверке готовности, секунды
+READY_CHECK_TIMEOUT = 2.0
+
+
+@router.get("/internal/pool", dependencies=[Depends(api_key.verify_api_key)])
+async def read_pool_stats():
+    """Снимок пулов соединений: занято, overflow, оборот соединений и
+    гистограмма ожидания свободного соединения (секунды)."""
+    return {name: metrics.snapshot() for name, metrics in pool.pools.items()}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    """Метрики в текстовом формате Prometheus. Без API ключа: сборщик
+    метрик ходит без заголовков, доступ ограничивается на уровне сети."""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@router.get("/health/live")
+async def read_liveness():
+    """Процесс жив и обслуживает запросы; БД не проверяется, чтобы её
+    недоступность не приводила к перезапуску процессов."""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def read_readiness():
+    """Готовность принимать трафик: прогрев завершён и БД отвечает."""
+    if not startup.state.ready:
+        return JSONResponse(
+            {"status": "starting", **startup.state.snapshot()}, status_code=503
+        )
+    try:
+        await asyncio.wait_for(startup.ping(), READY_CHECK_TIMEOUT)
+    except (SQLAlchemyError, OSError, asyncio.TimeoutError) as error:
+        return JSONResponse(
+            {
+                "status": "unavailable",
+                "error": (str(error) or type(error).__name__).splitlines()[0],
+            },
+            status_code=503,
+        )
+    return {"status": "ready", **startup.state.snapshot()}
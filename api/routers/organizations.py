@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
+from typing import List, Literal, Type
+from pydantic import BaseModel
 from database import schemas
-from database.connection import get_db
+from database.connection import get_read_db, get_read_session, get_session
+from api import batch, cache, exporters, fieldsets, importers
+from api.cache import response_cache
 from api.security import api_key
-from api.repositories import crud_resquests
+from api.repositories.async_repositories import AsyncOrganizationRepository
+from api.repositories.crud_resquests import (
+    SUGGEST_DEFAULT_LIMIT,
+    OrganizationRepository,
+)
+from api.routers.params import (
+    NearbyParams,
+    OptionalPageParams,
+    PageParams,
+    SearchParams,
+)
 from typing import List
 
 from database import schemas
@@ -16,85 +29,269 @@ router = APIRouter(
 )
 
 
-def get_organization_repository(db: Session = Depends(get_db)):
-    return crud_resquests.OrganizationRepository(db)
+def get_organization_repository(db=Depends(get_session)):
+    return AsyncOrganizationRepository(db)
+
+
+organization_fields = fieldsets.fieldset(schemas.Organization)
+
+
+def get_organization_reader(
+    db=Depends(get_read_session), fields=Depends(organization_fields)
+):
+    """Репозиторий для чтения: записи в схеме из fields/include запроса."""
+    return AsyncOrganizationRepository(db, row_schema=fields)
 
 
 @router.post("/", response_model=schemas.Organization)
-def create_organization(
+async def create_organization(
     organization: schemas.OrganizationCreate,
-    repo: crud_resquests.OrganizationRepository = Depends(get_organization_repository),
+    repo: AsyncOrganizationRepository = Depends(get_organization_repository),
 ):
-    return repo.create(obj_in=organization)
+    return await repo.create(obj_in=organization)
+
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_organizations(
+    request: Request,
+    format: importers.ImportFormat = Depends(importers.import_format),
+    repo: AsyncOrganizationRepository = Depends(get_organization_repository),
+):
+    """Массовая загрузка из NDJSON или CSV (колонки name, building_id,
+    phone_numbers и activity_ids, списки через ";")."""
+    return await importers.run_import(
+        request,
+        format,
+        schemas.OrganizationImport,
+        lambda rows: repo.create_many(rows=rows),
+        importers.organization_from_csv,
+    )
+
+
+@router.post("/batch", response_model=List[schemas.BatchItem[schemas.Organization]])
+async def read_organizations_batch(
+    ids: schemas.BatchRequest,
+    fields: Type[BaseModel] = Depends(organization_fields),
+    repo: AsyncOrganizationRepository = Depends(get_organization_reader),
+):
+    """До BATCH_MAX_IDS организаций по списку id одним запросом.
+
+    Ответ в порядке ids, для ненайденных id - found=false.
+    """
+    return await batch.respond(repo, ids, fields)
 
 
 @router.get("/", response_model=List[schemas.Organization])
-def read_organizations(
-    skip: int = 0,
-    limit: int = 100,
-    repo: crud_resquests.OrganizationRepository = Depends(get_organization_repository),
+async def read_organizations(
+    request: Request,
+    page: PageParams = Depends(),
+    fields: Type[BaseModel] = Depends(organization_fields),
+    repo: AsyncOrganizationRepository = Depends(get_organization_reader),
+):
+    async def load(response: Response):
+        organizations = await repo.get_multi(
+            skip=page.skip, limit=page.limit, after=page.after
+        )
+        return page.respond(response, organizations)
+
+    return await response_cache.respond(
+        request,
+        List[fields],
+        load,
+        cache.organization_tags,
+        scope=[cache.ORGANIZATION_PAGES],
+    )
+
+
+@router.get("/export")
+def export_organizations(
+    format: exporters.ExportFormat = Query("ndjson"),
+    db=Depends(get_read_db),
+):
+    """Все организации со зданием, видами деятельности и телефонами.
+
+    Выгрузка всегда идёт через синхронную сессию: серверный курсор живёт,
+    пока ответ отдаётся клиенту, независимо от DATABASE_ASYNC.
+    """
+    return exporters.export_response(
+        OrganizationRepository(db),
+        schemas.Organization,
+        format,
+        exporters.ORGANIZATION_COLUMNS,
+        exporters.organization_row,
+    )
+
+
+@router.get("/nearby", response_model=List[schemas.Organization])
+async def read_organizations_nearby(
+    params: NearbyParams = Depends(),
+    fields: Type[BaseModel] = Depends(organization_fields),
+    repo: AsyncOrganizationRepository = Depends(get_organization_reader),
+):
+    return fieldsets.render(List[fields], await params.fetch(repo))
+
+
+@router.get("/suggest", response_model=List[schemas.OrganizationSuggestion])
+async def suggest_organizations(
+    prefix: str = Query(..., min_length=1, max_length=100, title="Начало слова"),
+    limit: int = Query(SUGGEST_DEFAULT_LIMIT, ge=1, le=50),
+    repo: AsyncOrganizationRepository = Depends(get_organization_reader),
 ):
-    organizations = repo.get_multi(skip=skip, limit=limit)
-    return organizations
+    """id и названия для строки поиска без обращения к БД."""
+    return fieldsets.render(
+        List[schemas.OrganizationSuggestion], await repo.suggest(prefix, limit=limit)
+    )
+
+
+@router.get("/search", response_model=List[schemas.Organization])
+async def search_organizations(
+    params: SearchParams = Depends(),
+    fields: Type[BaseModel] = Depends(organization_fields),
+    repo: AsyncOrganizationRepository = Depends(get_organization_reader),
+):
+    """Организации по любому сочетанию фильтров одним SQL запросом.
+
+    Фильтр с точной нулевой оценкой по индексу в памяти отменяет запрос.
+    explain=true возвращает фильтры с оценками по счётчикам, SQL и план.
+    """
+    found = await params.fetch(repo)
+    if params.explain:
+        return JSONResponse(found)
+    response = fieldsets.render(List[fields], found)
+    params.respond(response, found)
+    return response
 
 
 @router.get("/{organization_id}", response_model=schemas.Organization)
-def read_organization(
+async def read_organization(
     organization_id: int,
-    repo: crud_resquests.OrganizationRepository = Depends(get_organization_repository),
+    request: Request,
+    fields: Type[BaseModel] = Depends(organization_fields),
+    repo: AsyncOrganizationRepository = Depends(get_organization_reader),
 ):
-    organization = repo.get(id=organization_id)
-    return organization
+    return await response_cache.respond(
+        request,
+        fields,
+        lambda response: repo.get(id=organization_id),
+        cache.organization_tags,
+    )
 
 
 @router.put("/{organization_id}", response_model=schemas.Organization)
-def update_organization(
+async def update_organization(
     organization_id: int,
     organization: schemas.OrganizationUpdate,
-    repo: crud_resquests.OrganizationRepository = Depends(get_organization_repository),
+    repo: AsyncOrganizationRepository = Depends(get_organization_repository),
 ):
-    return repo.update(id=organization_id, obj_in=organization)
+    return await repo.update(id=organization_id, obj_in=organization)
 
 
 @router.delete("/{organization_id}")
-def delete_organization(
+async def delete_organization(
     organization_id: int,
-    repo: crud_resquests.OrganizationRepository = Depends(get_organization_repository),
+    repo: AsyncOrganizationRepository = Depends(get_organization_repository),
 ):
-    return repo.delete(id=organization_id)
+    return await repo.delete(id=organization_id)
 
 
 @router.get("/by_building/{building_id}", response_model=List[schemas.Organization])
-def read_organizations_by_building(
+async def read_organizations_by_building(
     building_id: int,
-    repo: crud_resquests.OrganizationRepository = Depends(get_organization_repository),
+    request: Request,
+    page: OptionalPageParams = Depends(),
+    fields: Type[BaseModel] = Depends(organization_fields),
+    repo: AsyncOrganizationRepository = Depends(get_organization_reader),
 ):
-    organizations = repo.get_by_building(building_id=building_id)
-    return organizations
+    async def load(response: Response):
+        organizations = await repo.get_by_building(
+            building_id=building_id, limit=page.limit, after=page.after
+        )
+        return page.respond(response, organizations)
+
+    return await response_cache.respond(
+        request,
+        List[fields],
+        load,
+        cache.organization_tags,
+        scope=[cache.building_organizations_tag(building_id)],
+    )
 
 
 @router.get("/by_activity/{activity_id}", response_model=List[schemas.Organization])
-def read_organizations_by_activity(
+async def read_organizations_by_activity(
     activity_id: int,
-    repo: crud_resquests.OrganizationRepository = Depends(get_organization_repository),
+    request: Request,
+    include_children: bool = Query(False, title="Включая вложенные виды деятельности"),
+    page: OptionalPageParams = Depends(),
+    fields: Type[BaseModel] = Depends(organization_fields),
+    repo: AsyncOrganizationRepository = Depends(get_organization_reader),
 ):
-    organizations = repo.get_by_activity(activity_id=activity_id)
-    return organizations
+    async def load(response: Response):
+        organizations = await repo.get_by_activity(
+            activity_id=activity_id,
+            include_children=include_children,
+            limit=page.limit,
+            after=page.after,
+        )
+        return page.respond(response, organizations)
+
+    return await response_cache.respond(
+        request,
+        List[fields],
+        load,
+        cache.organization_tags,
+        scope=[cache.activity_organizations_tag(activity_id)],
+    )
 
 
 @router.get("/search_by_activity/", response_model=List[schemas.Organization])
-def search_organizations_by_activity(
+async def search_organizations_by_activity(
+    request: Request,
     activity_name: str = Query(..., title="Название вида деятельности"),
-    repo: crud_resquests.OrganizationRepository = Depends(get_organization_repository),
+    page: OptionalPageParams = Depends(),
+    fields: Type[BaseModel] = Depends(organization_fields),
+    repo: AsyncOrganizationRepository = Depends(get_organization_reader),
 ):
-    organizations = repo.search_by_activity(activity_name=activity_name)
-    return organizations
+    async def load(response: Response):
+        organizations = await repo.search_by_activity(
+            activity_name=activity_name, limit=page.limit, after=page.after
+        )
+        return page.respond(response, organizations)
+
+    # Подходящие виды деятельности заранее неизвестны: выборка сбрасывается
+    # вместе с поиском по названию при любом импорте организаций
+    return await response_cache.respond(
+        request,
+        List[fields],
+        load,
+        cache.organization_tags,
+        scope=[cache.ORGANIZATION_SEARCH],
+    )
 
 
 @router.get("/search_by_name/", response_model=List[schemas.Organization])
-def search_organizations_by_name(
+async def search_organizations_by_name(
+    request: Request,
     name: str = Query(..., title="Название организации"),
-    repo: crud_resquests.OrganizationRepository = Depends(get_organization_repository),
+    sort: Literal["id", "relevance"] = Query(
+        "id", title="relevance - сначала наиболее похожие названия"
+    ),
+    page: OptionalPageParams = Depends(),
+    fields: Type[BaseModel] = Depends(organization_fields),
+    repo: AsyncOrganizationRepository = Depends(get_organization_reader),
 ):
-    organizations = repo.search_by_name(name=name)
-    return organizations
+    async def load(response: Response):
+        if sort == "relevance":
+            return await repo.search_by_name(name=name, limit=page.limit, ranked=True)
+        organizations = await repo.search_by_name(
+            name=name, limit=page.limit, after=page.after
+        )
+        return page.respond(response, organizations)
+
+    return await response_cache.respond(
+        request,
+        List[fields],
+        load,
+        cache.organization_tags,
+        scope=[cache.ORGANIZATION_SEARCH],
+    )
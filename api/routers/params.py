@@ -0,0 +1,254 @@
+import base64
+import json
+from typing import List, Literal, Optional
+
+from fastapi import HTTPException, Query, Response, status
+
+from config import settings
+from database import geo
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_id = json.loads(raw)["id"]
+    except (ValueError, KeyError, TypeError):
+        last_id = None
+    if not isinstance(last_id, int):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор"
+        )
+    return last_id
+
+
+class PageParams:
+    """Курсорная пагинация по первичному ключу; skip оставлен для совместимости.
+
+    Если страница заполнена целиком, курсор следующей страницы возвращается
+    в заголовке X-Next-Cursor и передаётся обратно как after.
+    """
+
+    def __init__(
+        self,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=1000),
+        after: Optional[str] = Query(None, title="Курсор следующей страницы"),
+    ):
+        self.skip = skip
+        self.limit = limit
+        self.after = decode_cursor(after) if after else None
+
+    def respond(self, response: Response, items: List) -> List:
+        if self.limit is not None and len(items) == self.limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1].id)
+        return items
+
+
+class OptionalPageParams(PageParams):
+    """Для выборок, которые исторически возвращались целиком: без limit - все строки."""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=1000),
+        after: Optional[str] = Query(None, title="Курсор следующей страницы"),
+    ):
+        super().__init__(skip=0, limit=limit, after=after)
+
+
+class NearbyParams:
+    """Поиск в радиусе от точки либо внутри прямоугольника карты."""
+
+    def __init__(
+        self,
+        latitude: Optional[float] = Query(None, ge=-90, le=90, title="Широта центра"),
+        longitude: Optional[float] = Query(
+            None, ge=-180, le=180, title="Долгота центра"
+        ),
+        radius_km: Optional[float] = Query(None, gt=0, le=20000, title="Радиус, км"),
+        min_latitude: Optional[float] = Query(None, ge=-90, le=90),
+        min_longitude: Optional[float] = Query(None, ge=-180, le=180),
+        max_latitude: Optional[float] = Query(None, ge=-90, le=90),
+        max_longitude: Optional[float] = Query(None, ge=-180, le=180),
+        limit: int = Query(100, ge=1, le=1000),
+    ):
+        self.limit = limit
+        self.center = None
+        self.bbox = None
+        if None not in (latitude, longitude, radius_km):
+            self.center = (latitude, longitude, radius_km)
+        elif None not in (min_latitude, min_longitude, max_latitude, max_longitude):
+            # min_longitude > max_longitude - прямоугольник через антимеридиан
+            if min_latitude > max_latitude:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Минимальная широта прямоугольника больше максимальной",
+                )
+            self.bbox = (min_latitude, min_longitude, max_latitude, max_longitude)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Укажите latitude, longitude и radius_km "
+                "либо границы прямоугольника min_/max_latitude, min_/max_longitude",
+            )
+
+    async def fetch(self, repo):
+        if self.center is not None:
+            return await repo.get_nearby(*self.center, limit=self.limit)
+        return await repo.get_in_bbox(*self.bbox, limit=self.limit)
+
+
+# Самый крупный масштаб тайлов карты
+MAX_ZOOM = 22
+
+
+class ClusterParams:
+    """Прямоугольник карты и масштаб для кластеров зданий.
+
+    bbox - в порядке карт (запад, юг, восток, север), как toBBoxString
+    в Leaflet; запад восточнее востока - прямоугольник через антимеридиан,
+    он считается двумя половинами. Прямоугольник расширяется до границ
+    ячеек geohash, поэтому ответы для близких прямоугольников одного
+    масштаба совпадают и кэшируются одной записью.
+    """
+
+    def __init__(
+        self,
+        bbox: str = Query(
+            ..., title="min_longitude,min_latitude,max_longitude,max_latitude"
+        ),
+        zoom: int = Query(..., ge=0, le=MAX_ZOOM, title="Масштаб карты"),
+    ):
+        try:
+            min_lon, min_lat, max_lon, max_lat = (
+                float(value) for value in bbox.split(",")
+            )
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="bbox: четыре числа через запятую - "
+                "min_longitude,min_latitude,max_longitude,max_latitude",
+            )
+        if not (
+            -90 <= min_lat <= max_lat <= 90
+            and -180 <= min_lon <= 180
+            and -180 <= max_lon <= 180
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="bbox: координаты вне диапазона или минимум широты больше "
+                "максимума",
+            )
+        self.precision = geo.zoom_precision(zoom)
+        # Ячейки geohash не пересекают антимеридиан: кластеры половин не
+        # пересекаются, и ответ - просто их объединение
+        self.boxes = [
+            geo.snap_to_cells(self.precision, *box)
+            for box in geo.split_box(min_lat, min_lon, max_lat, max_lon)
+        ]
+        height, width = geo.geohash_cell(self.precision)
+        cells = sum(
+            round((box[2] - box[0]) / height) * round((box[3] - box[1]) / width)
+            for box in self.boxes
+        )
+        if cells > settings.CLUSTERS_MAX_CELLS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Прямоугольник слишком велик для zoom={zoom}: "
+                f"больше {settings.CLUSTERS_MAX_CELLS} ячеек",
+            )
+
+    @property
+    def cache_key(self) -> str:
+        return "/buildings/clusters?" + ",".join(
+            [str(self.precision), *(repr(value) for box in self.boxes for value in box)]
+        )
+
+    async def fetch(self, repo):
+        clusters = []
+        for box in self.boxes:
+            clusters.extend(await repo.get_clusters(self.precision, *box))
+        return sorted(clusters, key=lambda cluster: cluster.geohash)
+
+
+class SearchParams:
+    """Составной поиск организаций: любое сочетание фильтров одним запросом.
+
+    Без sort организации идут от точки latitude/longitude, если она задана,
+    иначе по id с курсором в X-Next-Cursor, как у списков.
+    """
+
+    def __init__(
+        self,
+        name: Optional[str] = Query(None, min_length=1, title="Часть названия"),
+        activity_id: Optional[int] = Query(None, title="Вид деятельности"),
+        include_children: bool = Query(
+            True, title="Вместе с вложенными видами деятельности"
+        ),
+        activity_name: Optional[str] = Query(
+            None, min_length=1, title="Часть названия вида деятельности"
+        ),
+        building_id: Optional[int] = Query(None, title="Здание"),
+        latitude: Optional[float] = Query(None, ge=-90, le=90, title="Широта точки"),
+        longitude: Optional[float] = Query(
+            None, ge=-180, le=180, title="Долгота точки"
+        ),
+        radius_km: Optional[float] = Query(None, gt=0, le=20000, title="Радиус, км"),
+        sort: Optional[Literal["id", "name", "distance"]] = Query(None),
+        limit: int = Query(100, ge=1, le=1000),
+        after: Optional[str] = Query(None, title="Курсор следующей страницы"),
+        explain: bool = Query(False, title="Вернуть SQL и план вместо организаций"),
+    ):
+        if (latitude is None) != (longitude is None):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="latitude и longitude указываются вместе",
+            )
+        point = latitude is not None
+        if radius_km is not None and not point:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Для radius_km укажите latitude и longitude",
+            )
+        if sort == "distance" and not point:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Для sort=distance укажите latitude и longitude",
+            )
+        self.filters = {
+            "name": name,
+            "activity_id": activity_id,
+            "activity_name": activity_name,
+            "building_id": building_id,
+            "radius_km": radius_km,
+        }
+        if all(value is None for value in self.filters.values()):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Укажите хотя бы один фильтр: name, activity_id, "
+                "activity_name, building_id или radius_km",
+            )
+        self.filters.update(
+            include_children=include_children, latitude=latitude, longitude=longitude
+        )
+        self.sort = sort or ("distance" if point else "id")
+        self.limit = limit
+        self.after = decode_cursor(after) if after and self.sort == "id" else None
+        self.explain = explain
+
+    def respond(self, response: Response, items: List) -> List:
+        if self.sort == "id" and len(items) == self.limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1].id)
+        return items
+
+    async def fetch(self, repo):
+        method = repo.explain_search if self.explain else repo.search
+        return await method(
+            sort=self.sort, limit=self.limit, after=self.after, **self.filters
+        )
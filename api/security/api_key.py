@@ -1,12 +1,44 @@
+import math
+
 from fastapi import HTTPException, status, Header
-from config import settings
+from starlette.concurrency import run_in_threadpool
+
+from api.security.keys import key_store
+from api.security.limits import limiter_for
 
 
-# Простая зависимость для проверки API ключа
+# Зависимость роутеров: проверяет ключ и лимиты потребителя. Роутерные
+# зависимости выполняются раньше зависимостей эндпоинта, поэтому запрос
+# сверх лимита получает 429 до открытия сессии БД.
 async def verify_api_key(x_api_key: str = Header(...)):
-    if x_api_key != settings.API_KEY:
+    # Ждать чтения ключей из БД приходится только до первой загрузки;
+    # устаревший снимок обновляется в фоне, запрос идёт по прежнему
+    if not key_store.loaded:
+        await run_in_threadpool(key_store.refresh)
+    elif key_store.stale:
+        key_store.refresh_in_background()
+    consumer = key_store.lookup(x_api_key)
+    if consumer is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный API ключ",
         )
-    return x_api_key
+
+    limiter = limiter_for(consumer)
+    retry_after = limiter.bucket.take()
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Превышен лимит запросов",
+            headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+        )
+    if not limiter.enter():
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много одновременных запросов",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        yield x_api_key
+    finally:
+        limiter.exit()
@@ -0,0 +1,200 @@
+"""Реестр ключей API: ключи хранятся в таблице api_keys в виде SHA-256,
+в памяти процесса - снимок всех активных ключей, обновляемый раз в
+API_KEY_CACHE_TTL секунд. Проверка ключа не обращается к БД.
+
+Выпуск ключа (сам ключ печатается один раз и больше нигде не хранится):
+
+    python -m api.security.keys create --name partner --rate 10 --burst 20
+"""
+
+import argparse
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from dataclasses import dataclass
+from threading import Lock, Thread
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import models
+
+logger = logging.getLogger("api.security")
+
+
+@dataclass(frozen=True)
+class Consumer:
+    id: int
+    name: str
+    rate_limit: float
+    burst: int
+    max_concurrency: int
+
+
+# Служебный ключ из settings.API_KEY; id 0 не пересекается с ключами из БД
+SERVICE_CONSUMER_ID = 0
+
+
+def hash_key(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _consumer(row: models.ApiKey) -> Consumer:
+    return Consumer(
+        id=row.id,
+        name=row.name,
+        rate_limit=(
+            row.rate_limit
+            if row.rate_limit is not None
+            else settings.API_KEY_DEFAULT_RATE
+        ),
+        burst=row.burst if row.burst is not None else settings.API_KEY_DEFAULT_BURST,
+        max_concurrency=(
+            row.max_concurrency
+            if row.max_concurrency is not None
+            else settings.API_KEY_DEFAULT_CONCURRENCY
+        ),
+    )
+
+
+class ApiKeyStore:
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self.session_factory = session_factory
+        self._consumers: Dict[str, Consumer] = {}
+        self._loaded_at = float("-inf")
+        self._lock = Lock()
+        self._refreshing = Lock()
+
+    @property
+    def loaded(self) -> bool:
+        """Снимок загружен хотя бы раз и не сброшен invalidate."""
+        return self._loaded_at != float("-inf")
+
+    @property
+    def stale(self) -> bool:
+        return time.monotonic() - self._loaded_at >= settings.API_KEY_CACHE_TTL
+
+    def refresh_in_background(self) -> None:
+        """Запускает refresh в отдельном потоке, если он ещё не идёт.
+
+        Запросы тем временем проверяются по прежнему снимку и не ждут БД.
+        """
+        if not self._refreshing.acquire(blocking=False):
+            return
+
+        def run() -> None:
+            try:
+                self.refresh()
+            finally:
+                self._refreshing.release()
+
+        Thread(target=run, name="api-key-refresh", daemon=True).start()
+
+    def refresh(self) -> None:
+        """Перечитывает активные ключи; вызывается из пула потоков или
+        фонового потока refresh_in_background."""
+        with self._lock:
+            # Пока поток ждал блокировку, снимок мог обновить другой поток
+            if not self.stale:
+                return
+            try:
+                with self._session() as db:
+                    rows = db.scalars(
+                        select(models.ApiKey).where(models.ApiKey.is_active.is_(True))
+                    ).all()
+                    consumers = {row.key_hash: _consumer(row) for row in rows}
+            except SQLAlchemyError:
+                # Остаёмся на прежнем снимке и пробуем снова через TTL
+                logger.exception("Не удалось загрузить ключи API")
+            else:
+                self._consumers = consumers
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        self._loaded_at = float("-inf")
+
+    def lookup(self, key: str) -> Optional[Consumer]:
+        """Потребитель по ключу из снимка; без обращения к БД."""
+        if settings.API_KEY and hmac.compare_digest(
+            key.encode(), settings.API_KEY.encode()
+        ):
+            return SERVICE_CONSUMER
+        # Поиск идёт по хэшу: время словарного поиска не зависит от того,
+        # насколько предъявленный ключ похож на настоящий
+        return self._consumers.get(hash_key(key))
+
+    def _session(self) -> Session:
+        if self.session_factory is None:
+            from database.connection import SessionLocal
+
+            self.session_factory = SessionLocal
+        return self.session_factory()
+
+
+SERVICE_CONSUMER = Consumer(
+    id=SERVICE_CONSUMER_ID,
+    name="service",
+    rate_limit=settings.API_KEY_DEFAULT_RATE,
+    burst=settings.API_KEY_DEFAULT_BURST,
+    max_concurrency=settings.API_KEY_DEFAULT_CONCURRENCY,
+)
+
+key_store = ApiKeyStore()
+
+
+def create_key(
+    db: Session,
+    name: str,
+    rate_limit: Optional[float] = None,
+    burst: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> str:
+    """Создаёт ключ и возвращает его в открытом виде - единственный раз."""
+    key = secrets.token_urlsafe(32)
+    db.add(
+        models.ApiKey(
+            name=name,
+            key_hash=hash_key(key),
+            rate_limit=rate_limit,
+            burst=burst,
+            max_concurrency=max_concurrency,
+        )
+    )
+    db.commit()
+    key_store.invalidate()
+    return key
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Управление ключами API")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create")
+    create.add_argument("--name", required=True)
+    create.add_argument("--rate", type=float, help="запросов в секунду")
+    create.add_argument("--burst", type=int)
+    create.add_argument("--concurrency", type=int)
+    revoke = commands.add_parser("revoke")
+    revoke.add_argument("id", type=int)
+    args = parser.parse_args()
+
+    from database.connection import SessionLocal
+
+    with SessionLocal() as db:
+        if args.command == "create":
+            print(create_key(db, args.name, args.rate, args.burst, args.concurrency))
+            return
+        row = db.get(models.ApiKey, args.id)
+        if row is None:
+            parser.error(f"ключ {args.id} не найден")
+        row.is_active = False
+        db.commit()
+        print(f"ключ {row.id} ({row.name}) отозван")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import time
+from threading import Lock
+from typing import Dict
+
+from api.security.keys import Consumer
+
+# Верхняя граница Retry-After, секунды
+MAX_RETRY_AFTER = 60.0
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше burst про запас."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = Lock()
+
+    def take(self) -> float:
+        """0, если токен взят, иначе сколько секунд ждать следующего."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            if self.rate <= 0:
+                # Ключ без пополнения: только burst запросов
+                return MAX_RETRY_AFTER
+            return min((1 - self.tokens) / self.rate, MAX_RETRY_AFTER)
+
+
+class ConsumerLimiter:
+    def __init__(self, consumer: Consumer):
+        self.consumer = consumer
+        self.bucket = TokenBucket(consumer.rate_limit, consumer.burst)
+        self.active = 0
+        self._lock = Lock()
+
+    def enter(self) -> bool:
+        with self._lock:
+            if self.active >= self.consumer.max_concurrency:
+                return False
+            self.active += 1
+            return True
+
+    def exit(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def update(self, consumer: Consumer) -> None:
+        """Новые лимиты потребителя. Счётчик одновременных запросов
+        сохраняется: начатые до изменения запросы выходят через этот же
+        ограничитель."""
+        with self._lock:
+            if (consumer.rate_limit, consumer.burst) != (
+                self.consumer.rate_limit,
+                self.consumer.burst,
+            ):
+                self.bucket = TokenBucket(consumer.rate_limit, consumer.burst)
+            self.consumer = consumer
+
+
+_limiters: Dict[int, ConsumerLimiter] = {}
+_lock = Lock()
+
+
+def limiter_for(consumer: Consumer) -> ConsumerLimiter:
+    """Ограничитель потребителя; обновляется на месте, если изменились его
+    лимиты."""
+    limiter = _limiters.get(consumer.id)
+    if limiter is None:
+        with _lock:
+            limiter = _limiters.get(consumer.id)
+            if limiter is None:
+                limiter = _limiters[consumer.id] = ConsumerLimiter(consumer)
+    if limiter.consumer != consumer:
+        limiter.update(consumer)
+    return limiter
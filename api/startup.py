@@ -0,0 +1,141 @@
+"""Запуск процесса: прогрев пулов соединений и индексов в памяти, готовность.
+
+Схема БД ведётся только миграциями Alembic, при запуске она не проверяется
+и не создаётся. Если БД недоступна, процесс всё равно начинает принимать
+запросы (/health/live - 200), а прогрев повторяется в фоне; до его окончания
+/health/ready отвечает 503.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+logger = logging.getLogger("api.startup")
+
+
+class StartupState:
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.attempts = 0
+        # Секунды: import_s - импорт приложения, warmup_s - прогрев
+        self.timings: Dict[str, float] = {}
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "attempts": self.attempts,
+            "timings": self.timings,
+        }
+
+
+state = StartupState()
+
+
+def _warm_pool(engine: Engine, connections: int) -> None:
+    # Соединения держатся одновременно, иначе пул отдавал бы одно и то же
+    with ExitStack() as stack:
+        for _ in range(connections):
+            stack.enter_context(engine.connect()).execute(text("SELECT 1"))
+
+
+def _warm_sync() -> None:
+    from api.repositories import crud_resquests
+    from api.security.keys import key_store
+    from database.connection import SessionLocal, engine, replica_engines
+
+    connections = min(settings.DATABASE_POOL_WARMUP, settings.DATABASE_POOL_SIZE)
+    for pool_engine in [engine, *replica_engines]:
+        _warm_pool(pool_engine, connections)
+    with SessionLocal() as db:
+        crud_resquests.warm_up(db)
+    key_store.refresh()
+
+
+async def _warm_async() -> None:
+    from database.async_connection import async_engine, async_replica_engines
+
+    connections = min(settings.DATABASE_POOL_WARMUP, settings.DATABASE_POOL_SIZE)
+    for pool_engine in [async_engine, *async_replica_engines]:
+        async with AsyncExitStack() as stack:
+            for _ in range(connections):
+                connection = await stack.enter_async_context(pool_engine.connect())
+                await connection.execute(text("SELECT 1"))
+
+
+async def warm_up() -> None:
+    """Прогревает пулы и индексы; при ошибке БД повторяет до успеха."""
+    started = time.perf_counter()
+    while True:
+        state.attempts += 1
+        try:
+            await run_in_threadpool(_warm_sync)
+            if settings.DATABASE_ASYNC:
+                await _warm_async()
+        except (SQLAlchemyError, OSError) as error:
+            state.error = str(error).splitlines()[0]
+            logger.warning(
+                "прогрев не удался (попытка %d): %s", state.attempts, state.error
+            )
+            await asyncio.sleep(settings.STARTUP_RETRY_INTERVAL)
+            continue
+        state.error = None
+        state.ready = True
+        state.timings["warmup_s"] = round(time.perf_counter() - started, 3)
+        logger.info("прогрев завершён за %.3f с", state.timings["warmup_s"])
+        return
+
+
+def _ping_sync() -> None:
+    from database.connection import engine
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+async def ping() -> None:
+    """SELECT 1 в основную базу через пул текущего режима."""
+    if settings.DATABASE_ASYNC:
+        from database.async_connection import async_engine
+
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        return
+    await run_in_threadpool(_ping_sync)
+
+
+async def _dispose() -> None:
+    from database.connection import engine, replica_engines
+
+    for pool_engine in [engine, *replica_engines]:
+        await run_in_threadpool(pool_engine.dispose)
+    if settings.DATABASE_ASYNC:
+        from database.async_connection import async_engine, async_replica_engines
+
+        for pool_engine in [async_engine, *async_replica_engines]:
+            await pool_engine.dispose()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    task = asyncio.create_task(warm_up())
+    try:
+        await asyncio.wait_for(asyncio.shield(task), settings.STARTUP_WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(
+            "прогрев не завершился за %s с, запросы принимаются до его окончания",
+            settings.STARTUP_WARMUP_TIMEOUT,
+        )
+    yield
+    task.cancel()
+    await _dispose()
@@ -1,18 +1,40 @@
 # app/main.py
-from fastapi import FastAPI
-from database.models import Base
-from api import register_routers
+import time
+
+_import_started = time.perf_counter()
 
-from database.connection import engine
+from fastapi import FastAPI
+from api import metrics, register_routers, startup
+from config import settings
 
-Base.metadata.create_all(bind=engine)
+from database.connection import engine, replica_engines
 
+# Схема создаётся миграциями: alembic upgrade head перед запуском
 app = FastAPI(
     title="Справочник Организаций, Зданий, Деятельности",
     description="REST API для управления справочником организаций, зданий и видов деятельности.",
     version="0.1.0",
+    lifespan=startup.lifespan,
 )
 
 register_routers(app)
 
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument(engine)
+for replica_engine in replica_engines:
+    metrics.instrument(replica_engine)
+if settings.DATABASE_ASYNC:
+    from database.async_connection import async_engine, async_replica_engines
+
+    for async_engine_ in [async_engine, *async_replica_engines]:
+        metrics.instrument(async_engine_.sync_engine)
+
+
+startup.state.timings["import_s"] = round(time.perf_counter() - _import_started, 3)
+
+
+@app.get("/", tags=["Root"])
+async def read_root():
+    return {"message": "Добро пожаловать в API справочника Организаций!"}
+
 
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+# Служебный ключ API_KEY ограничен лимитами по умолчанию; замер должен
+# упираться в приложение, а не в лимиты. Вызывать до импорта приложения
+NO_RATE_LIMITS = {
+    "API_KEY_DEFAULT_RATE": "1000000",
+    "API_KEY_DEFAULT_BURST": "1000000",
+    "API_KEY_DEFAULT_CONCURRENCY": "100000",
+}
+
+
+def disable_rate_limits() -> None:
+    for name, value in NO_RATE_LIMITS.items():
+        os.environ.setdefault(name, value)
+
+
+class ASGIClient:
+    """Минимальный клиент, вызывающий ASGI приложение напрямую, без сети.
+
+    Замеряется только работа приложения: роутинг, БД и сериализация.
+    """
+
+    def __init__(self, app, headers: Optional[Dict[str, str]] = None):
+        self.app = app
+        self.headers = [
+            (key.lower().encode(), value.encode())
+            for key, value in (headers or {}).items()
+        ]
+        self._lifespan: Optional[asyncio.Task] = None
+        self._lifespan_queue: Optional[asyncio.Queue] = None
+
+    async def startup(self) -> None:
+        self._lifespan_queue = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+
+        async def receive():
+            return await self._lifespan_queue.get()
+
+        async def send(message):
+            if message["type"].startswith("lifespan.startup") and not started.done():
+                started.set_result(message)
+
+        self._lifespan = asyncio.create_task(
+            self.app({"type": "lifespan", "asgi": {"version": "3.0"}}, receive, send)
+        )
+        await self._lifespan_queue.put({"type": "lifespan.startup"})
+        message = await started
+        if message["type"] == "lifespan.startup.failed":
+            raise RuntimeError(message.get("message", "lifespan startup failed"))
+
+    async def shutdown(self) -> None:
+        if self._lifespan is not None:
+            await self._lifespan_queue.put({"type": "lifespan.shutdown"})
+            await self._lifespan
+
+    async def request(
+        self, method: str, url: str, body: bytes = b""
+    ) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        parts = urlsplit(url)
+        headers = list(self.headers)
+        if body:
+            headers.append((b"content-type", b"application/json"))
+            headers.append((b"content-length", str(len(body)).encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": parts.path,
+            "raw_path": parts.path.encode(),
+            "query_string": parts.query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        sent = False
+        response = {"status": 0, "headers": [], "body": []}
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return response["status"], response["headers"], b"".join(response["body"])
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(q / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def run_load(
+    client: ASGIClient,
+    url: Union[str, Callable[[int], str]],
+    requests: int,
+    concurrency: int,
+    name: Optional[str] = None,
+) -> Dict[str, float]:
+    """Выполняет requests GET запросов в concurrency параллельных потоков.
+
+    url может быть функцией от номера запроса - чтобы запросы шли к разным
+    записям, а не к одной и той же.
+    """
+    make_url = url if callable(url) else lambda _: url
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for number in remaining:
+            started = time.perf_counter()
+            status, _, _ = await client.request("GET", make_url(number))
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "url": name or url,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
@@ -0,0 +1,56 @@
+"""Наборы данных для нагрузочных замеров поверх генератора database/seed.py."""
+
+from typing import Dict
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection, Engine
+
+from database import counters, geo, models, seed
+from database.seed import SeedSpec as DatasetSpec
+from database.seed import SyntheticDirectory as Dataset
+
+PRESETS: Dict[str, DatasetSpec] = {
+    "small": DatasetSpec(organizations=10_000, buildings=2_000),
+    "medium": DatasetSpec(organizations=100_000, buildings=20_000),
+    "large": DatasetSpec(organizations=1_000_000, buildings=200_000),
+}
+
+
+class NotEmpty(Exception):
+    """В таблицах справочника лежат данные, не совпадающие с набором."""
+
+
+def load(engine: Engine, spec: DatasetSpec, reseed: bool = False) -> Dataset:
+    """Загружает набор данных spec в пустую базу.
+
+    Таблицы справочника с данными очищаются только при reseed=True, иначе -
+    NotEmpty: база из DATABASE_* может оказаться рабочей.
+    """
+    with engine.begin() as connection:
+        if not is_empty(connection):
+            if not reseed:
+                raise NotEmpty(
+                    "таблицы справочника не пусты и не совпадают с набором; "
+                    "очистить их и загрузить набор заново - --reseed"
+                )
+            seed.clear(connection)
+        dataset = seed.seed(connection, spec)
+        # seed пишет в таблицы напрямую: geohash и счётчики - отдельным проходом
+        geo.fill_geohash(connection)
+        counters.reconcile(connection)
+        return dataset
+
+
+def is_empty(connection: Connection) -> bool:
+    return all(
+        connection.scalar(select(model.id).limit(1)) is None
+        for model in (models.Organization, models.Building, models.Activity)
+    )
+
+
+def is_loaded(engine: Engine, spec: DatasetSpec) -> bool:
+    """Грубая проверка, что в базе уже лежит набор такого размера."""
+    with engine.connect() as connection:
+        organizations = connection.scalar(select(func.count(models.Organization.id)))
+        buildings = connection.scalar(select(func.count(models.Building.id)))
+    return organizations == spec.organizations and buildings == spec.buildings
@@ -0,0 +1,80 @@
+"""Сравнение requests/sec синхронного (psycopg2 в пуле потоков) и асинхронного
+(asyncpg + AsyncSession) режимов работы с БД.
+
+Каждый режим запускается в отдельном процессе, т.к. режим выбирается
+настройкой DATABASE_ASYNC при импорте приложения:
+
+    python -m benchmarks.db_modes --requests 2000 --concurrency 64 \
+        /organizations/?limit=50 /buildings/?limit=50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from typing import List
+
+from benchmarks.asgi import ASGIClient, disable_rate_limits, run_load
+
+MODES = {"sync": "false", "async": "true"}
+
+
+async def _measure(urls: List[str], requests: int, concurrency: int) -> List[dict]:
+    from app import app
+    from config import settings
+
+    client = ASGIClient(app, headers={"X-API-Key": settings.API_KEY})
+    await client.startup()
+    try:
+        results = []
+        for url in urls:
+            # прогрев пула соединений и кэшей перед замером
+            await run_load(client, url, min(requests, concurrency * 2), concurrency)
+            results.append(await run_load(client, url, requests, concurrency))
+        return results
+    finally:
+        await client.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        results = asyncio.run(_measure(args.urls, args.requests, args.concurrency))
+        print(json.dumps(results))
+        return
+
+    disable_rate_limits()
+    report = {}
+    for mode, flag in MODES.items():
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.db_modes", "--worker", mode]
+            + ["--requests", str(args.requests)]
+            + ["--concurrency", str(args.concurrency)]
+            + args.urls,
+            env={**os.environ, "DATABASE_ASYNC": flag},
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        report[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'url':40} {'mode':6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for index, url in enumerate(args.urls):
+        for mode in MODES:
+            row = report[mode][index]
+            print(
+                f"{url:40} {mode:6} {row['rps']:8} {row['p50_ms']:8} "
+                f"{row['p95_ms']:8} {row['p99_ms']:8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Время сборки и сериализации одной страницы списка: объекты ORM с проверкой
+через from_attributes против строк по колонкам, собранных model_construct.
+
+Замер идёт без HTTP, чтобы в результат не попадало ничего, кроме загрузки
+страницы и её превращения в JSON. По умолчанию набор загружается в SQLite
+в памяти; --database-url позволяет замерить на PostgreSQL (таблицы
+справочника с другими данными очищаются только с --reseed):
+
+    python -m benchmarks.serialization --page-size 100 --pages 200
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from benchmarks import dataset as datasets
+from database import models, schemas
+
+ENDPOINTS = {
+    "organizations": schemas.Organization,
+    "buildings": schemas.Building,
+    "activities": schemas.Activity,
+}
+
+
+def _repository(db: Session, name: str):
+    from api.repositories import crud_resquests as crud
+
+    return {
+        "organizations": crud.OrganizationRepository,
+        "buildings": crud.BuildingRepository,
+        "activities": crud.ActivityRepository,
+    }[name](db)
+
+
+def _orm_page(repository, after: int, limit: int) -> list:
+    # Прежний путь: объекты ORM со связями из профиля загрузки
+    from api.repositories import crud_resquests as crud
+
+    profile = (
+        crud.ORGANIZATION_FULL if repository.row_schema is schemas.Organization else ()
+    )
+    query = repository._query(profile).filter(repository.model.id > after)
+    return query.order_by(repository.model.id).limit(limit).all()
+
+
+def _measure(
+    session_factory: Callable[[], Session],
+    name: str,
+    page_size: int,
+    pages: int,
+    total: int,
+) -> Dict[str, dict]:
+    adapter = TypeAdapter(List[ENDPOINTS[name]])
+    offsets = [(page * page_size) % max(total - page_size, 1) for page in range(pages)]
+
+    def orm(db: Session, after: int):
+        items = _orm_page(_repository(db, name), after, page_size)
+        started = time.perf_counter()
+        adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+        return started
+
+    def rows(db: Session, after: int):
+        items = _repository(db, name).get_multi(limit=page_size, after=after)
+        started = time.perf_counter()
+        # Как в ответе: проверка готовых схем не повторяет проверку полей
+        adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+        return started
+
+    results = {}
+    for path, load in (("orm", orm), ("rows", rows)):
+        totals, serialization = [], []
+        for after in offsets[:10]:  # прогрев
+            with session_factory() as db:
+                load(db, after)
+        for after in offsets:
+            with session_factory() as db:
+                started = time.perf_counter()
+                serialized = load(db, after)
+                finished = time.perf_counter()
+            totals.append((finished - started) * 1000)
+            serialization.append((finished - serialized) * 1000)
+        results[path] = {
+            "page_ms": round(statistics.median(totals), 3),
+            "serialize_ms": round(statistics.median(serialization), 3),
+            "load_ms": round(
+                statistics.median(totals) - statistics.median(serialization), 3
+            ),
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--organizations", type=int, default=20_000)
+    parser.add_argument("--buildings", type=int, default=4_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--endpoint", action="append", choices=ENDPOINTS)
+    parser.add_argument(
+        "--reseed",
+        action="store_true",
+        help="очистить таблицы справочника и загрузить набор заново",
+    )
+    args = parser.parse_args()
+
+    if args.database_url.startswith("sqlite"):
+        engine = create_engine(
+            args.database_url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+    else:
+        engine = create_engine(args.database_url)
+    models.Base.metadata.create_all(engine)
+    spec = datasets.DatasetSpec(
+        organizations=args.organizations, buildings=args.buildings
+    )
+    if args.reseed or not datasets.is_loaded(engine, spec):
+        try:
+            datasets.load(engine, spec, reseed=args.reseed)
+        except datasets.NotEmpty as error:
+            sys.exit(f"{engine.url.render_as_string()}: {error}")
+    data = datasets.Dataset(spec)
+    totals = {
+        "organizations": spec.organizations,
+        "buildings": spec.buildings,
+        "activities": len(data.activities),
+    }
+
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    print(
+        f"{'endpoint':14} {'path':5} {'page ms':>8} {'load ms':>8} "
+        f"{'json ms':>8} {'speedup':>8}"
+    )
+    for name in args.endpoint or list(ENDPOINTS):
+        results = _measure(
+            session_factory, name, args.page_size, args.pages, totals[name]
+        )
+        for path, row in results.items():
+            speedup = results["orm"]["page_ms"] / row["page_ms"]
+            print(
+                f"{name:14} {path:5} {row['page_ms']:8} {row['load_ms']:8} "
+                f"{row['serialize_ms']:8} {speedup:7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
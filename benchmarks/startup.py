@@ -0,0 +1,112 @@
+"""Время холодного запуска: импорт приложения, прогрев при запуске (lifespan)
+и первый запрос.
+
+Каждый прогон - отдельный процесс, чтобы импорт не попадал в кэш модулей;
+БД - та, что задана переменными DATABASE_* (схема уже создана миграциями):
+
+    python -m benchmarks.startup --runs 10 /organizations/?limit=50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.asgi import disable_rate_limits
+
+STAGES = ["import_ms", "startup_ms", "ready_ms", "first_request_ms", "total_ms"]
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _worker(url: str, started: float) -> Dict[str, float]:
+    result = {}
+    mark = time.perf_counter()
+    from app import app
+    from config import settings
+
+    result["import_ms"] = _elapsed_ms(mark)
+
+    from benchmarks.asgi import ASGIClient
+
+    client = ASGIClient(app, headers={"X-API-Key": settings.API_KEY})
+    mark = time.perf_counter()
+    await client.startup()
+    result["startup_ms"] = _elapsed_ms(mark)
+    try:
+        mark = time.perf_counter()
+        status, _, _ = await client.request("GET", "/health/ready")
+        result["ready_ms"] = _elapsed_ms(mark)
+        if status != 200:
+            raise RuntimeError(f"/health/ready ответил {status}")
+        mark = time.perf_counter()
+        status, _, _ = await client.request("GET", url)
+        result["first_request_ms"] = _elapsed_ms(mark)
+        if status != 200:
+            raise RuntimeError(f"{url} ответил {status}")
+    finally:
+        await client.shutdown()
+    result["total_ms"] = _elapsed_ms(started)
+    return result
+
+
+def main() -> None:
+    started = time.perf_counter()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("url", nargs="?", default="/organizations/?limit=50")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--output", help="куда записать JSON с результатами")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(_worker(args.url, started))))
+        return
+
+    disable_rate_limits()
+    env = dict(os.environ)
+    if not args.cache:
+        env["CACHE_BACKEND"] = "none"
+    runs: List[Dict[str, float]] = []
+    for _ in range(args.runs):
+        mark = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--worker", args.url],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        # С запуском интерпретатора - время, которое видит оркестратор
+        run["process_ms"] = _elapsed_ms(mark)
+        runs.append(run)
+
+    stages = STAGES + ["process_ms"]
+    summary = {
+        stage: {
+            "median": round(statistics.median(run[stage] for run in runs), 1),
+            "max": max(run[stage] for run in runs),
+        }
+        for stage in stages
+    }
+    print(f"{'stage':18} {'median ms':>10} {'max ms':>10}")
+    for stage, row in summary.items():
+        print(f"{stage:18} {row['median']:10} {row['max']:10}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {"url": args.url, "runs": runs, "summary": summary}, file, indent=2
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Память и время ответа индекса подсказок названий организаций.
+
+Замер идёт без БД и HTTP: названия берутся из генератора database/seed.py,
+индекс строится так же, как при запуске приложения. Память - прирост по
+tracemalloc за время построения, в пересчёте на миллион названий:
+
+    python -m benchmarks.suggest --organizations 1000000 --lookups 20000
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from benchmarks.asgi import percentile
+from database import search
+from database.seed import SeedSpec, SyntheticDirectory
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--organizations", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    spec = SeedSpec(organizations=args.organizations, buildings=1)
+    names = [
+        (id, name) for (id, name, _), _, _ in SyntheticDirectory(spec).organizations()
+    ]
+
+    index = search.PrefixIndex()
+    started = time.perf_counter()
+    index.load(names)
+    build_s = time.perf_counter() - started
+    # Пик при построении - вторым проходом: tracemalloc замедляет его в разы
+    tracemalloc.start()
+    search.PrefixIndex().load(names)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Запросы - начала слов реальных названий длиной 1-6 символов, как
+    # при наборе в строке поиска
+    rng = random.Random(spec.seed)
+    prefixes = []
+    for _ in range(args.lookups):
+        _, name = rng.choice(names)
+        word = name[rng.choice(search.word_starts(name)) :]
+        prefixes.append(word[: rng.randint(1, 6)])
+    timings = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        index.suggest(prefix, args.limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    updates = []
+    # Новые id - после последнего, как у записей из БД: suggest ищет начало
+    # слова от id -1
+    first_id = max((id for id, _ in names), default=0) + 1
+    for number in range(min(args.lookups, 1000)):
+        started = time.perf_counter()
+        index.add(first_id + number, f"ООО «{prefixes[number]} {number}»")
+        updates.append((time.perf_counter() - started) * 1000)
+    updates.sort()
+
+    per_million = 1_000_000 / max(len(names), 1) / 2**20
+    print(f"названий: {len(names)}, пар (id, слово): {index.entries}")
+    print(f"построение: {build_s:.1f} с")
+    # Названия и словарь id -> название входят в объём: индекс держит их сам
+    print(
+        f"память: {index.memory_bytes() * per_million:.0f} МиБ на миллион названий "
+        f"(пик при построении {peak * per_million:.0f} МиБ)"
+    )
+    print(
+        f"suggest limit={args.limit}: p50 {percentile(timings, 50):.3f} мс, "
+        f"p99 {percentile(timings, 99):.3f} мс"
+    )
+    print(
+        f"add: p50 {percentile(updates, 50):.3f} мс, "
+        f"p99 {percentile(updates, 99):.3f} мс"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Нагрузочные замеры эндпоинтов на синтетическом наборе данных.
+
+Приложение запускается в том же процессе, база - та, что задана переменными
+DATABASE_* (отдельная локальная база). Набор загружается в пустую базу;
+таблицы справочника с другими данными очищаются только с --reseed. Результат - JSON с rps и p50/p95/p99 по каждому сценарию;
+с --baseline он сравнивается с сохранённым прогоном:
+
+    python -m benchmarks.suite --preset medium --output results.json
+    python -m benchmarks.suite --preset medium --baseline results.json
+
+Кэш ответов по умолчанию выключен, чтобы замерялась работа с БД; --cache
+оставляет его включённым.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional
+from urllib.parse import quote
+
+from benchmarks import dataset as datasets
+from benchmarks.asgi import ASGIClient, disable_rate_limits, run_load
+from database import seed
+
+# Допустимое ухудшение относительно baseline: p95 выше или rps ниже на 10%
+DEFAULT_TOLERANCE = 0.10
+
+Scenario = Callable[[random.Random], str]
+
+
+def scenarios(data: datasets.Dataset) -> Dict[str, Scenario]:
+    """URL каждого сценария строится из случайных, но существующих записей."""
+    from api.routers.params import encode_cursor
+
+    spec = data.spec
+    activities = data.activities
+    roots = [id for id, _, parent_id, _ in activities if parent_id is None]
+
+    def center(rng: random.Random) -> str:
+        latitude, longitude = rng.uniform(55.5, 56.0), rng.uniform(37.3, 37.9)
+        return f"latitude={latitude}&longitude={longitude}"
+
+    return {
+        "organizations_list": lambda rng: "/organizations/?limit=50&after="
+        + encode_cursor(rng.randint(0, max(spec.organizations - 50, 0))),
+        "organization_get": lambda rng: "/organizations/"
+        f"{rng.randint(1, spec.organizations)}",
+        "organizations_by_building": lambda rng: "/organizations/by_building/"
+        f"{rng.randint(1, spec.buildings)}",
+        "organizations_by_activity": lambda rng: "/organizations/by_activity/"
+        f"{rng.choice(roots)}?include_children=true&limit=50",
+        "organizations_search_by_activity": lambda rng: "/organizations/"
+        "search_by_activity/?limit=50&activity_name="
+        + quote(rng.choice(activities)[1]),
+        "organizations_search_by_name": lambda rng: "/organizations/search_by_name/"
+        f"?limit=50&name={quote(rng.choice(seed.ORGANIZATION_WORDS))}",
+        "organizations_suggest": lambda rng: "/organizations/suggest?prefix="
+        + quote(rng.choice(seed.ORGANIZATION_WORDS)[: rng.randint(1, 4)]),
+        "organizations_nearby": lambda rng: f"/organizations/nearby?{center(rng)}"
+        "&radius_km=1&limit=50",
+        "organizations_search": lambda rng: "/organizations/search?activity_id="
+        f"{rng.choice(roots)}&name={quote(rng.choice(seed.ORGANIZATION_WORDS))}"
+        f"&{center(rng)}&radius_km=5&limit=50",
+        "buildings_list": lambda rng: "/buildings/?limit=50&skip="
+        f"{rng.randint(0, 100)}",
+        "buildings_clusters": lambda rng: "/buildings/clusters?zoom="
+        f"{rng.randint(9, 14)}&bbox=37.3,55.5,37.9,56.0",
+        "activities_list": lambda rng: "/activities/?limit=50",
+        "activities_tree": lambda rng: "/activities/tree",
+        "building_stats": lambda rng: "/buildings/"
+        f"{rng.randint(1, spec.buildings)}/stats",
+        "activity_stats": lambda rng: f"/activities/{rng.choice(roots)}/stats",
+        "changes": lambda rng: "/changes?since=0&limit=1000",
+    }
+
+
+async def run(
+    client: ASGIClient,
+    data: datasets.Dataset,
+    names: List[str],
+    requests: int,
+    concurrency: int,
+) -> Dict[str, dict]:
+    available = scenarios(data)
+    results = {}
+    for name in names:
+        # Одинаковая последовательность URL в каждом прогоне
+        rng = random.Random(data.spec.seed)
+        urls = [available[name](rng) for _ in range(requests)]
+        # прогрев пула соединений и индексов в памяти перед замером
+        await run_load(client, lambda i: urls[i % len(urls)], concurrency, concurrency)
+        results[name] = await run_load(
+            client, lambda i: urls[i], requests, concurrency, name=name
+        )
+    return results
+
+
+def compare(
+    results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float
+) -> List[str]:
+    """Сценарии, где p95 выросла или rps упал больше чем на tolerance."""
+    regressions = []
+    for name, row in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if row["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {row['p95_ms']} ms")
+        if row["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {base['rps']} -> {row['rps']}")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_table(results: Dict[str, dict], baseline: Dict[str, dict]) -> None:
+    print(
+        f"{'scenario':34} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'base p95':>9}"
+    )
+    for name, row in results.items():
+        base = baseline.get(name, {}).get("p95_ms", "")
+        print(
+            f"{name:34} {row['rps']:8} {row['p50_ms']:8} {row['p95_ms']:8} "
+            f"{row['p99_ms']:8} {base:>9}"
+        )
+
+
+async def _main(args, spec: datasets.DatasetSpec, names: List[str]) -> dict:
+    from app import app
+    from config import settings
+    from database.connection import engine
+
+    if args.reseed or not datasets.is_loaded(engine, spec):
+        started = time.perf_counter()
+        try:
+            data = datasets.load(engine, spec, reseed=args.reseed)
+        except datasets.NotEmpty as error:
+            sys.exit(f"{engine.url.render_as_string()}: {error}")
+        print(
+            f"dataset loaded in {time.perf_counter() - started:.1f}s", file=sys.stderr
+        )
+    else:
+        data = datasets.Dataset(spec)
+
+    client = ASGIClient(app, headers={"X-API-Key": settings.API_KEY})
+    await client.startup()
+    try:
+        results = await run(client, data, names, args.requests, args.concurrency)
+    finally:
+        await client.shutdown()
+    return {
+        "meta": {
+            "dataset": spec.as_dict(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cache": args.cache,
+            "database": engine.dialect.name,
+            "database_async": settings.DATABASE_ASYNC,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", choices=datasets.PRESETS, default="small")
+    parser.add_argument("--organizations", type=int)
+    parser.add_argument("--buildings", type=int)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument(
+        "--reseed",
+        action="store_true",
+        help="очистить таблицы справочника и загрузить набор заново",
+    )
+    parser.add_argument("--scenario", action="append", help="по умолчанию - все")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--output", help="куда записать JSON с результатами")
+    parser.add_argument("--baseline", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    overrides = {
+        key: value
+        for key, value in (
+            ("organizations", args.organizations),
+            ("buildings", args.buildings),
+            ("seed", args.seed),
+        )
+        if value is not None
+    }
+    spec = replace(datasets.PRESETS[args.preset], **overrides)
+    if not args.cache:
+        os.environ["CACHE_BACKEND"] = "none"
+    disable_rate_limits()
+
+    names = args.scenario or list(scenarios(datasets.Dataset(spec)))
+    report = asyncio.run(_main(args, spec, names))
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            stored = json.load(file)
+        if stored["meta"]["dataset"] != report["meta"]["dataset"]:
+            print("baseline снят на другом наборе данных, сравнение пропущено")
+        else:
+            baseline = stored["results"]
+
+    _print_table(report["results"], baseline)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    regressions = compare(report["results"], baseline, args.tolerance)
+    if regressions:
+        print("\nРегрессии относительно baseline:")
+        print("\n".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 # app/config.py
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
+from typing import List, Optional
 import os
 
 load_dotenv()  # Загружаем переменные из .env
@@ -15,10 +16,93 @@ class Settings(BaseSettings):
     DATABASE_PORT: int = int(os.getenv("DATABASE_PORT"))
     DATABASE_NAME: str = os.getenv("DATABASE_NAME")
     API_KEY: str = os.getenv("API_KEY")
+    # Ключи потребителей хранятся в таблице api_keys; API_KEY остаётся
+    # служебным ключом с лимитами по умолчанию
+    API_KEY_CACHE_TTL: int = int(os.getenv("API_KEY_CACHE_TTL", "60"))
+    API_KEY_DEFAULT_RATE: float = float(os.getenv("API_KEY_DEFAULT_RATE", "50"))
+    API_KEY_DEFAULT_BURST: int = int(os.getenv("API_KEY_DEFAULT_BURST", "100"))
+    API_KEY_DEFAULT_CONCURRENCY: int = int(
+        os.getenv("API_KEY_DEFAULT_CONCURRENCY", "20")
+    )
+    # true - asyncpg и AsyncSession, false - psycopg2 в пуле потоков
+    DATABASE_ASYNC: bool = os.getenv("DATABASE_ASYNC", "false").lower() == "true"
+
+    # Пул соединений (на каждую реплику приложения и на каждый engine)
+    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+    DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+    DATABASE_POOL_TIMEOUT: float = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+    DATABASE_POOL_PRE_PING: bool = (
+        os.getenv("DATABASE_POOL_PRE_PING", "false").lower() == "true"
+    )
+    # Секунды жизни соединения, -1 - без ограничения
+    DATABASE_POOL_RECYCLE: int = int(os.getenv("DATABASE_POOL_RECYCLE", "-1"))
+    # Ожидание соединения дольше стольких секунд пишется в лог предупреждением
+    DATABASE_POOL_SLOW_WAIT: float = float(os.getenv("DATABASE_POOL_SLOW_WAIT", "0.1"))
+    # Период записи снимка пула в лог, секунды; 0 - не писать
+    DATABASE_POOL_LOG_INTERVAL: int = int(os.getenv("DATABASE_POOL_LOG_INTERVAL", "60"))
+
+    # Запуск: сколько соединений каждого пула открыть заранее, сколько ждать
+    # прогрева до приёма запросов и пауза между попытками, если БД недоступна
+    DATABASE_POOL_WARMUP: int = int(os.getenv("DATABASE_POOL_WARMUP", "2"))
+    STARTUP_WARMUP_TIMEOUT: float = float(os.getenv("STARTUP_WARMUP_TIMEOUT", "10"))
+    STARTUP_RETRY_INTERVAL: float = float(os.getenv("STARTUP_RETRY_INTERVAL", "2"))
+
+    # Реплики для чтения: URL SQLAlchemy через запятую. GET запросы читают с
+    # них по кругу, запись и чтение после записи идут в основную базу
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    # Сколько секунд не обращаться к реплике после ошибки соединения
+    DATABASE_REPLICA_RETRY_INTERVAL: float = float(
+        os.getenv("DATABASE_REPLICA_RETRY_INTERVAL", "5")
+    )
+
+    # Дерево видов деятельности в памяти: через сколько секунд перечитать его
+    # из БД, чтобы увидеть узлы, добавленные другими процессами; 0 - никогда
+    ACTIVITY_TREE_TTL: float = float(os.getenv("ACTIVITY_TREE_TTL", "60"))
+
+    # Кэш ответов: memory - LRU в памяти процесса, shared - общее хранилище
+    # для всех реплик (redis по CACHE_URL, без него - локальная замена), none - выключен
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_URL: Optional[str] = os.getenv("CACHE_URL")
+    CACHE_TTL: int = int(os.getenv("CACHE_TTL", "60"))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    # Наибольшее отставание реплик, секунды: столько после изменения ответы,
+    # прочитанные с реплики, не кэшируются (только если реплики заданы)
+    CACHE_REPLICA_LAG: float = float(os.getenv("CACHE_REPLICA_LAG", "5"))
+
+    # Массовая загрузка: строк в одной транзакции и сколько ошибок вернуть в отчёте
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    IMPORT_MAX_ERRORS: int = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+    # Выгрузка: строк в одной пачке серверного курсора
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    # Сколько id можно запросить одним POST /.../batch
+    BATCH_MAX_IDS: int = int(os.getenv("BATCH_MAX_IDS", "1000"))
+    # Сколько ячеек geohash может покрыть прямоугольник GET /buildings/clusters
+    CLUSTERS_MAX_CELLS: int = int(os.getenv("CLUSTERS_MAX_CELLS", "10000"))
+    # Журнал изменений GET /changes: сколько дней хранятся записи и сколько
+    # записей отдаётся за один запрос
+    CHANGES_RETENTION_DAYS: float = float(os.getenv("CHANGES_RETENTION_DAYS", "7"))
+    CHANGES_MAX_LIMIT: int = int(os.getenv("CHANGES_MAX_LIMIT", "10000"))
 
     @property
     def DATABASE_URL(self):
         return f"postgresql+psycopg2://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
 
+    @property
+    def ASYNC_DATABASE_URL(self):
+        return f"postgresql+asyncpg://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
+
+    @property
+    def REPLICA_URLS(self) -> List[str]:
+        return [
+            url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()
+        ]
+
+    @property
+    def ASYNC_REPLICA_URLS(self) -> List[str]:
+        return [
+            url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+            for url in self.REPLICA_URLS
+        ]
+
 
 settings = Settings()
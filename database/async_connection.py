@@ -0,0 +1,63 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from config import settings
+from database import pool, replicas
+
+SQLALCHEMY_ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL
+
+pool_metrics = pool.register("async")
+pool_options = pool.pool_options()
+
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    poolclass=pool.instrumented_pool_class(AsyncAdaptedQueuePool, pool_metrics),
+    **pool_options,
+)
+pool.instrument(async_engine.sync_engine, pool_metrics, pool_options)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False)
+
+
+def _replica_engine(number: int, url: str):
+    metrics = pool.register(f"async-replica-{number}")
+    options = pool.pool_options()
+    replica_engine = create_async_engine(
+        url,
+        poolclass=pool.instrumented_pool_class(AsyncAdaptedQueuePool, metrics),
+        **options,
+    )
+    pool.instrument(replica_engine.sync_engine, metrics, options)
+    return replica_engine
+
+
+async_replica_engines = [
+    _replica_engine(number, url)
+    for number, url in enumerate(settings.ASYNC_REPLICA_URLS)
+]
+async_replica_set = replicas.ReplicaSet(
+    replicas.Replica(
+        f"async-replica-{number}",
+        replica_engine.sync_engine,
+        settings.DATABASE_REPLICA_RETRY_INTERVAL,
+    )
+    for number, replica_engine in enumerate(async_replica_engines)
+)
+
+# Маршрутизация идёт в синхронной сессии внутри AsyncSession, поэтому
+# реплики передаются как sync_engine
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    sync_session_class=replicas.RoutingSession,
+    replicas=async_replica_set if async_replica_engines else None,
+)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,160 @@
+"""Журнал изменений справочника для синхронизации потребителей.
+
+Репозитории пишут в change_log строку на каждую созданную, изменённую или
+удалённую организацию, здание и вид деятельности - в той же транзакции,
+что и само изменение. Потребитель читает журнал по возрастанию seq
+(GET /changes?since=) и перечитывает изменённые записи через
+POST /.../batch; create и update для него одно и то же - записать
+текущее состояние.
+
+Порядок: в PostgreSQL seq выдаётся под транзакционной advisory
+блокировкой, которая держится до commit. Строки становятся видимы строго
+в порядке seq, и потребитель не пропустит строку с меньшим seq,
+закоммиченную позже большей. Запись в журнал - последний запрос
+транзакции перед commit: под блокировкой транзакция ничего не ждёт.
+В SQLite пишущая транзакция и так одна.
+
+Сжатие журнала:
+
+    python -m database.changes                     # по CHANGES_RETENTION_DAYS
+    python -m database.changes --retention-days 30
+
+- запись, после которой есть запись о той же сущности, удаляется всегда:
+  потребитель с любым since всё равно получит более позднюю;
+- записи старше срока хранения удаляются, их последний seq становится
+  горизонтом. На since меньше горизонта GET /changes отвечает 410:
+  потребителю нужна полная синхронизация.
+
+Запись в обход репозиториев (seed, ручные правки) журнал не пополняет;
+после неё потребителей тоже нужно синхронизировать полностью.
+"""
+
+import argparse
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, exists, func, insert, select
+from sqlalchemy.engine import Row
+
+from config import settings
+from database import models
+
+ORGANIZATION = "organization"
+BUILDING = "building"
+ACTIVITY = "activity"
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+# Ключ pg_advisory_xact_lock, общий для всех процессов приложения
+LOCK_KEY = 0x63686C67
+
+_log = models.ChangeLog.__table__
+
+
+def record(db, entity: str, operation: str, ids: Iterable[int]) -> None:
+    """Пишет изменения в журнал; commit - за вызывающим, сразу после.
+
+    Отложенные изменения сессии выполняются до блокировки: иначе DELETE или
+    UPDATE при commit мог бы ждать строку, чья транзакция ждёт блокировку.
+    """
+    rows = [{"entity": entity, "entity_id": id, "operation": operation} for id in ids]
+    if not rows:
+        return
+    db.flush()
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(LOCK_KEY)))
+    db.execute(insert(_log), rows)
+
+
+def head(connection) -> int:
+    """Последний seq журнала; 0 - журнал пуст."""
+    return connection.scalar(select(func.max(_log.c.seq))) or 0
+
+
+def horizon(connection) -> int:
+    """seq, до которого журнал удалён сжатием; 0 - ничего не удалено."""
+    compactions = models.ChangeLogCompaction.__table__
+    return connection.scalar(select(func.max(compactions.c.horizon))) or 0
+
+
+def read(connection, since: int, limit: int) -> List[Row]:
+    return connection.execute(
+        select(_log).where(_log.c.seq > since).order_by(_log.c.seq).limit(limit)
+    ).all()
+
+
+@dataclass(frozen=True)
+class Compaction:
+    superseded: int
+    expired: int
+    horizon: int
+
+
+def compact(
+    connection, retention_days: float, now: Optional[datetime] = None
+) -> Compaction:
+    """Удаляет вытесненные и устаревшие записи; commit - за вызывающим."""
+    now = now or datetime.now(timezone.utc)
+    later = _log.alias("later")
+    superseded = connection.execute(
+        delete(_log).where(
+            exists().where(
+                later.c.entity == _log.c.entity,
+                later.c.entity_id == _log.c.entity_id,
+                later.c.seq > _log.c.seq,
+            )
+        )
+    ).rowcount
+
+    # Удаляется всё до последнего устаревшего seq, а не по времени: часы
+    # разных процессов могут расходиться, а горизонт должен покрывать всё
+    # удалённое
+    current = horizon(connection)
+    expired_seq = connection.scalar(
+        select(func.max(_log.c.seq)).where(
+            _log.c.changed_at < now - timedelta(days=retention_days)
+        )
+    )
+    expired = 0
+    if expired_seq is not None:
+        expired = connection.execute(
+            delete(_log).where(_log.c.seq <= expired_seq)
+        ).rowcount
+        current = max(current, expired_seq)
+    if superseded or expired:
+        connection.execute(
+            insert(models.ChangeLogCompaction.__table__).values(
+                compacted_at=now,
+                horizon=current,
+                superseded=superseded,
+                expired=expired,
+            )
+        )
+    return Compaction(superseded, expired, current)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сжатие журнала изменений")
+    parser.add_argument(
+        "--retention-days",
+        type=float,
+        default=settings.CHANGES_RETENTION_DAYS,
+        help="сколько дней хранить записи",
+    )
+    args = parser.parse_args()
+
+    from database.connection import engine
+
+    with engine.begin() as connection:
+        result = compact(connection, args.retention_days)
+    print(
+        f"вытеснено: {result.superseded}, устарело: {result.expired}, "
+        f"горизонт: {result.horizon}"
+    )
+
+
+if __name__ == "__main__":
+    main()
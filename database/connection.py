@@ -1,18 +1,78 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from config import settings
+from database import pool, replicas
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
+pool_metrics = pool.register("sync")
+pool_options = pool.pool_options()
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=pool.instrumented_pool_class(QueuePool, pool_metrics),
+    **pool_options,
+)
+pool.instrument(engine, pool_metrics, pool_options)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def _replica_engine(number: int, url: str):
+    metrics = pool.register(f"sync-replica-{number}")
+    options = pool.pool_options()
+    replica_engine = create_engine(
+        url,
+        poolclass=pool.instrumented_pool_class(QueuePool, metrics),
+        **options,
+    )
+    pool.instrument(replica_engine, metrics, options)
+    return replica_engine
+
+
+replica_engines = [
+    _replica_engine(number, url) for number, url in enumerate(settings.REPLICA_URLS)
+]
+replica_set = replicas.ReplicaSet(
+    replicas.Replica(
+        f"sync-replica-{number}",
+        replica_engine,
+        settings.DATABASE_REPLICA_RETRY_INTERVAL,
+    )
+    for number, replica_engine in enumerate(replica_engines)
+)
+
+# Сессии GET запросов: чтение с реплик, если они заданы
+ReadSessionLocal = sessionmaker(
+    class_=replicas.RoutingSession,
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    replicas=replica_set if replica_engines else None,
+)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Зависимость для роутеров: сессия выбирается настройкой DATABASE_ASYNC
+if settings.DATABASE_ASYNC:
+    from database.async_connection import get_async_db as get_session
+    from database.async_connection import get_async_read_db as get_read_session
+else:
+    get_session = get_db
+    get_read_session = get_read_db
@@ -0,0 +1,252 @@
+"""Счётчики организаций по зданиям и видам деятельности.
+
+Счётчики лежат в таблицах building_stats и activity_stats и меняются
+репозиторием организаций в той же транзакции, что и сами организации:
+прибавлением разницы, без пересчёта. Для вида деятельности хранятся два
+числа - организации, связанные с ним напрямую, и разные организации всего
+поддерева (организация с двумя видами из одного поддерева считается в нём
+один раз).
+
+Запись в обход репозитория (seed, ручные правки) счётчики не обновляет;
+сверка пересчитывает их одним GROUP BY на таблицу, исправляет и сообщает
+о расхождениях:
+
+    python -m database.counters            # сверить и исправить
+    python -m database.counters --dry-run  # только показать расхождения
+
+С --dry-run код выхода 1, если расхождения есть: сверку можно запускать
+по расписанию как проверку.
+"""
+
+import argparse
+import sys
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database import models
+
+# Набор видов деятельности организации до и после изменения
+ActivityChange = Tuple[Iterable[int], Iterable[int]]
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _dialect(connection: Union[Session, Connection]) -> str:
+    if isinstance(connection, Session):
+        return connection.get_bind().dialect.name
+    return connection.dialect.name
+
+
+def _upsert(connection, table, key: str, rows: List[dict], increment: bool) -> None:
+    """INSERT ... ON CONFLICT по ключу: прибавить значения или заменить их."""
+    if not rows:
+        return
+    statement = _INSERTS[_dialect(connection)](table)
+    columns = [name for name in rows[0] if name != key]
+    statement = statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={
+            name: (
+                table.c[name] + statement.excluded[name]
+                if increment
+                else statement.excluded[name]
+            )
+            for name in columns
+        },
+    )
+    # Строки по возрастанию ключа: одновременные транзакции блокируют их
+    # в одном порядке и не ждут друг друга по кругу
+    connection.execute(statement, sorted(rows, key=lambda row: row[key]))
+
+
+def activity_deltas(
+    connection, changes: Iterable[ActivityChange]
+) -> Dict[int, List[int]]:
+    """Изменения [organizations, subtree_organizations] по видам деятельности.
+
+    Предки берутся из activity_closure одним запросом на все изменения.
+    """
+    changes = [(set(before), set(after)) for before, after in changes]
+    changes = [(before, after) for before, after in changes if before != after]
+    touched = set().union(*(before | after for before, after in changes))
+    if not touched:
+        return {}
+    closure = models.ActivityClosure
+    ancestors: Dict[int, Set[int]] = defaultdict(set)
+    for ancestor_id, descendant_id in connection.execute(
+        select(closure.ancestor_id, closure.descendant_id).where(
+            closure.descendant_id.in_(touched)
+        )
+    ):
+        ancestors[descendant_id].add(ancestor_id)
+
+    deltas: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+    for before, after in changes:
+        for id in after - before:
+            deltas[id][0] += 1
+        for id in before - after:
+            deltas[id][0] -= 1
+        # Поддерево считает организацию, пока в нём есть хоть один её вид
+        covered_before = set().union(*(ancestors[id] for id in before))
+        covered_after = set().union(*(ancestors[id] for id in after))
+        for id in covered_after - covered_before:
+            deltas[id][1] += 1
+        for id in covered_before - covered_after:
+            deltas[id][1] -= 1
+    return deltas
+
+
+def apply(
+    connection,
+    buildings: Optional[Counter] = None,
+    activities: Iterable[ActivityChange] = (),
+) -> None:
+    """Прибавляет изменения к счётчикам; commit - за вызывающим."""
+    _upsert(
+        connection,
+        models.BuildingStats.__table__,
+        "building_id",
+        [
+            {"building_id": id, "organizations": delta}
+            for id, delta in (buildings or {}).items()
+            if id is not None and delta
+        ],
+        increment=True,
+    )
+    _upsert(
+        connection,
+        models.ActivityStats.__table__,
+        "activity_id",
+        [
+            {
+                "activity_id": id,
+                "organizations": direct,
+                "subtree_organizations": subtree,
+            }
+            for id, (direct, subtree) in activity_deltas(connection, activities).items()
+            if direct or subtree
+        ],
+        increment=True,
+    )
+
+
+def _actual(connection) -> Tuple[Dict[int, tuple], Dict[int, tuple]]:
+    organization = models.Organization
+    association = models.organization_activity_association
+    closure = models.ActivityClosure
+    buildings = {
+        id: (count,)
+        for id, count in connection.execute(
+            select(organization.building_id, func.count())
+            .where(organization.building_id.isnot(None))
+            .group_by(organization.building_id)
+        )
+    }
+    direct = dict(
+        connection.execute(
+            select(association.c.activity_id, func.count()).group_by(
+                association.c.activity_id
+            )
+        ).all()
+    )
+    subtree = dict(
+        connection.execute(
+            select(
+                closure.ancestor_id,
+                func.count(association.c.organization_id.distinct()),
+            )
+            .join(association, association.c.activity_id == closure.descendant_id)
+            .group_by(closure.ancestor_id)
+        ).all()
+    )
+    activities = {
+        id: (direct.get(id, 0), subtree.get(id, 0)) for id in direct.keys() | subtree
+    }
+    return buildings, activities
+
+
+def _stored(connection, table, key: str) -> Dict[int, tuple]:
+    return {
+        row[0]: tuple(row[1:])
+        for row in connection.execute(select(table).order_by(table.c[key]))
+    }
+
+
+@dataclass(frozen=True)
+class Drift:
+    table: str
+    id: int
+    stored: tuple
+    actual: tuple
+
+
+def reconcile(connection, fix: bool = True) -> List[Drift]:
+    """Пересчитывает счётчики и возвращает расхождения с хранимыми.
+
+    С fix=True расходящиеся строки перезаписываются верными значениями;
+    commit - за вызывающим. В PostgreSQL таблицы счётчиков на время сверки
+    блокируются от записи: пересчёт видит все организации, чьи счётчики
+    уже изменены, а новые изменения ждут конца транзакции.
+    """
+    if fix and _dialect(connection) == "postgresql":
+        connection.execute(
+            text(
+                "LOCK TABLE building_stats, activity_stats IN SHARE ROW EXCLUSIVE MODE"
+            )
+        )
+    drift = []
+    actual_buildings, actual_activities = _actual(connection)
+    for table, key, actual in (
+        (models.BuildingStats.__table__, "building_id", actual_buildings),
+        (models.ActivityStats.__table__, "activity_id", actual_activities),
+    ):
+        columns = [column.name for column in table.c if column.name != key]
+        zero = (0,) * len(columns)
+        stored = _stored(connection, table, key)
+        found = [
+            Drift(table.name, id, stored.get(id, zero), actual.get(id, zero))
+            for id in sorted(stored.keys() | actual.keys())
+            if stored.get(id, zero) != actual.get(id, zero)
+        ]
+        if fix:
+            _upsert(
+                connection,
+                table,
+                key,
+                [{key: item.id, **dict(zip(columns, item.actual))} for item in found],
+                increment=False,
+            )
+        drift.extend(found)
+    return drift
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сверка счётчиков организаций")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="только показать расхождения"
+    )
+    parser.add_argument(
+        "--show", type=int, default=20, help="сколько расхождений напечатать"
+    )
+    args = parser.parse_args()
+
+    from database.connection import engine
+
+    with engine.begin() as connection:
+        drift = reconcile(connection, fix=not args.dry_run)
+    for item in drift[: args.show]:
+        print(f"{item.table} {item.id}: {item.stored} -> {item.actual}")
+    action = "найдено" if args.dry_run else "исправлено"
+    print(f"{action} расхождений: {len(drift)}")
+    if drift and args.dry_run:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import math
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import (
+    Float,
+    and_,
+    bindparam,
+    column,
+    func,
+    literal_column,
+    or_,
+    select,
+    table,
+    update,
+)
+
+EARTH_RADIUS_KM = 6371.0088
+
+# SRID 4326 - WGS 84. Литерал, а не параметр: иначе планировщик PostgreSQL
+# не сопоставит выражение с функциональным GiST индексом ix_buildings_location.
+SRID = literal_column("4326")
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+Box = Tuple[float, float, float, float]
+
+
+def _wrap_longitude(longitude: float) -> float:
+    if longitude < -180.0:
+        return longitude + 360.0
+    if longitude > 180.0:
+        return longitude - 360.0
+    return longitude
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Box:
+    """Прямоугольник (min_lat, min_lon, max_lat, max_lon), описанный вокруг круга.
+
+    Круг через антимеридиан даёт прямоугольник с min_lon > max_lon: он
+    продолжается за 180 с -180 (см. split_box).
+    """
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, latitude - d_lat)
+    max_lat = min(90.0, latitude + d_lat)
+    cos_lat = math.cos(math.radians(latitude))
+    if max_lat >= 90.0 or min_lat <= -90.0 or cos_lat <= 1e-12:
+        return min_lat, -180.0, max_lat, 180.0
+    d_lon = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    if d_lon >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+    return (
+        min_lat,
+        _wrap_longitude(longitude - d_lon),
+        max_lat,
+        _wrap_longitude(longitude + d_lon),
+    )
+
+
+def split_box(
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float
+) -> List[Box]:
+    """Прямоугольник через антимеридиан (min_lon > max_lon) - двумя
+    прямоугольниками по обе стороны от него, остальные - как есть."""
+    if min_lon <= max_lon:
+        return [(min_lat, min_lon, max_lat, max_lon)]
+    return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+
+
+# Geohash здания хранится с максимальной точностью (~4 см); кластеры на
+# карте группируют здания по его префиксу нужной длины
+GEOHASH_PRECISION = 12
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION):
+    """Geohash точки: биты долготы и широты по очереди, по 5 бит на символ."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    code, bits, value, even = [], 0, 0, True
+    while len(code) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            code.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(code)
+
+
+def geohash_cell(precision: int) -> Tuple[float, float]:
+    """Размер ячейки geohash длины precision: (градусы широты, долготы)."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def zoom_precision(zoom: int) -> int:
+    """Длина префикса geohash для масштаба карты zoom (тайл 256 px шириной
+    360 / 2**zoom градусов): самая короткая, при которой в ширину тайла
+    помещается не меньше четырёх ячеек."""
+    tile = 360.0 / 2**zoom
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        if geohash_cell(precision)[1] <= tile / 4:
+            return precision
+    return GEOHASH_PRECISION
+
+
+def snap_to_cells(
+    precision: int,
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+) -> Tuple[float, float, float, float]:
+    """Прямоугольник, расширенный до границ ячеек geohash: кластеры у края
+    карты считаются целиком, а близкие прямоугольники совпадают."""
+    height, width = geohash_cell(precision)
+    return (
+        max(-90.0, math.floor((min_lat + 90) / height) * height - 90),
+        max(-180.0, math.floor((min_lon + 180) / width) * width - 180),
+        min(90.0, math.ceil((max_lat + 90) / height) * height - 90),
+        min(180.0, math.ceil((max_lon + 180) / width) * width - 180),
+    )
+
+
+def fill_geohash(connection, batch_size: int = 10_000) -> int:
+    """Заполняет пустой geohash зданий с координатами; возвращает их число.
+
+    Для строк, записанных в обход репозитория: миграцией, seed и т.п.
+    """
+    buildings = table(
+        "buildings",
+        column("id"),
+        column("latitude"),
+        column("longitude"),
+        column("geohash"),
+    )
+    rows = connection.execute(
+        select(buildings.c.id, buildings.c.latitude, buildings.c.longitude).where(
+            buildings.c.geohash.is_(None),
+            buildings.c.latitude.isnot(None),
+            buildings.c.longitude.isnot(None),
+        )
+    ).all()
+    statement = (
+        update(buildings)
+        .where(buildings.c.id == bindparam("building_id"))
+        .values(geohash=bindparam("value"))
+    )
+    for start in range(0, len(rows), batch_size):
+        connection.execute(
+            statement,
+            [
+                {"building_id": id, "value": geohash(latitude, longitude)}
+                for id, latitude, longitude in rows[start : start + batch_size]
+            ],
+        )
+    return len(rows)
+
+
+def location_expression(latitude_column, longitude_column):
+    # Должно совпадать с выражением индекса ix_buildings_location в миграции
+    return func.ST_SetSRID(func.ST_MakePoint(longitude_column, latitude_column), SRID)
+
+
+def point_expression(latitude: float, longitude: float):
+    return func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), SRID)
+
+
+def bbox_clause(location, min_lat, min_lon, max_lat, max_lon):
+    # Прямоугольник через антимеридиан - два условия &&, каждое по индексу
+    return or_(
+        *(
+            location.op("&&")(func.ST_MakeEnvelope(west, south, east, north, SRID))
+            for south, west, north, east in split_box(
+                min_lat, min_lon, max_lat, max_lon
+            )
+        )
+    )
+
+
+def knn_distance(location, latitude: float, longitude: float):
+    """Расстояние для ORDER BY ближайших к точке по GiST индексу (KNN).
+
+    Оператор <-> обходит индекс от точки и не считает расстояние до всех
+    строк, как ST_DistanceSphere. Расстояние плоское, в градусах: вдали от
+    полюсов порядок ближайших почти тот же, что по сфере.
+    """
+    return location.op("<->", return_type=Float)(point_expression(latitude, longitude))
+
+
+def radius_clause(location, latitude: float, longitude: float, radius_km: float):
+    """Условие "в радиусе" и выражение расстояния в метрах для сортировки.
+
+    Оператор && отбирает кандидатов по GiST индексу, ST_DistanceSphere
+    отсекает углы прямоугольника.
+    """
+    distance = func.ST_DistanceSphere(location, point_expression(latitude, longitude))
+    clause = and_(
+        bbox_clause(location, *bounding_box(latitude, longitude, radius_km)),
+        distance <= radius_km * 1000,
+    )
+    return clause, distance
+
+
+class GridIndex:
+    """Равномерная сетка по координатам для баз без PostGIS (SQLite в тестах)."""
+
+    def __init__(self, cell_size: float = 0.1):
+        self.cell_size = cell_size
+        self.loaded = False
+        self._cells: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = (
+            defaultdict(list)
+        )
+        self._lock = Lock()
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor(longitude / self.cell_size),
+        )
+
+    def load(self, points: Iterable[Tuple[int, float, float]]) -> None:
+        cells = defaultdict(list)
+        for id, latitude, longitude in points:
+            cells[self._cell(latitude, longitude)].append((id, latitude, longitude))
+        with self._lock:
+            self._cells = cells
+            self.loaded = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cells = defaultdict(list)
+            self.loaded = False
+
+    def add(self, id: int, latitude: float, longitude: float) -> None:
+        with self._lock:
+            self._cells[self._cell(latitude, longitude)].append(
+                (id, latitude, longitude)
+            )
+
+    def _candidates(self, min_lat, min_lon, max_lat, max_lon):
+        lat_from, lon_from = self._cell(min_lat, min_lon)
+        lat_to, lon_to = self._cell(max_lat, max_lon)
+        cells = self._cells
+        span = (lat_to - lat_from + 1) * (lon_to - lon_from + 1)
+        if span > len(cells):
+            keys = [
+                key
+                for key in cells
+                if lat_from <= key[0] <= lat_to and lon_from <= key[1] <= lon_to
+            ]
+        else:
+            keys = [
+                (i, j)
+                for i in range(lat_from, lat_to + 1)
+                for j in range(lon_from, lon_to + 1)
+                if (i, j) in cells
+            ]
+        for key in keys:
+            yield from cells[key]
+
+    def in_bbox(
+        self, min_lat: float, min_lon: float, max_lat: float, max_lon: float
+    ) -> List[int]:
+        return [
+            id
+            for south, west, north, east in split_box(
+                min_lat, min_lon, max_lat, max_lon
+            )
+            for id, latitude, longitude in self._candidates(south, west, north, east)
+            if south <= latitude <= north and west <= longitude <= east
+        ]
+
+    def nearby(
+        self, latitude: float, longitude: float, radius_km: float
+    ) -> List[Tuple[int, float]]:
+        """Пары (id, расстояние в км), от ближних к дальним."""
+        found = []
+        for box in split_box(*bounding_box(latitude, longitude, radius_km)):
+            for id, lat, lon in self._candidates(*box):
+                distance = haversine_km(latitude, longitude, lat, lon)
+                if distance <= radius_km:
+                    found.append((id, distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+
+building_index = GridIndex()
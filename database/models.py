@@ -1,7 +1,19 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Integer,
+    String,
+    Float,
+    ForeignKey,
+    Table,
+    Index,
+    true,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.ext.hybrid import hybrid_property
 from geoalchemy2 import Geometry
 from sqlalchemy.orm import DeclarativeMeta
 
@@ -51,11 +63,21 @@ class Building(Base):
     address = Column(String)
     latitude = Column(Float)
     longitude = Column(Float)
+    # geohash координат полной длины (geo.GEOHASH_PRECISION); кластеры карты
+    # группируют здания по его префиксу. Заполняется при создании здания
+    geohash = Column(String(12), nullable=True)
 
-    # location = Column(Geometry(geometry_type="POINT", srid=4326))  # SRID 4326 - WGS 84
+    # Точка PostGIS не хранится отдельной колонкой: GiST индекс ix_buildings_location
+    # построен по выражению ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+    # (см. database/geo.py и миграцию), поэтому координаты не расходятся с индексом.
 
     organizations = relationship("Organization", back_populates="building")
 
+    __table_args__ = (
+        Index("ix_buildings_lat_lon", "latitude", "longitude"),
+        Index("ix_buildings_geohash", "geohash"),
+    )
+
 
 class Activity(Base):
     __tablename__ = "activities"
@@ -65,6 +87,8 @@ class Activity(Base):
     parent_id = Column(
         Integer, ForeignKey("activities.id"), nullable=True
     )  # Ссылка на родительскую категорию
+    # Уровень вложенности хранится в таблице, корень - 1. Заполняется при создании
+    level = Column(Integer, nullable=False, default=1, server_default="1")
 
     parent = relationship("Activity", remote_side=[id], back_populates="children")
     children = relationship("Activity", back_populates="parent")
@@ -75,12 +99,101 @@ class Activity(Base):
         back_populates="activities",
     )
 
-    @hybrid_property
-    def level(self):
-        if self.parent:
-            return self.parent.level + 1
-        return 1
 
-    @level.setter
-    def level(self, level):
-        pass
+class ActivityClosure(Base):
+    """Таблица замыкания иерархии: пара (предок, потомок) для всех уровней.
+
+    Каждый вид деятельности является своим предком с depth = 0, поэтому
+    поддерево любого узла выбирается одним запросом по ancestor_id.
+    """
+
+    __tablename__ = "activity_closure"
+
+    ancestor_id = Column(Integer, ForeignKey("activities.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("activities.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_activity_closure_descendant", "descendant_id", "depth"),
+    )
+
+
+class BuildingStats(Base):
+    """Число организаций в здании. Меняется вместе с организациями,
+    сверяется с таблицами database/counters.py; нет строки - ноль."""
+
+    __tablename__ = "building_stats"
+
+    building_id = Column(Integer, ForeignKey("buildings.id"), primary_key=True)
+    organizations = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class ActivityStats(Base):
+    """Число организаций вида деятельности: напрямую и по всему поддереву."""
+
+    __tablename__ = "activity_stats"
+
+    activity_id = Column(Integer, ForeignKey("activities.id"), primary_key=True)
+    organizations = Column(Integer, nullable=False, default=0, server_default="0")
+    # Разные организации с этим видом или любым его потомком
+    subtree_organizations = Column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
+
+class ChangeLog(Base):
+    """Журнал изменений справочника для синхронизации потребителей.
+
+    Строка пишется в той же транзакции, что и само изменение (transactional
+    outbox), и указывает только на запись: её текущее состояние потребитель
+    читает обычными GET. seq растёт в порядке commit - см. database/changes.py.
+    """
+
+    __tablename__ = "change_log"
+
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String(16), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String(8), nullable=False)
+    changed_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+
+    __table_args__ = (
+        Index("ix_change_log_entity", "entity", "entity_id", "seq"),
+        Index("ix_change_log_changed_at", "changed_at"),
+        # Без AUTOINCREMENT SQLite снова выдаёт seq удалённых при сжатии строк
+        {"sqlite_autoincrement": True},
+    )
+
+
+class ChangeLogCompaction(Base):
+    """Прогон сжатия журнала: строки с seq не больше horizon удалены."""
+
+    __tablename__ = "change_log_compactions"
+
+    id = Column(Integer, primary_key=True)
+    compacted_at = Column(DateTime(timezone=True), nullable=False)
+    horizon = Column(Integer, nullable=False)
+    superseded = Column(Integer, nullable=False)
+    expired = Column(Integer, nullable=False)
+
+
+class ApiKey(Base):
+    """Ключ доступа потребителя API. Хранится только SHA-256 ключа.
+
+    Пустые лимиты означают значения по умолчанию из настроек API_KEY_DEFAULT_*.
+    """
+
+    __tablename__ = "api_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    key_hash = Column(String(64), nullable=False, unique=True)
+    # Запросов в секунду и размер пачки (ёмкость token bucket)
+    rate_limit = Column(Float, nullable=True)
+    burst = Column(Integer, nullable=True)
+    max_concurrency = Column(Integer, nullable=True)
+    is_active = Column(Boolean, nullable=False, default=True, server_default=true())
@@ -0,0 +1,232 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Type
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from config import settings
+
+logger = logging.getLogger("database.pool")
+
+# Границы корзин ожидания соединения, секунды
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def pool_options() -> dict:
+    """Параметры пула для create_engine / create_async_engine из настроек."""
+    return {
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+    }
+
+
+class Histogram:
+    """Кумулятивная гистограмма в формате Prometheus: счётчики по верхним границам."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative(self) -> List[int]:
+        with self._lock:
+            counts = list(self.counts)
+        total, result = 0, []
+        for count in counts:
+            total += count
+            result.append(total)
+        return result
+
+    def snapshot(self) -> dict:
+        cumulative = self.cumulative()
+        return {
+            "buckets": {
+                **{str(bound): n for bound, n in zip(self.buckets, cumulative)},
+                "+Inf": cumulative[-1],
+            },
+            "sum": round(self.sum, 6),
+            "count": self.count,
+        }
+
+
+class PoolMetrics:
+    """Состояние и история пула одного engine по событиям пула SQLAlchemy.
+
+    Текущие значения (занято, overflow) читаются у самого пула; счётчики
+    открытий, закрытий и инвалидаций соединений показывают их оборот,
+    гистограмма - сколько запросы ждали свободное соединение.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool: Optional[Pool] = None
+        # Параметры, с которыми создан пул: у самого пула max_overflow
+        # есть только в приватном атрибуте
+        self.options: dict = {}
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.counters: Dict[str, int] = dict.fromkeys(
+            ("checkouts", "timeouts", "opened", "closed", "invalidated"), 0
+        )
+        self._lock = Lock()
+        self._logged_at = time.monotonic()
+
+    def increment(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    def observe_wait(self, seconds: float) -> None:
+        self.wait.observe(seconds)
+        if seconds >= settings.DATABASE_POOL_SLOW_WAIT:
+            logger.warning(self._format("pool slow checkout", wait=round(seconds, 6)))
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        state = {"name": self.name}
+        if isinstance(pool, QueuePool):
+            state.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=self.options.get("max_overflow"),
+            )
+        with self._lock:
+            state.update(self.counters)
+        state["wait_seconds"] = self.wait.snapshot()
+        return state
+
+    def maybe_log(self) -> None:
+        """Снимок в лог не чаще раза в DATABASE_POOL_LOG_INTERVAL секунд."""
+        interval = settings.DATABASE_POOL_LOG_INTERVAL
+        now = time.monotonic()
+        if interval <= 0 or now - self._logged_at < interval:
+            return
+        self._logged_at = now
+        logger.info(self._format("pool stats", **self.snapshot()))
+
+    def _format(self, message: str, **fields) -> str:
+        return json.dumps({"event": message, "pool": self.name, **fields})
+
+
+# Время открытия соединений внутри текущего _do_get. ContextVar, а не
+# атрибут пула: _do_get одновременно идёт в нескольких потоках, а у async
+# engine - в нескольких задачах одного потока
+_connecting: ContextVar[Optional[List[float]]] = ContextVar(
+    "pool_connecting", default=None
+)
+
+
+class _TimedGet:
+    # _do_get - место, где пул ждёт свободное соединение; событий для
+    # начала ожидания у пула нет, поэтому время меряется здесь. Открытие
+    # нового соединения (overflow) - не ожидание, оно вычитается.
+    # _do_get и _create_connection - приватный API пулов SQLAlchemy 2.0:
+    # при обновлении SQLAlchemy проверять, что они ещё вызываются так же
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        if _connecting.get() is not None:
+            # Повторная попытка QueuePool изнутри _do_get: её время уже меряется
+            return super()._do_get()
+        connecting = [0.0]
+        token = _connecting.set(connecting)
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.increment("timeouts")
+            logger.warning(self.metrics._format("pool checkout timeout"))
+            raise
+        finally:
+            _connecting.reset(token)
+            self.metrics.observe_wait(
+                max(time.perf_counter() - started - connecting[0], 0.0)
+            )
+
+    def _create_connection(self):
+        started = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            connecting = _connecting.get()
+            if connecting is not None:
+                connecting[0] += time.perf_counter() - started
+
+
+def instrumented_pool_class(pool_class: Type[Pool], metrics: PoolMetrics) -> type:
+    """Подкласс пула с замером ожидания; engine.dispose() пересоздаёт пул
+    через self.__class__, поэтому метрики переживают пересоздание."""
+    return type(
+        f"Instrumented{pool_class.__name__}",
+        (_TimedGet, pool_class),
+        {"metrics": metrics},
+    )
+
+
+def instrument(
+    engine: Engine, metrics: PoolMetrics, options: Optional[dict] = None
+) -> None:
+    """Подписывает metrics на события пула engine (для async - sync_engine).
+
+    options - параметры пула, переданные create_engine (см. pool_options).
+    """
+    metrics.pool = engine.pool
+    metrics.options = dict(options or {})
+
+    @event.listens_for(engine, "connect")
+    def _connect(*_):
+        metrics.increment("opened")
+
+    @event.listens_for(engine, "close")
+    def _close(*_):
+        metrics.increment("closed")
+
+    @event.listens_for(engine, "close_detached")
+    def _close_detached(*_):
+        metrics.increment("closed")
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidate(*_):
+        metrics.increment("invalidated")
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(*_):
+        metrics.increment("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(*_):
+        metrics.maybe_log()
+
+    @event.listens_for(engine, "engine_disposed")
+    def _disposed(*_):
+        metrics.pool = engine.pool
+
+
+# Метрики пулов по имени engine: sync - psycopg2, async - asyncpg
+pools: Dict[str, PoolMetrics] = {}
+
+
+def register(name: str) -> PoolMetrics:
+    return pools.setdefault(name, PoolMetrics(name))
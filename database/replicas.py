@@ -0,0 +1,130 @@
+"""Чтение с реплик: сессия, которая отправляет SELECT на реплику, а запись -
+на основную базу.
+
+Реплика выбирается по кругу один раз на сессию, чтобы все чтения запроса
+видели один и тот же снимок. После первой записи (flush, INSERT/UPDATE/DELETE,
+SELECT ... FOR UPDATE) сессия до конца работает с основной базой: чтение
+сразу после записи не должно зависеть от отставания реплики.
+"""
+
+import itertools
+import logging
+import time
+from threading import Lock
+from typing import List, Optional, Sequence
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger("database.replicas")
+
+
+class Replica:
+    """Реплика с отметкой недоступности.
+
+    Ошибка соединения выводит реплику из ротации на retry_interval секунд;
+    после этого первая сессия, которой она досталась, проверяет её SELECT 1
+    и возвращает в ротацию или откладывает ещё на интервал.
+    """
+
+    def __init__(self, name: str, engine: Engine, retry_interval: float):
+        self.name = name
+        self.engine = engine
+        self.retry_interval = retry_interval
+        self.down_until: Optional[float] = None
+        self._probe = Lock()
+        event.listen(engine, "handle_error", self._on_error)
+
+    def _on_error(self, context) -> None:
+        if context.is_disconnect or context.connection is None:
+            self.mark_down(context.original_exception)
+
+    def mark_down(self, error: BaseException) -> None:
+        if self.down_until is None:
+            logger.warning("реплика %s недоступна: %s", self.name, error)
+        self.down_until = time.monotonic() + self.retry_interval
+
+    def available(self) -> bool:
+        if self.down_until is None:
+            return True
+        if time.monotonic() < self.down_until:
+            return False
+        # Проверяет один поток, остальные пока считают реплику недоступной
+        if not self._probe.acquire(blocking=False):
+            return False
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        except DBAPIError as error:
+            self.mark_down(error)
+            return False
+        finally:
+            self._probe.release()
+        logger.info("реплика %s снова доступна", self.name)
+        self.down_until = None
+        return True
+
+    def snapshot(self) -> dict:
+        return {"name": self.name, "available": self.down_until is None}
+
+
+class ReplicaSet:
+    def __init__(self, replicas: Sequence[Replica]):
+        self.replicas: List[Replica] = list(replicas)
+        self._counter = itertools.count()
+
+    def choose(self) -> Optional[Replica]:
+        """Следующая доступная реплика по кругу; None - если доступных нет."""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._counter) % len(self.replicas)]
+            if replica.available():
+                return replica
+        return None
+
+
+def _is_write(clause) -> bool:
+    return isinstance(clause, UpdateBase) or (
+        getattr(clause, "_for_update_arg", None) is not None
+    )
+
+
+class RoutingSession(Session):
+    """Сессия с основной базой в bind и чтением с replicas.
+
+    Без реплик (или когда все недоступны) работает как обычная Session.
+    """
+
+    def __init__(self, replicas: Optional[ReplicaSet] = None, **kw):
+        super().__init__(**kw)
+        self.replicas = replicas
+        self.wrote = False
+        self._replica: Optional[Engine] = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or _is_write(clause):
+            self.wrote = True
+        if self.wrote or self.replicas is None:
+            return super().get_bind(mapper, clause=clause, **kw)
+        if self._replica is None:
+            self._replica = self._connect_replica() or super().get_bind(
+                mapper, clause=clause, **kw
+            )
+        return self._replica
+
+    def _connect_replica(self) -> Optional[Engine]:
+        # Соединение берётся сразу при выборе: если реплика не отвечает,
+        # она выводится из ротации и запрос уходит на следующую, а не падает
+        for _ in range(len(self.replicas.replicas)):
+            replica = self.replicas.choose()
+            if replica is None:
+                return None
+            try:
+                self.connection(bind_arguments={"bind": replica.engine})
+            except DBAPIError as error:
+                replica.mark_down(error)
+                continue
+            return replica.engine
+        return None
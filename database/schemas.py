@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Generic, List, Literal, Optional, TypeVar
 
 
 class PhoneNumberBase(BaseModel):
@@ -14,8 +15,7 @@ class PhoneNumber(PhoneNumberBase):
     id: int
     organization_id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ActivityBase(BaseModel):
@@ -27,12 +27,22 @@ class ActivityCreate(ActivityBase):
     pass
 
 
+class ActivityImport(ActivityCreate):
+    # Ключи строк файла: позволяют загрузить дерево целиком, ссылаясь
+    # на родителя из того же файла, id которого ещё неизвестен
+    key: Optional[str] = None
+    parent_key: Optional[str] = None
+
+
 class Activity(ActivityBase):
     id: int
     level: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ActivityNode(Activity):
+    children: List["ActivityNode"] = []
 
 
 class BuildingBase(BaseModel):
@@ -48,8 +58,7 @@ class BuildingCreate(BuildingBase):
 class Building(BuildingBase):
     id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class OrganizationBase(BaseModel):
@@ -61,6 +70,10 @@ class OrganizationCreate(OrganizationBase):
     phone_numbers: List[PhoneNumberCreate] = []
 
 
+class OrganizationImport(OrganizationCreate):
+    activity_ids: List[int] = []
+
+
 class OrganizationUpdate(OrganizationBase):
     name: Optional[str] = None
     building_id: Optional[int] = None
@@ -72,5 +85,83 @@ class Organization(OrganizationBase):
     activities: List[Activity]
     phone_numbers: List[PhoneNumber]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    processed: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = False
+
+
+class BuildingCluster(BaseModel):
+    # Префикс geohash ячейки; центр - среднее координат зданий в ней
+    geohash: str
+    latitude: float
+    longitude: float
+    buildings: int
+    organizations: int
+    # id здания, если оно в ячейке одно: клиент рисует его маркером
+    building_id: Optional[int] = None
+
+
+class OrganizationSuggestion(BaseModel):
+    id: int
+    name: str
+
+
+class BuildingStats(BaseModel):
+    building_id: int
+    organizations: int
+
+
+class ActivityStats(BaseModel):
+    activity_id: int
+    # Организации, у которых этот вид деятельности указан напрямую
+    organizations: int
+    # Разные организации с этим видом деятельности или любым его потомком
+    subtree_organizations: int
+
+
+class Change(BaseModel):
+    seq: int
+    entity: Literal["organization", "building", "activity"]
+    entity_id: int
+    # create и update для потребителя равнозначны: перечитать запись
+    operation: Literal["create", "update", "delete"]
+    changed_at: datetime
+
+
+class ChangeFeed(BaseModel):
+    changes: List[Change]
+    # since для следующего запроса; без изменений - тот же since
+    next_since: int
+    has_more: bool
+
+
+class ChangeLogHead(BaseModel):
+    # Последний seq: с него продолжают после полной синхронизации
+    seq: int
+    # since меньше horizon получает 410 - журнал до него сжат
+    horizon: int
+
+
+class BatchRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1)
+
+
+ItemType = TypeVar("ItemType")
+
+
+class BatchItem(BaseModel, Generic[ItemType]):
+    # Ответ идёт в порядке запроса; для ненайденных id found=false и item=null
+    id: int
+    found: bool
+    item: Optional[ItemType] = None
@@ -0,0 +1,347 @@
+import re
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+NGRAM_SIZE = 3
+# Порог похожести для названий с опечатками - как значение по умолчанию
+# pg_trgm.word_similarity_threshold, с которым работает оператор %> в PostgreSQL
+FUZZY_THRESHOLD = 0.6
+WORD = re.compile(r"[^\W_]+")
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def ngrams(text: str, size: int = NGRAM_SIZE) -> Set[str]:
+    return {text[i : i + size] for i in range(len(text) - size + 1)}
+
+
+def word_ngrams(words: List[str]) -> Set[str]:
+    # Слова дополняются пробелами, как в pg_trgm: опечатка в середине
+    # длинного слова оставляет общими триграммы его начала и конца
+    return {gram for word in words for gram in ngrams(f"  {word} ")}
+
+
+def word_similarity(term: str, text: str) -> float:
+    """Наибольшая доля общих триграмм term и подряд идущих слов text.
+
+    Приближение word_similarity() из pg_trgm: отрезки text берутся по
+    границам слов, по стольку слов, сколько их в term.
+    """
+    words, text_words = WORD.findall(term), WORD.findall(text)
+    if not words or not text_words:
+        return 0.0
+    grams = word_ngrams(words)
+    best = 0.0
+    for start in range(max(len(text_words) - len(words), 0) + 1):
+        extent = word_ngrams(text_words[start : start + len(words)])
+        best = max(best, len(grams & extent) / len(grams | extent))
+    return best
+
+
+class NgramIndex:
+    """Триграммный индекс названий для баз без pg_trgm (SQLite в тестах).
+
+    Поиск подстроки: кандидаты - пересечение списков по всем триграммам
+    запроса, затем точная проверка вхождения. Ранжирование - доля общих
+    триграмм запроса и названия, как similarity() в pg_trgm.
+
+    С fuzzy=True находятся и названия с опечатками: кандидаты - названия
+    хотя бы с одной общей триграммой, после вхождений идут названия, похожие
+    на запрос не меньше чем на FUZZY_THRESHOLD (word_similarity).
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._names: Dict[int, str] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._lock = Lock()
+
+    def load(self, rows: Iterable[Tuple[int, str]]) -> None:
+        names, postings = {}, {}
+        for id, name in rows:
+            names[id] = normalize(name or "")
+            for gram in ngrams(names[id]):
+                postings.setdefault(gram, set()).add(id)
+        with self._lock:
+            self._names, self._postings = names, postings
+            self.loaded = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._names, self._postings = {}, {}
+            self.loaded = False
+
+    def add(self, id: int, name: str) -> None:
+        with self._lock:
+            self._remove(id)
+            self._names[id] = normalize(name or "")
+            for gram in ngrams(self._names[id]):
+                self._postings.setdefault(gram, set()).add(id)
+
+    def remove(self, id: int) -> None:
+        with self._lock:
+            self._remove(id)
+
+    def _remove(self, id: int) -> None:
+        name = self._names.pop(id, None)
+        if name is None:
+            return
+        for gram in ngrams(name):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(id)
+                if not posting:
+                    del self._postings[gram]
+
+    def search(self, term: str, fuzzy: bool = False) -> List[int]:
+        """id названий, содержащих term, от наиболее похожих к наименее.
+
+        fuzzy=True - после них названия, похожие на term с опечатками.
+        """
+        term = normalize(term)
+        grams = ngrams(term)
+        with self._lock:
+            postings = [self._postings.get(gram, set()) for gram in grams]
+            if fuzzy and grams:
+                candidates = set().union(*postings)
+            elif grams:
+                postings.sort(key=len)
+                candidates = set(postings[0]).intersection(*postings[1:])
+            else:
+                candidates = set(self._names)
+            scored = []
+            for id in candidates:
+                name = self._names[id]
+                if term in name:
+                    match = 1.0
+                elif fuzzy:
+                    match = word_similarity(term, name)
+                    if match < FUZZY_THRESHOLD:
+                        continue
+                else:
+                    continue
+                name_grams = ngrams(name)
+                union = grams | name_grams
+                score = len(grams & name_grams) / len(union) if union else 1.0
+                scored.append((-match, -score, id))
+        scored.sort()
+        return [id for _, _, id in scored]
+
+
+def word_starts(text: str) -> List[int]:
+    """Позиции, с которых в тексте начинаются слова из букв и цифр."""
+    return [
+        i
+        for i, char in enumerate(text)
+        if char.isalnum() and (i == 0 or not text[i - 1].isalnum())
+    ]
+
+
+class PrefixIndex:
+    """Подсказки по началу названия для строки поиска.
+
+    Название находится по началу любого своего слова: «рог» находит
+    ООО «Рога и Копыта». Вместо отдельной строки на каждое слово индекс
+    хранит отсортированные пары (id, смещение слова) в массивах array -
+    10 байт на слово; название хранится один раз, как есть, и
+    нормализуется только в сравнениях. Начало ищется бинарным поиском,
+    подсказки - подряд идущие пары за ним, поэтому время ответа зависит от
+    limit, а не от числа названий.
+
+    Пары разбиты на куски по CHUNK_SIZE, как в sortedcontainers: вставка и
+    удаление сдвигают один кусок, а не весь индекс.
+
+    Изменения приходят событиями только в процесс, который их записал;
+    остальные процессы видят их после перезапуска.
+    """
+
+    CHUNK_SIZE = 1024
+    # Смещение хранится в unsigned short; слова дальше в индекс не попадают
+    MAX_OFFSET = 2**16 - 1
+
+    def __init__(self):
+        self.loaded = False
+        self._names: Dict[int, str] = {}
+        # Куски (ids, offsets), каждый отсортирован и не пуст
+        self._chunks: List[Tuple[array, array]] = []
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def entries(self) -> int:
+        return sum(len(ids) for ids, _ in self._chunks)
+
+    @staticmethod
+    def _words(name: str) -> List[int]:
+        # Слово начинается с буквы или цифры, а не с комбинируемого знака:
+        # нормализация хвоста с начала слова совпадает с хвостом
+        # нормализованного названия
+        return [
+            offset for offset in word_starts(name) if offset <= PrefixIndex.MAX_OFFSET
+        ]
+
+    def _key(self, chunk: Tuple[array, array], position: int) -> Tuple[str, int]:
+        ids, offsets = chunk
+        id = ids[position]
+        return normalize(self._names[id][offsets[position] :]), id
+
+    def _locate(self, target: Tuple[str, int]) -> Tuple[int, int]:
+        """Кусок и позиция первой пары не меньше target."""
+        chunks = self._chunks
+        index = bisect_left(
+            range(len(chunks)), target, key=lambda i: self._key(chunks[i], -1)
+        )
+        if index == len(chunks):
+            return index, 0
+        chunk = chunks[index]
+        return index, bisect_left(
+            range(len(chunk[0])), target, key=lambda i: self._key(chunk, i)
+        )
+
+    def load(self, rows: Iterable[Tuple[int, str]]) -> None:
+        names, entries = {}, []
+        for id, name in rows:
+            name = names[id] = name or ""
+            normalized = normalize(name)
+            # Хвост нормализованного названия совпадает с нормализацией хвоста,
+            # только если NFKC ничего не меняет и casefold переводит каждый
+            # символ ровно в один (casefold не укорачивает символы, так что
+            # хватает равенства длин). Иначе совпадение длин случайно:
+            # «ß» удлиняется, а «e» с комбинируемым акутом сливается в «é»
+            shared = unicodedata.is_normalized("NFKC", name) and len(normalized) == len(
+                name
+            )
+            entries.extend(
+                (
+                    normalized[offset:] if shared else normalize(name[offset:]),
+                    id,
+                    offset,
+                )
+                for offset in self._words(name)
+            )
+        entries.sort()
+        chunks = [
+            (
+                array("q", (id for _, id, _ in part)),
+                array("H", (offset for _, _, offset in part)),
+            )
+            for part in (
+                entries[start : start + self.CHUNK_SIZE]
+                for start in range(0, len(entries), self.CHUNK_SIZE)
+            )
+        ]
+        with self._lock:
+            self._names, self._chunks = names, chunks
+            self.loaded = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._names, self._chunks = {}, []
+            self.loaded = False
+
+    def add(self, id: int, name: str) -> None:
+        name = name or ""
+        with self._lock:
+            self._remove(id)
+            self._names[id] = name
+            for offset in self._words(name):
+                self._insert(id, name, offset)
+
+    def _insert(self, id: int, name: str, offset: int) -> None:
+        if not self._chunks:
+            self._chunks.append((array("q", [id]), array("H", [offset])))
+            return
+        index, position = self._locate((normalize(name[offset:]), id))
+        if index == len(self._chunks):
+            index -= 1
+            position = len(self._chunks[index][0])
+        ids, offsets = self._chunks[index]
+        ids.insert(position, id)
+        offsets.insert(position, offset)
+        if len(ids) > 2 * self.CHUNK_SIZE:
+            half = len(ids) // 2
+            self._chunks[index : index + 1] = [
+                (ids[:half], offsets[:half]),
+                (ids[half:], offsets[half:]),
+            ]
+
+    def remove(self, id: int) -> None:
+        with self._lock:
+            self._remove(id)
+
+    def _remove(self, id: int) -> None:
+        name = self._names.get(id)
+        if name is None:
+            return
+        for offset in self._words(name):
+            found = self._find(id, name, offset)
+            if found is None:
+                continue
+            index, position = found
+            ids, offsets = self._chunks[index]
+            del ids[position]
+            del offsets[position]
+            if not ids:
+                del self._chunks[index]
+        del self._names[id]
+
+    def _find(self, id: int, name: str, offset: int) -> Optional[Tuple[int, int]]:
+        """Кусок и позиция пары (id, offset) или None, если её нет."""
+        target = (normalize(name[offset:]), id)
+        index, position = self._locate(target)
+        # Пары с тем же ключом отличаются только смещением
+        while index < len(self._chunks):
+            ids, offsets = self._chunks[index]
+            if position == len(ids):
+                index, position = index + 1, 0
+                continue
+            if self._key(self._chunks[index], position) != target:
+                break
+            if offsets[position] == offset:
+                return index, position
+            position += 1
+        return None
+
+    def suggest(self, prefix: str, limit: int) -> List[Tuple[int, str]]:
+        """(id, название) для названий со словом на prefix, по алфавиту
+        от найденного слова; название с несколькими такими словами - один раз."""
+        prefix = normalize(prefix).strip()
+        if not prefix:
+            return []
+        found: Dict[int, str] = {}
+        with self._lock:
+            # id в индексе положительные: (prefix, -1) меньше любой пары
+            # со словом на prefix
+            index, position = self._locate((prefix, -1))
+            while index < len(self._chunks) and len(found) < limit:
+                chunk = self._chunks[index]
+                word, id = self._key(chunk, position)
+                if not word.startswith(prefix):
+                    break
+                found.setdefault(id, self._names[id])
+                position += 1
+                if position == len(chunk[0]):
+                    index, position = index + 1, 0
+        return list(found.items())
+
+    def memory_bytes(self) -> int:
+        """Примерный объём индекса в памяти: словарь, названия и массивы."""
+        with self._lock:
+            size = sys.getsizeof(self._names) + sys.getsizeof(self._chunks)
+            for id, name in self._names.items():
+                size += sys.getsizeof(id) + sys.getsizeof(name)
+            for ids, offsets in self._chunks:
+                size += sys.getsizeof(ids) + sys.getsizeof(offsets)
+            return size
+
+
+organization_name_index = NgramIndex()
+organization_suggest_index = PrefixIndex()
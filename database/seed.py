@@ -0,0 +1,389 @@
+"""Синтетический справочник: связанные организации, здания, телефоны и дерево
+видов деятельности.
+
+Генерация детерминирована: одинаковые SeedSpec дают одинаковые строки.
+В PostgreSQL строки загружаются через COPY, в остальных базах - многострочными
+INSERT пачками по CHUNK_SIZE. Из командной строки:
+
+    python -m database.seed --organizations 1000000 --buildings 200000 --clear
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import column, delete, func, insert, select, text
+from sqlalchemy import table as sql_table
+from sqlalchemy.engine import Connection
+
+from database import counters, geo, models
+
+# Строк в одной пачке COPY / INSERT
+CHUNK_SIZE = 50_000
+
+ACTIVITY_ROOTS = [
+    "Еда",
+    "Автомобили",
+    "Строительство",
+    "Образование",
+    "Медицина",
+    "Спорт",
+    "Услуги",
+    "Торговля",
+]
+ORGANIZATION_FORMS = ["ООО", "АО", "ИП", "ЗАО"]
+ORGANIZATION_WORDS = [
+    "Рога и Копыта",
+    "Север",
+    "Вектор",
+    "Альфа",
+    "Гранит",
+    "Меридиан",
+    "Восход",
+    "Радуга",
+    "Логос",
+    "Феникс",
+    "Импульс",
+    "Горизонт",
+    "Сфера",
+    "Орион",
+    "Прогресс",
+    "Кристалл",
+]
+STREETS = [
+    "Ленина",
+    "Блюхера",
+    "Мира",
+    "Гагарина",
+    "Советская",
+    "Садовая",
+    "Лесная",
+    "Пушкина",
+    "Московская",
+    "Центральная",
+]
+# Город, вокруг которого располагаются кластеры зданий
+CITY_BOUNDS = (55.55, 37.35, 55.95, 37.85)
+# Разброс зданий вокруг центра кластера, градусы (~1 км)
+CLUSTER_SPREAD = 0.01
+
+
+@dataclass(frozen=True)
+class SeedSpec:
+    organizations: int
+    buildings: int
+    activity_roots: int = 8
+    activity_levels: int = 5
+    # Число потомков узла - распределение Парето с обрезкой: у большинства
+    # узлов 1-2 потомка, у немногих - до activity_max_fanout
+    activity_max_fanout: int = 12
+    activities_per_organization: int = 3
+    phones_per_organization: int = 2
+    # Здания сгруппированы вокруг центров, как кварталы и торговые центры
+    building_clusters: int = 20
+    seed: int = 42
+
+    def __post_init__(self):
+        # Организациям нужны здание, вид деятельности и телефон
+        invalid = [
+            name
+            for name, value in self.as_dict().items()
+            if name != "seed" and value < 1
+        ]
+        if invalid:
+            raise ValueError(
+                f"Параметры набора должны быть не меньше 1: {', '.join(invalid)}"
+            )
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class SyntheticDirectory:
+    """Строки всех таблиц с id, назначенными после id_offsets.
+
+    Смещения позволяют дописывать набор в непустую базу: новые id идут
+    после уже существующих.
+    """
+
+    def __init__(self, spec: SeedSpec, id_offsets: Optional[Dict[str, int]] = None):
+        self.spec = spec
+        offsets = id_offsets or {}
+        self.activity_offset = offsets.get("activities", 0)
+        self.building_offset = offsets.get("buildings", 0)
+        self.organization_offset = offsets.get("organizations", 0)
+        self.activities = self._activity_tree()
+        # Популярность видов деятельности убывает с номером: организации
+        # распределены по дереву неравномерно, как в реальном справочнике
+        self._activity_weights = list(
+            itertools.accumulate(1 / (rank + 1) for rank in range(len(self.activities)))
+        )
+
+    def _activity_tree(self) -> List[Tuple[int, str, Optional[int], int]]:
+        rng = random.Random(self.spec.seed)
+        activities = []
+
+        def add(name: str, parent_id: Optional[int], level: int):
+            id = self.activity_offset + len(activities) + 1
+            activities.append((id, name, parent_id, level))
+            return activities[-1]
+
+        level_nodes = []
+        for root in range(self.spec.activity_roots):
+            name = ACTIVITY_ROOTS[root % len(ACTIVITY_ROOTS)]
+            if root >= len(ACTIVITY_ROOTS):
+                name = f"{name} {root // len(ACTIVITY_ROOTS) + 1}"
+            level_nodes.append(add(name, None, 1))
+        for level in range(2, self.spec.activity_levels + 1):
+            next_nodes = []
+            for parent_id, parent_name, _, _ in level_nodes:
+                fanout = min(self.spec.activity_max_fanout, int(rng.paretovariate(1.2)))
+                separator = " " if level == 2 else "."
+                for child in range(fanout):
+                    name = f"{parent_name}{separator}{child + 1}"
+                    next_nodes.append(add(name, parent_id, level))
+            level_nodes = next_nodes
+        return activities
+
+    def closure(self) -> Iterator[Tuple[int, int, int]]:
+        parents = {id: parent_id for id, _, parent_id, _ in self.activities}
+        for id in parents:
+            ancestor, depth = id, 0
+            while ancestor is not None:
+                yield ancestor, id, depth
+                ancestor, depth = parents.get(ancestor), depth + 1
+
+    def buildings(self) -> Iterator[Tuple[int, str, float, float]]:
+        rng = random.Random(self.spec.seed + 1)
+        min_lat, min_lon, max_lat, max_lon = CITY_BOUNDS
+        centers = [
+            (rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon))
+            for _ in range(self.spec.building_clusters)
+        ]
+        weights = list(
+            itertools.accumulate(1 / (rank + 1) for rank in range(len(centers)))
+        )
+        for number in range(1, self.spec.buildings + 1):
+            latitude, longitude = rng.choices(centers, cum_weights=weights)[0]
+            street = STREETS[rng.randrange(len(STREETS))]
+            yield (
+                self.building_offset + number,
+                f"г. Москва, ул. {street}, д. {rng.randint(1, 200)}",
+                min(max(rng.gauss(latitude, CLUSTER_SPREAD), -90.0), 90.0),
+                min(max(rng.gauss(longitude, CLUSTER_SPREAD), -180.0), 180.0),
+            )
+
+    def organizations(
+        self,
+    ) -> Iterator[Tuple[Tuple[int, str, int], List[str], List[int]]]:
+        """(организация, телефоны, id видов деятельности) для каждой организации."""
+        rng = random.Random(self.spec.seed + 2)
+        activity_ids = [id for id, *_ in self.activities]
+        for number in range(1, self.spec.organizations + 1):
+            id = self.organization_offset + number
+            name = (
+                f"{rng.choice(ORGANIZATION_FORMS)} "
+                f"«{rng.choice(ORGANIZATION_WORDS)} {number}»"
+            )
+            building_id = self.building_offset + rng.randint(1, self.spec.buildings)
+            phones = [
+                f"+7 9{rng.randint(0, 99):02d} {rng.randint(0, 999):03d}"
+                f"-{rng.randint(0, 99):02d}-{rng.randint(0, 99):02d}"
+                for _ in range(rng.randint(1, self.spec.phones_per_organization))
+            ]
+            count = rng.randint(1, self.spec.activities_per_organization)
+            chosen = rng.choices(
+                activity_ids, cum_weights=self._activity_weights, k=count
+            )
+            yield (id, name, building_id), phones, sorted(set(chosen))
+
+
+class _Writer:
+    """COPY FROM STDIN для psycopg2, многострочный INSERT для остальных драйверов."""
+
+    def __init__(self, connection: Connection):
+        self.connection = connection
+        self.copy = connection.dialect.driver == "psycopg2"
+
+    def write(self, table, columns: Sequence[str], rows: List[tuple]) -> None:
+        if not rows:
+            return
+        if not self.copy:
+            # Только перечисленные колонки: insert(table) дописал бы значения
+            # по умолчанию модели для колонок, которых в ранней схеме ещё нет
+            target = sql_table(table.name, *[column(name) for name in columns])
+            self.connection.execute(
+                insert(target), [dict(zip(columns, row)) for row in rows]
+            )
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            tuple("" if value is None else value for value in row) for row in rows
+        )
+        buffer.seek(0)
+        cursor = self.connection.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+
+
+def _chunks(rows, size: int = CHUNK_SIZE) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_TABLES = (
+    models.BuildingStats.__table__,
+    models.ActivityStats.__table__,
+    models.organization_activity_association,
+    models.PhoneNumber.__table__,
+    models.Organization.__table__,
+    models.Building.__table__,
+    models.ActivityClosure.__table__,
+    models.Activity.__table__,
+)
+
+
+def clear(connection: Connection) -> None:
+    """Удаляет все строки справочника."""
+    if connection.dialect.name == "postgresql":
+        names = ", ".join(table.name for table in _TABLES)
+        connection.execute(text(f"TRUNCATE {names} RESTART IDENTITY"))
+        return
+    for table in _TABLES:
+        connection.execute(delete(table))
+
+
+def _id_offsets(connection: Connection) -> Dict[str, int]:
+    return {
+        model.__tablename__: connection.scalar(select(func.max(model.id))) or 0
+        for model in (models.Activity, models.Building, models.Organization)
+    }
+
+
+def _reset_sequences(connection: Connection) -> None:
+    # id заданы явно, поэтому последовательности сдвигаются за максимум
+    if connection.dialect.name != "postgresql":
+        return
+    for table in ("organizations", "buildings", "activities"):
+        connection.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+            )
+        )
+
+
+def seed(
+    connection: Connection, spec: SeedSpec, hierarchy: bool = True
+) -> SyntheticDirectory:
+    """Дописывает набор spec в базу в транзакции connection.
+
+    hierarchy=False пропускает level и activity_closure - для схем, где их
+    ещё нет (ранние миграции): замыкание строится миграцией по parent_id.
+    """
+    directory = SyntheticDirectory(spec, _id_offsets(connection))
+    writer = _Writer(connection)
+
+    activity_columns = ["id", "name", "parent_id"] + (["level"] if hierarchy else [])
+    writer.write(
+        models.Activity.__table__,
+        activity_columns,
+        [row[: len(activity_columns)] for row in directory.activities],
+    )
+    if hierarchy:
+        for chunk in _chunks(directory.closure()):
+            writer.write(
+                models.ActivityClosure.__table__,
+                ["ancestor_id", "descendant_id", "depth"],
+                chunk,
+            )
+    for chunk in _chunks(directory.buildings()):
+        writer.write(
+            models.Building.__table__, ["id", "address", "latitude", "longitude"], chunk
+        )
+    for chunk in _chunks(directory.organizations()):
+        writer.write(
+            models.Organization.__table__,
+            ["id", "name", "building_id"],
+            [organization for organization, _, _ in chunk],
+        )
+        writer.write(
+            models.PhoneNumber.__table__,
+            ["number", "organization_id"],
+            [
+                (phone, organization[0])
+                for organization, phones, _ in chunk
+                for phone in phones
+            ],
+        )
+        writer.write(
+            models.organization_activity_association,
+            ["organization_id", "activity_id"],
+            [
+                (organization[0], activity_id)
+                for organization, _, activity_ids in chunk
+                for activity_id in activity_ids
+            ],
+        )
+    _reset_sequences(connection)
+    return directory
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Загрузка синтетического справочника")
+    parser.add_argument("--organizations", type=int, default=10_000)
+    parser.add_argument("--buildings", type=int, default=2_000)
+    parser.add_argument("--activity-roots", type=int, default=8)
+    parser.add_argument("--activity-levels", type=int, default=5)
+    parser.add_argument("--building-clusters", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--clear", action="store_true", help="очистить справочник перед загрузкой"
+    )
+    args = parser.parse_args()
+
+    from database.connection import engine
+
+    try:
+        spec = SeedSpec(
+            organizations=args.organizations,
+            buildings=args.buildings,
+            activity_roots=args.activity_roots,
+            activity_levels=args.activity_levels,
+            building_clusters=args.building_clusters,
+            seed=args.seed,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        if args.clear:
+            clear(connection)
+        directory = seed(connection, spec)
+        geo.fill_geohash(connection)
+        counters.reconcile(connection)
+    print(
+        f"{spec.organizations} организаций, {spec.buildings} зданий, "
+        f"{len(directory.activities)} видов деятельности "
+        f"за {time.perf_counter() - started:.1f} с"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Снимок дерева видов деятельности в памяти процесса.
+
+Справочник видов деятельности маленький и меняется редко, поэтому дерево
+целиком читается одним запросом и отвечает на вопросы о предках, потомках
+и глубине без обращения к БД. Снимок неизменяем: добавление узлов строит
+новый снимок и подменяет ссылку на него, так что читатели никогда не видят
+дерево наполовину обновлённым.
+"""
+
+import hashlib
+import itertools
+import time
+from collections import defaultdict
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+
+from database import schemas
+from database.search import normalize
+
+# (id, name, parent_id, level) - как в таблице activities
+Row = Tuple[int, str, Optional[int], int]
+
+_adapter = TypeAdapter(List[schemas.ActivityNode])
+
+
+class ActivityTree:
+    """Неизменяемое дерево: узлы, дети каждого узла и корни по возрастанию id."""
+
+    def __init__(self, rows: Iterable[Row], version: int):
+        self.version = version
+        self._nodes: Dict[int, Row] = {}
+        children = defaultdict(list)
+        for id, name, parent_id, level in rows:
+            self._nodes[id] = (id, name, parent_id, level)
+            children[parent_id].append(id)
+        self._children = {
+            parent_id: tuple(sorted(ids)) for parent_id, ids in children.items()
+        }
+        self._names = {id: normalize(row[1] or "") for id, row in self._nodes.items()}
+        self._body: Optional[bytes] = None
+        self._etag: Optional[str] = None
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def record(self, id: int) -> dict:
+        id, name, parent_id, level = self._nodes[id]
+        return {"id": id, "name": name, "parent_id": parent_id, "level": level}
+
+    def children(self, id: Optional[int]) -> Tuple[int, ...]:
+        """Дети узла; для None - корни."""
+        return self._children.get(id, ())
+
+    def depth(self, id: int) -> int:
+        return self._nodes[id][3]
+
+    def ancestors(self, id: int) -> List[int]:
+        """Путь от корня до узла включительно."""
+        path = []
+        while id is not None:
+            path.append(id)
+            id = self._nodes[id][2]
+        path.reverse()
+        return path
+
+    def descendants(self, id: int, max_depth: Optional[int] = None) -> List[int]:
+        """Узел и его потомки по уровням, внутри уровня - по id
+        (тот же порядок, что у выборки по таблице замыкания)."""
+        found, level, depth = [], [id], 0
+        while level and (max_depth is None or depth <= max_depth):
+            found.extend(level)
+            level = sorted(
+                child for parent in level for child in self._children.get(parent, ())
+            )
+            depth += 1
+        return found
+
+    def search(self, term: str) -> List[int]:
+        """id узлов, в названии которых есть term, без учёта регистра."""
+        term = normalize(term)
+        return [id for id, name in self._names.items() if term in name]
+
+    def with_rows(self, rows: Iterable[Tuple[int, str, Optional[int]]], version: int):
+        """Новый снимок с добавленными узлами (id, name, parent_id).
+
+        Родитель должен быть в снимке или среди rows раньше потомка;
+        иначе KeyError - снимок отстал от БД и его надо перечитать.
+        """
+        nodes = dict(self._nodes)
+        for id, name, parent_id in rows:
+            level = nodes[parent_id][3] + 1 if parent_id is not None else 1
+            nodes[id] = (id, name, parent_id, level)
+        return ActivityTree(nodes.values(), version)
+
+    def nested(self) -> List[schemas.ActivityNode]:
+        """Корни с вложенными детьми. Узлы собираются снизу вверх,
+        без рекурсии: глубина дерева ничем не ограничена."""
+        nodes = {}
+        for id, name, parent_id, level in sorted(
+            self._nodes.values(), key=lambda row: -row[3]
+        ):
+            nodes[id] = schemas.ActivityNode.model_construct(
+                id=id,
+                name=name,
+                parent_id=parent_id,
+                level=level,
+                children=[nodes[child] for child in self.children(id)],
+            )
+        return [nodes[id] for id in self.children(None)]
+
+    @property
+    def body(self) -> bytes:
+        """Дерево целиком в JSON; сериализуется один раз на снимок."""
+        if self._body is None:
+            self._body = _adapter.dump_json(self.nested())
+        return self._body
+
+    @property
+    def etag(self) -> str:
+        # По содержимому, а не по version: совпадает у всех процессов
+        if self._etag is None:
+            digest = hashlib.blake2b(self.body, digest_size=16).hexdigest()
+            self._etag = f'"{digest}"'
+        return self._etag
+
+
+class TreeSnapshot:
+    """Текущий снимок дерева процесса.
+
+    События о новых узлах приходят только в процесс, который их записал,
+    поэтому снимок старше max_age секунд перечитывается из БД: остальные
+    процессы увидят новые узлы не позже чем через max_age. Перечитывает
+    один поток, остальные в это время отвечают по прежнему снимку. Узел,
+    которого нет в снимке, но который есть в БД, перечитывает снимок сразу
+    (см. reload).
+    """
+
+    def __init__(self):
+        self.tree: Optional[ActivityTree] = None
+        self.built_at = 0.0
+        self._versions = itertools.count(1)
+        self._lock = Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.tree is not None
+
+    def _expired(self, max_age: float) -> bool:
+        return max_age > 0 and time.monotonic() - self.built_at > max_age
+
+    def get(self, load: Callable[[], Iterable[Row]], max_age: float) -> ActivityTree:
+        tree = self.tree
+        if tree is not None and not self._expired(max_age):
+            return tree
+        # Первую загрузку ждут все, обновление устаревшего - только один поток
+        if not self._lock.acquire(blocking=tree is None):
+            return tree
+        try:
+            if self.tree is None or self._expired(max_age):
+                self.load(load())
+            return self.tree
+        finally:
+            self._lock.release()
+
+    def reload(
+        self, load: Callable[[], Iterable[Row]], stale: ActivityTree
+    ) -> ActivityTree:
+        """Перечитывает снимок, если он всё ещё stale.
+
+        Потоки, одновременно увидевшие один и тот же устаревший снимок,
+        перечитывают его один раз.
+        """
+        with self._lock:
+            if self.tree is None or self.tree is stale:
+                self.load(load())
+            return self.tree
+
+    def load(self, rows: Iterable[Row]) -> None:
+        self.tree = ActivityTree(rows, next(self._versions))
+        self.built_at = time.monotonic()
+
+    def add(self, rows: Iterable[Tuple[int, str, Optional[int]]]) -> None:
+        with self._lock:
+            if self.tree is None:
+                return
+            try:
+                self.tree = self.tree.with_rows(rows, next(self._versions))
+            except KeyError:
+                # Родителя нет в снимке: прочитать дерево заново при обращении
+                self.tree = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self.tree = None
+
+
+activity_tree = TreeSnapshot()
@@ -0,0 +1,86 @@
+import os
+
+# Настройки читаются при импорте config: тестам хватает SQLite и служебного
+# ключа без лимитов
+os.environ.setdefault("DATABASE_USER", "test")
+os.environ.setdefault("DATABASE_PASSWORD", "test")
+os.environ.setdefault("DATABASE_HOST", "localhost")
+os.environ.setdefault("DATABASE_PORT", "5432")
+os.environ.setdefault("DATABASE_NAME", "test")
+os.environ.setdefault("API_KEY", "test-key")
+os.environ.setdefault("API_KEY_DEFAULT_RATE", "1000000")
+os.environ.setdefault("API_KEY_DEFAULT_BURST", "1000000")
+os.environ.setdefault("API_KEY_DEFAULT_CONCURRENCY", "100000")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.cache import response_cache
+from api.routers import activities, buildings, changes, organizations
+from api.security.keys import key_store
+from database import geo, models, search, tree
+from database.connection import get_db, get_read_db
+
+API_KEY = os.environ["API_KEY"]
+
+
+def _reset_memory() -> None:
+    # Кэш ответов и индексы в памяти - общие на процесс, а база у каждого
+    # теста своя
+    response_cache.backend.clear()
+    geo.building_index.clear()
+    search.organization_name_index.clear()
+    search.organization_suggest_index.clear()
+    tree.activity_tree.clear()
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    models.Base.metadata.create_all(engine)
+    _reset_memory()
+    yield engine
+    _reset_memory()
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as session:
+        yield session
+
+
+@pytest.fixture
+def client(session_factory):
+    app = FastAPI()
+    for router in (
+        organizations.router,
+        buildings.router,
+        activities.router,
+        changes.router,
+    ):
+        app.include_router(router)
+
+    def get_test_db():
+        with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_read_db] = get_test_db
+    key_store.session_factory = session_factory
+    key_store.invalidate()
+    with TestClient(app, headers={"X-API-Key": API_KEY}) as client:
+        yield client
@@ -0,0 +1,111 @@
+import json
+
+from database import models, tree
+from tests.utils import create_test_activity, create_test_organization
+
+
+def test_activity_created_by_another_process_is_found(client, db):
+    known = create_test_activity(db, name="Еда")
+    assert client.get(f"/activities/{known.id}/subtree").status_code == 200
+    snapshot = tree.activity_tree.tree
+
+    # Запись в обход репозитория: событие о новом узле до снимка не дошло
+    created = create_test_activity(db, name="Автомобили")
+
+    response = client.get(f"/activities/{created.id}/subtree")
+    assert response.status_code == 200
+    assert [item["name"] for item in response.json()] == ["Автомобили"]
+    assert tree.activity_tree.tree is not snapshot
+    assert client.get(f"/organizations/by_activity/{created.id}").json() == []
+
+
+def test_missing_activity_does_not_reload_tree(client, db):
+    known = create_test_activity(db)
+    assert client.get(f"/activities/{known.id}/subtree").status_code == 200
+    snapshot = tree.activity_tree.tree
+
+    assert client.get(f"/activities/{known.id + 1}/subtree").status_code == 404
+    assert tree.activity_tree.tree is snapshot
+
+
+def _closure(db):
+    return set(
+        db.query(
+            models.ActivityClosure.ancestor_id,
+            models.ActivityClosure.descendant_id,
+            models.ActivityClosure.depth,
+        )
+    )
+
+
+def _create(client, name, parent_id=None):
+    response = client.post("/activities/", json={"name": name, "parent_id": parent_id})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_created_activity_inherits_ancestors(client, db):
+    root = _create(client, "Еда")
+    child = _create(client, "Мясная продукция", root)
+    grandchild = _create(client, "Колбасы", child)
+    other = _create(client, "Автомобили")
+
+    assert _closure(db) == {
+        (root, root, 0),
+        (child, child, 0),
+        (grandchild, grandchild, 0),
+        (other, other, 0),
+        (root, child, 1),
+        (child, grandchild, 1),
+        (root, grandchild, 2),
+    }
+    levels = dict(db.query(models.Activity.id, models.Activity.level))
+    assert [levels[id] for id in (root, child, grandchild, other)] == [1, 2, 3, 1]
+
+
+def test_missing_parent_adds_no_closure_rows(client, db):
+    root = _create(client, "Еда")
+
+    response = client.post("/activities/", json={"name": "Сирота", "parent_id": 999})
+
+    assert response.status_code == 404
+    assert _closure(db) == {(root, root, 0)}
+
+
+def test_imported_tree_matches_parent_links(client, db):
+    root = _create(client, "Еда")
+    rows = [
+        {"name": "Молочная продукция", "parent_id": root, "key": "milk"},
+        {"name": "Сыры", "parent_key": "milk", "key": "cheese"},
+        {"name": "Твёрдые сыры", "parent_key": "cheese"},
+    ]
+
+    response = client.post(
+        "/activities/import",
+        content="\n".join(json.dumps(row) for row in rows).encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    parents = dict(db.query(models.Activity.id, models.Activity.parent_id))
+    expected = set()
+    for id in parents:
+        ancestor, depth = id, 0
+        while ancestor is not None:
+            expected.add((ancestor, id, depth))
+            ancestor, depth = parents[ancestor], depth + 1
+    assert len(parents) == 4
+    assert _closure(db) == expected
+
+
+def test_children_filter_uses_new_descendants(client, db):
+    root = _create(client, "Еда")
+    child = _create(client, "Мясная продукция", root)
+    grandchild = _create(client, "Колбасы", child)
+    organization = create_test_organization(db, name="Колбасный цех")
+    organization.activities.append(db.get(models.Activity, grandchild))
+    db.commit()
+
+    response = client.get(f"/organizations/by_activity/{root}?include_children=true")
+
+    assert [item["id"] for item in response.json()] == [organization.id]
@@ -0,0 +1,122 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from api.repositories.async_repositories import AsyncOrganizationRepository
+from api.routers import activities, buildings, organizations
+from api.security.keys import key_store
+from config import settings
+from database import models
+from database.connection import get_db, get_read_db
+
+
+@pytest.fixture
+def async_client(tmp_path, session_factory):
+    """Роутеры с AsyncSession (aiosqlite), как при DATABASE_ASYNC=true."""
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    setup = create_engine(url)
+    models.Base.metadata.create_all(setup)
+    setup.dispose()
+    engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    factory = async_sessionmaker(bind=engine, autoflush=False)
+    sessions = []
+
+    async def get_async_db():
+        async with factory() as session:
+            sessions.append(session)
+            yield session
+
+    app = FastAPI()
+    for router in (organizations.router, buildings.router, activities.router):
+        app.include_router(router)
+    # Роутеры зависят от get_session, который в тестах - get_db
+    app.dependency_overrides[get_db] = get_async_db
+    app.dependency_overrides[get_read_db] = get_async_db
+    key_store.session_factory = session_factory
+    key_store.invalidate()
+    with TestClient(app, headers={"X-API-Key": settings.API_KEY}) as client:
+        client.sessions = sessions
+        yield client
+        client.portal.call(engine.dispose)
+
+
+def test_crud_through_async_session(async_client):
+    building = async_client.post(
+        "/buildings/",
+        json={"address": "ул. Ленина, 1", "latitude": 55.75, "longitude": 37.62},
+    ).json()
+    created = async_client.post(
+        "/organizations/",
+        json={
+            "name": "Рога и Копыта",
+            "building_id": building["id"],
+            "phone_numbers": [{"number": "2-222-222"}],
+        },
+    )
+    assert created.status_code == 200
+    organization_id = created.json()["id"]
+
+    read = async_client.get(f"/organizations/{organization_id}").json()
+    updated = async_client.put(
+        f"/organizations/{organization_id}",
+        json={"name": "Рога", "building_id": building["id"]},
+    )
+    deleted = async_client.delete(f"/organizations/{organization_id}")
+
+    assert read["building"]["address"] == "ул. Ленина, 1"
+    assert [phone["number"] for phone in read["phone_numbers"]] == ["2-222-222"]
+    assert updated.json()["name"] == "Рога"
+    assert deleted.status_code == 200
+    assert async_client.get(f"/organizations/{organization_id}").status_code == 404
+    assert async_client.sessions
+    assert all(isinstance(session, AsyncSession) for session in async_client.sessions)
+
+
+def test_lists_and_search_through_async_session(async_client):
+    building = async_client.post(
+        "/buildings/",
+        json={"address": "ул. Мира, 2", "latitude": 55.75, "longitude": 37.62},
+    ).json()
+    for name in ("Аптека", "Банк", "Аптечный пункт"):
+        async_client.post(
+            "/organizations/", json={"name": name, "building_id": building["id"]}
+        )
+
+    page = async_client.get("/organizations/?limit=2")
+    found = async_client.get("/organizations/search_by_name/?name=апте")
+    nearby = async_client.get(
+        "/organizations/nearby?latitude=55.75&longitude=37.62&radius_km=1"
+    )
+
+    assert [item["name"] for item in page.json()] == ["Аптека", "Банк"]
+    assert "X-Next-Cursor" in page.headers
+    assert [item["name"] for item in found.json()] == ["Аптека", "Аптечный пункт"]
+    assert len(nearby.json()) == 3
+
+
+def test_activity_tree_through_async_session(async_client):
+    root = async_client.post("/activities/", json={"name": "Еда"}).json()
+    child = async_client.post(
+        "/activities/", json={"name": "Молоко", "parent_id": root["id"]}
+    ).json()
+
+    subtree = async_client.get(f"/activities/{root['id']}/subtree")
+
+    assert child["level"] == 2
+    assert [item["name"] for item in subtree.json()] == ["Еда", "Молоко"]
+
+
+def test_async_repository_exposes_only_public_methods(db):
+    repository = AsyncOrganizationRepository(db)
+
+    with pytest.raises(AttributeError):
+        repository._load
+    with pytest.raises(AttributeError):
+        repository.row_schema_name
+    assert repository.get_multi.__name__ == "get_multi"
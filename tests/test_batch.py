@@ -0,0 +1,78 @@
+import pytest
+
+from config import settings
+from tests.utils import (
+    create_test_activity,
+    create_test_building,
+    create_test_organization,
+)
+
+
+def test_organizations_come_back_in_request_order(client, db):
+    first = create_test_organization(db, name="Первая")
+    second = create_test_organization(db, name="Вторая")
+    missing = second.id + 100
+
+    response = client.post(
+        "/organizations/batch", json={"ids": [second.id, missing, first.id]}
+    )
+
+    assert response.status_code == 200
+    items = response.json()
+    assert [item["id"] for item in items] == [second.id, missing, first.id]
+    assert [item["found"] for item in items] == [True, False, True]
+    assert items[0]["item"]["name"] == "Вторая"
+    assert items[1]["item"] is None
+    assert items[2]["item"]["name"] == "Первая"
+
+
+def test_repeated_ids_are_answered_each_time(client, db):
+    building = create_test_building(db, address="ул. Ленина, 1")
+
+    response = client.post("/buildings/batch", json={"ids": [building.id, building.id]})
+
+    assert response.status_code == 200
+    assert [item["item"]["address"] for item in response.json()] == [
+        "ул. Ленина, 1",
+        "ул. Ленина, 1",
+    ]
+
+
+def test_stats_report_missing_ids(client, db):
+    activity = create_test_activity(db, name="Еда")
+
+    response = client.post("/activities/stats", json={"ids": [0, activity.id]})
+
+    assert response.status_code == 200
+    items = response.json()
+    assert [(item["id"], item["found"]) for item in items] == [
+        (0, False),
+        (activity.id, True),
+    ]
+    assert items[0]["item"] is None
+
+
+@pytest.mark.parametrize(
+    "url", ["/organizations/batch", "/buildings/batch", "/activities/stats"]
+)
+def test_too_many_ids_are_rejected(client, monkeypatch, url):
+    monkeypatch.setattr(settings, "BATCH_MAX_IDS", 3)
+
+    response = client.post(url, json={"ids": [1, 2, 3, 4]})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Не больше 3 id за запрос"
+
+
+def test_limit_itself_is_accepted(client, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_MAX_IDS", 3)
+
+    response = client.post("/organizations/batch", json={"ids": [1, 2, 3]})
+
+    assert response.status_code == 200
+    assert [item["found"] for item in response.json()] == [False] * 3
+
+
+def test_empty_ids_are_rejected(client):
+    response = client.post("/organizations/batch", json={"ids": []})
+    assert response.status_code == 422
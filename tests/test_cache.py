@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from typing import List
+
+from starlette.requests import Request
+
+from api.cache import MemoryCache, ResponseCache
+from tests.utils import create_test_building
+
+
+def _import_organizations(client, *rows):
+    body = "\n".join(json.dumps(row) for row in rows)
+    response = client.post(
+        "/organizations/import",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_import_invalidates_activity_and_its_ancestors(client, db):
+    building = create_test_building(db)
+    parent = client.post("/activities/", json={"name": "Еда"}).json()
+    child = client.post(
+        "/activities/", json={"name": "Молочная продукция", "parent_id": parent["id"]}
+    ).json()
+    by_parent = f"/organizations/by_activity/{parent['id']}?include_children=true"
+    by_child = f"/organizations/by_activity/{child['id']}"
+    by_name = "/organizations/search_by_activity/?activity_name=Еда"
+
+    # Пустые ответы попадают в кэш без тегов организаций
+    for url in (by_parent, by_child, by_name):
+        assert client.get(url).json() == []
+
+    _import_organizations(
+        client,
+        {
+            "name": "Молочный двор",
+            "building_id": building.id,
+            "activity_ids": [child["id"]],
+        },
+    )
+
+    for url in (by_parent, by_child, by_name):
+        assert [item["name"] for item in client.get(url).json()] == ["Молочный двор"]
+
+
+def _conditional_get(client, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    repeated = client.get(url, headers={"If-None-Match": etag})
+    assert repeated.status_code == 304
+    assert repeated.headers["ETag"] == etag
+    assert repeated.content == b""
+    return first
+
+
+def test_repeated_get_returns_not_modified(client, db):
+    building = create_test_building(db)
+    organization = client.post(
+        "/organizations/", json={"name": "Рога и копыта", "building_id": building.id}
+    ).json()
+
+    for url in (f"/organizations/{organization['id']}", "/organizations/"):
+        _conditional_get(client, url)
+
+
+def test_update_changes_etag_and_body(client, db):
+    building = create_test_building(db)
+    organization = client.post(
+        "/organizations/", json={"name": "Рога и копыта", "building_id": building.id}
+    ).json()
+    urls = [
+        f"/organizations/{organization['id']}",
+        "/organizations/",
+        f"/organizations/by_building/{building.id}",
+    ]
+    before = {url: _conditional_get(client, url) for url in urls}
+
+    client.put(f"/organizations/{organization['id']}", json={"name": "Копыта и рога"})
+
+    for url in urls:
+        etag = before[url].headers["ETag"]
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert "Копыта и рога" in response.text
+
+
+def test_delete_changes_etag_and_body(client, db):
+    building = create_test_building(db)
+    kept, deleted = (
+        client.post(
+            "/organizations/", json={"name": name, "building_id": building.id}
+        ).json()["id"]
+        for name in ("Остаётся", "Удаляется")
+    )
+    urls = ["/organizations/", f"/organizations/by_building/{building.id}"]
+    before = {url: _conditional_get(client, url) for url in urls}
+    _conditional_get(client, f"/organizations/{deleted}")
+
+    client.delete(f"/organizations/{deleted}")
+
+    for url in urls:
+        etag = before[url].headers["ETag"]
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert [item["id"] for item in response.json()] == [kept]
+    assert client.get(f"/organizations/{deleted}").status_code == 404
+
+
+def test_fills_right_after_write_are_not_stored_with_replicas(monkeypatch):
+    cache = ResponseCache(MemoryCache(), replica_lag=5)
+    request = Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/items",
+            "query_string": b"",
+            "headers": [],
+        }
+    )
+    replica_rows = [{"id": 1, "name": "до изменения"}]
+
+    async def fill():
+        return await cache.respond(
+            request, List[dict], lambda response: replica_rows, lambda _: ()
+        )
+
+    cache.invalidate("items")
+    # Реплика отстаёт: ответ отдаётся, но в кэш не попадает
+    asyncio.run(fill())
+    assert cache.backend.get(cache.key(request)) is None
+
+    monkeypatch.setattr(cache, "_invalidated_at", time.monotonic() - 5)
+    asyncio.run(fill())
+    assert cache.backend.get(cache.key(request)) is not None
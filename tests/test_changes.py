@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from database import changes, models
+from tests.utils import create_test_building
+
+
+def _feed(client, since, limit=100):
+    response = client.get(f"/changes?since={since}&limit={limit}")
+    assert response.status_code == 200
+    return response.json()
+
+
+def _entries(feed):
+    return [
+        (change["entity"], change["entity_id"], change["operation"])
+        for change in feed["changes"]
+    ]
+
+
+def _write_history(client, db):
+    building = create_test_building(db).id
+    activity = client.post("/activities/", json={"name": "Еда"}).json()["id"]
+    first = client.post(
+        "/organizations/", json={"name": "Первая", "building_id": building}
+    ).json()["id"]
+    second = client.post(
+        "/organizations/", json={"name": "Вторая", "building_id": building}
+    ).json()["id"]
+    client.put(f"/organizations/{first}", json={"name": "Первая, ООО"})
+    client.delete(f"/organizations/{second}")
+    return activity, first, second
+
+
+def test_changes_are_read_in_seq_order(client, db):
+    activity, first, second = _write_history(client, db)
+
+    feed = _feed(client, 0)
+    assert _entries(feed) == [
+        ("activity", activity, "create"),
+        ("organization", first, "create"),
+        ("organization", second, "create"),
+        ("organization", first, "update"),
+        ("organization", second, "delete"),
+    ]
+    seqs = [change["seq"] for change in feed["changes"]]
+    assert seqs == sorted(set(seqs))
+    assert feed["next_since"] == seqs[-1]
+    assert feed["has_more"] is False
+
+    # Постранично - те же записи без пропусков и повторов
+    page = _feed(client, 0, limit=2)
+    assert page["has_more"] is True
+    rest = _feed(client, page["next_since"])
+    assert _entries(page) + _entries(rest) == _entries(feed)
+    assert client.get("/changes/head").json() == {"seq": seqs[-1], "horizon": 0}
+
+
+def test_compaction_removes_superseded_entries(client, db, engine):
+    activity, first, second = _write_history(client, db)
+
+    with engine.begin() as connection:
+        result = changes.compact(connection, retention_days=7)
+
+    assert result == changes.Compaction(superseded=2, expired=0, horizon=0)
+    assert _entries(_feed(client, 0)) == [
+        ("activity", activity, "create"),
+        ("organization", first, "update"),
+        ("organization", second, "delete"),
+    ]
+
+
+def test_expired_entries_move_horizon(client, db, engine):
+    activity, first, second = _write_history(client, db)
+    seqs = [change["seq"] for change in _feed(client, 0)["changes"]]
+    old = datetime.now(timezone.utc) - timedelta(days=30)
+    db.execute(
+        update(models.ChangeLog)
+        .where(models.ChangeLog.seq <= seqs[3])
+        .values(changed_at=old)
+    )
+    db.commit()
+
+    with engine.begin() as connection:
+        result = changes.compact(connection, retention_days=7)
+
+    # Вытеснены записи о создании организаций, устарели - о виде
+    # деятельности и изменении первой; горизонт - последний устаревший seq
+    assert result == changes.Compaction(superseded=2, expired=2, horizon=seqs[3])
+    assert client.get("/changes/head").json() == {
+        "seq": seqs[-1],
+        "horizon": seqs[3],
+    }
+    assert _entries(_feed(client, seqs[3])) == [("organization", second, "delete")]
+
+    response = client.get(f"/changes?since={seqs[3] - 1}")
+    assert response.status_code == 410
+
+
+def test_head_after_full_compaction_is_horizon(client, db, engine):
+    _write_history(client, db)
+    last = _feed(client, 0)["changes"][-1]["seq"]
+
+    with engine.begin() as connection:
+        changes.compact(
+            connection,
+            retention_days=7,
+            now=datetime.now(timezone.utc) + timedelta(days=8),
+        )
+
+    assert client.get("/changes/head").json() == {"seq": last, "horizon": last}
+    assert _feed(client, last)["changes"] == []
+    assert client.get("/changes?since=0").status_code == 410
@@ -0,0 +1,141 @@
+from sqlalchemy import delete, insert, select
+
+from api.repositories.crud_resquests import ActivityRepository, OrganizationRepository
+from database import counters, models, schemas
+from tests.utils import create_test_building
+
+
+def _building_counts(db):
+    stats = models.BuildingStats
+    return dict(db.execute(select(stats.building_id, stats.organizations)).all())
+
+
+def _activity_counts(db):
+    stats = models.ActivityStats
+    return {
+        id: (direct, subtree)
+        for id, direct, subtree in db.execute(
+            select(stats.activity_id, stats.organizations, stats.subtree_organizations)
+        )
+    }
+
+
+def _nonzero(counts):
+    return {id: value for id, value in counts.items() if value not in (0, (0, 0))}
+
+
+def _tree(db):
+    # Еда -> Мясная продукция, Еда -> Молочная продукция
+    activities = ActivityRepository(db)
+    food = activities.create(schemas.ActivityCreate(name="Еда"))
+    meat = activities.create(
+        schemas.ActivityCreate(name="Мясная продукция", parent_id=food.id)
+    )
+    dairy = activities.create(
+        schemas.ActivityCreate(name="Молочная продукция", parent_id=food.id)
+    )
+    return food.id, meat.id, dairy.id
+
+
+def _import(db, building_id, *activity_sets):
+    return OrganizationRepository(db).create_many(
+        rows=[
+            schemas.OrganizationImport(
+                name=f"Организация {number}",
+                building_id=building_id,
+                activity_ids=activity_ids,
+            )
+            for number, activity_ids in enumerate(activity_sets)
+        ]
+    )
+
+
+def test_building_counters_follow_create_update_and_delete(db):
+    first = create_test_building(db).id
+    second = create_test_building(db).id
+    organizations = OrganizationRepository(db)
+
+    created = organizations.create(
+        schemas.OrganizationCreate(name="Рога и копыта", building_id=first)
+    )
+    organizations.create(schemas.OrganizationCreate(name="Другая", building_id=first))
+    assert _nonzero(_building_counts(db)) == {first: 2}
+
+    organizations.update(created.id, schemas.OrganizationUpdate(name="Переименована"))
+    assert _nonzero(_building_counts(db)) == {first: 2}
+
+    organizations.update(created.id, schemas.OrganizationUpdate(building_id=second))
+    assert _nonzero(_building_counts(db)) == {first: 1, second: 1}
+
+    organizations.delete(created.id)
+    assert _nonzero(_building_counts(db)) == {first: 1}
+    assert counters.reconcile(db.connection(), fix=False) == []
+
+
+def test_import_counts_direct_links_and_subtrees(db):
+    building = create_test_building(db).id
+    food, meat, dairy = _tree(db)
+
+    # Организация с двумя видами одного поддерева считается в нём один раз
+    _import(db, building, [meat], [meat, dairy], [food], [])
+
+    assert _building_counts(db) == {building: 4}
+    assert _nonzero(_activity_counts(db)) == {
+        food: (1, 3),
+        meat: (2, 2),
+        dairy: (1, 1),
+    }
+    assert counters.reconcile(db.connection(), fix=False) == []
+
+
+def test_delete_subtracts_from_activity_and_its_ancestors(db):
+    building = create_test_building(db).id
+    food, meat, dairy = _tree(db)
+    both, only_meat = _import(db, building, [meat, dairy], [meat])
+
+    OrganizationRepository(db).delete(both)
+    assert _nonzero(_activity_counts(db)) == {food: (0, 1), meat: (1, 1)}
+
+    OrganizationRepository(db).delete(only_meat)
+    assert _nonzero(_activity_counts(db)) == {}
+    assert _nonzero(_building_counts(db)) == {}
+
+
+def test_activity_deltas_count_subtree_once(db):
+    food, meat, dairy = _tree(db)
+
+    deltas = counters.activity_deltas(
+        db,
+        [
+            ((), (meat, dairy)),  # новая организация с двумя видами
+            ((meat,), (dairy,)),  # перенос внутри поддерева Еды
+            ((dairy,), (dairy,)),  # без изменений
+            ((food,), ()),
+        ],
+    )
+
+    # Еда: -1 напрямую; в поддереве +1 от первой и -1 от четвёртой
+    assert dict(deltas) == {food: [-1, 0], meat: [0, 0], dairy: [2, 2]}
+
+
+def test_reconcile_fixes_drift(db):
+    building = create_test_building(db).id
+    food, meat, _ = _tree(db)
+    _import(db, building, [meat], [meat])
+    db.execute(
+        insert(models.organization_activity_association).values(
+            organization_id=_import(db, building, [])[0], activity_id=food
+        )
+    )
+    db.execute(delete(models.BuildingStats))
+    db.commit()
+
+    drift = counters.reconcile(db.connection())
+    db.commit()
+
+    assert {(item.table, item.id, item.stored, item.actual) for item in drift} == {
+        ("building_stats", building, (0,), (3,)),
+        ("activity_stats", food, (0, 2), (1, 3)),
+    }
+    assert _building_counts(db) == {building: 3}
+    assert counters.reconcile(db.connection(), fix=False) == []
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+
+from config import settings
+from database import models
+from tests.utils import (
+    create_test_activity,
+    create_test_building,
+    create_test_organizations,
+)
+
+
+def _csv(response):
+    return list(csv.reader(io.StringIO(response.text)))
+
+
+def test_ndjson_export_matches_api_items(client, db, monkeypatch):
+    # Пачки меньше числа организаций: выгрузка склеивает несколько пачек
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    create_test_organizations(db, count=5)
+
+    response = client.get("/organizations/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="export.ndjson"' in response.headers["content-disposition"]
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert exported == client.get("/organizations/").json()
+
+
+def test_csv_export_flattens_relations(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    create_test_organizations(db, count=3, phones_per_organization=2)
+    activity_id = db.query(models.Activity.id).scalar()
+
+    rows = _csv(client.get("/organizations/export?format=csv"))
+
+    assert rows[0] == [
+        "id",
+        "name",
+        "building_id",
+        "address",
+        "latitude",
+        "longitude",
+        "phone_numbers",
+        "activity_ids",
+    ]
+    assert [row[1] for row in rows[1:]] == [f"Test Organization {i}" for i in range(3)]
+    assert rows[1][3:] == [
+        "Test Building Address",
+        "0.0",
+        "0.0",
+        "0-0;0-1",
+        str(activity_id),
+    ]
+
+
+def test_csv_export_can_be_imported_back(client, db):
+    create_test_organizations(db, count=3)
+    exported = client.get("/organizations/export?format=csv").text
+
+    response = client.post(
+        "/organizations/import?format=csv",
+        content=exported.encode(),
+        headers={"Content-Type": "text/csv"},
+    )
+
+    assert response.status_code == 200
+    names = [organization.name for organization in db.query(models.Organization)]
+    assert sorted(names) == sorted([f"Test Organization {i}" for i in range(3)] * 2)
+
+
+def test_empty_csv_export_has_header_only(client):
+    rows = _csv(client.get("/buildings/export?format=csv"))
+
+    assert rows == [["id", "address", "latitude", "longitude"]]
+
+
+def test_building_and_activity_exports(client, db):
+    building = create_test_building(db, address="ул. Мира, 5", latitude=55.7)
+    activity = create_test_activity(db, name="Еда")
+
+    buildings = _csv(client.get("/buildings/export?format=csv"))
+    activities = client.get("/activities/export").text.splitlines()
+
+    assert buildings[1] == [str(building.id), "ул. Мира, 5", "55.7", "0.0"]
+    assert json.loads(activities[0])["name"] == activity.name
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.get("/organizations/export?format=xml").status_code == 422
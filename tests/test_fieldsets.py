@@ -0,0 +1,62 @@
+import pytest
+from fastapi import HTTPException
+
+from api.fieldsets import select_fields
+from database import schemas
+from tests.utils import create_test_organization
+
+
+def test_without_parameters_returns_full_schema():
+    assert select_fields(schemas.Organization, None, None) is schemas.Organization
+
+
+def test_id_is_always_present():
+    schema = select_fields(schemas.Organization, "name", None)
+
+    assert list(schema.model_fields) == ["name", "id"]
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        select_fields(schemas.Organization, "name,secret", "nothing")
+
+    assert error.value.status_code == 400
+    assert error.value.detail == "Неизвестные поля: nothing, secret"
+
+
+def test_include_accepts_only_relations():
+    with pytest.raises(HTTPException) as error:
+        select_fields(schemas.Organization, None, "name")
+
+    assert error.value.status_code == 400
+    assert error.value.detail.startswith("include принимает только связи")
+
+
+def test_include_alone_adds_relation_to_scalar_fields():
+    schema = select_fields(schemas.Organization, None, "building")
+
+    assert set(schema.model_fields) == {"id", "name", "building_id", "building"}
+
+
+def test_fields_and_include_are_combined():
+    schema = select_fields(schemas.Organization, "name", "phone_numbers")
+
+    assert set(schema.model_fields) == {"id", "name", "phone_numbers"}
+
+
+def test_response_contains_only_requested_fields(client, db):
+    organization = create_test_organization(db, name="Рога и копыта")
+
+    response = client.get(
+        f"/organizations/{organization.id}?fields=name&include=building"
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"id", "name", "building"}
+    assert body["building"]["id"] == organization.building_id
+
+
+def test_bad_fields_return_400(client):
+    assert client.get("/organizations/?fields=secret").status_code == 400
+    assert client.get("/organizations/?include=name").status_code == 400
@@ -0,0 +1,140 @@
+import pytest
+from sqlalchemy import column
+from sqlalchemy.dialects import postgresql
+
+from api.repositories.crud_resquests import BuildingRepository, OrganizationRepository
+from database import geo, schemas
+from tests.utils import create_test_building
+
+
+def test_bounding_box_wraps_across_antimeridian():
+    min_lat, min_lon, max_lat, max_lon = geo.bounding_box(0.0, 179.9, 50)
+
+    assert min_lon == pytest.approx(179.45, abs=0.01)
+    assert max_lon == pytest.approx(-179.65, abs=0.01)
+    assert geo.split_box(min_lat, min_lon, max_lat, max_lon) == [
+        (min_lat, min_lon, max_lat, 180.0),
+        (min_lat, -180.0, max_lat, max_lon),
+    ]
+
+
+def test_bounding_box_covers_all_longitudes_for_wide_circle():
+    _, min_lon, _, max_lon = geo.bounding_box(60.0, 0.0, 15000)
+    assert (min_lon, max_lon) == (-180.0, 180.0)
+
+
+def test_bbox_clause_across_antimeridian_uses_two_envelopes():
+    clause = geo.bbox_clause(column("location"), -1, 179, 1, -179)
+    sql = str(
+        clause.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+    assert sql.count("&&") == 2
+    assert "ST_MakeEnvelope(179, -1, 180.0, 1, 4326)" in sql
+    assert "ST_MakeEnvelope(-180.0, -1, -179, 1, 4326)" in sql
+
+
+def test_grid_index_across_antimeridian():
+    index = geo.GridIndex()
+    index.load([(1, 0.0, 179.95), (2, 0.0, -179.95), (3, 0.0, 0.0)])
+
+    assert [id for id, _ in index.nearby(0.0, -179.99, 20)] == [2, 1]
+    assert sorted(index.in_bbox(-1, 179, 1, -179)) == [1, 2]
+    assert index.in_bbox(-1, -179, 1, 179) == [3]
+
+
+def test_nearby_buildings_across_antimeridian(client, db):
+    east = create_test_building(db, address="Фиджи", latitude=-16.5, longitude=179.9)
+    west = create_test_building(db, address="Тавеуни", latitude=-16.5, longitude=-179.9)
+
+    response = client.get(
+        "/buildings/nearby?latitude=-16.5&longitude=179.95&radius_km=30"
+    )
+    assert sorted(item["id"] for item in response.json()) == [east.id, west.id]
+
+    response = client.get(
+        "/buildings/nearby?min_latitude=-17&min_longitude=179.5"
+        "&max_latitude=-16&max_longitude=-179.5"
+    )
+    assert sorted(item["id"] for item in response.json()) == [east.id, west.id]
+
+
+@pytest.mark.parametrize(
+    "latitude, longitude, precision, expected",
+    [
+        (57.64911, 10.40744, 11, "u4pruydqqvj"),
+        (42.6, -5.6, 5, "ezs42"),
+        (-25.382708, -49.265506, 8, "6gkzwgjz"),
+        (0.0, 0.0, 1, "s"),
+        (-90.0, -180.0, 3, "000"),
+    ],
+)
+def test_geohash_known_values(latitude, longitude, precision, expected):
+    assert geo.geohash(latitude, longitude, precision) == expected
+
+
+def test_geohash_prefix_is_coarser_cell():
+    code = geo.geohash(55.7558, 37.6173)
+    assert len(code) == geo.GEOHASH_PRECISION
+    assert geo.geohash(55.7558, 37.6173, 6) == code[:6]
+
+
+def test_zoom_precision_fits_four_cells_in_tile():
+    assert geo.zoom_precision(0) == 1
+    assert geo.zoom_precision(10) == 5
+    assert geo.zoom_precision(30) == geo.GEOHASH_PRECISION
+    for zoom in range(0, 23):
+        precision = geo.zoom_precision(zoom)
+        tile = 360.0 / 2**zoom
+        if precision < geo.GEOHASH_PRECISION:
+            assert geo.geohash_cell(precision)[1] <= tile / 4
+        if precision > 1:
+            assert geo.geohash_cell(precision - 1)[1] > tile / 4
+
+
+def _buildings(db, *points):
+    repository = BuildingRepository(db)
+    return [
+        repository.create(
+            schemas.BuildingCreate(
+                address=f"Здание {number}", latitude=latitude, longitude=longitude
+            )
+        ).id
+        for number, (latitude, longitude) in enumerate(points)
+    ]
+
+
+def test_get_clusters_groups_by_geohash_prefix(db):
+    near, also_near, far = _buildings(
+        db, (55.751, 37.611), (55.752, 37.612), (59.93, 30.31)
+    )
+    organizations = OrganizationRepository(db)
+    for name in ("Первая", "Вторая"):
+        organizations.create(schemas.OrganizationCreate(name=name, building_id=near))
+
+    clusters = BuildingRepository(db).get_clusters(4, 50.0, 25.0, 65.0, 45.0)
+
+    by_cell = {cluster.geohash: cluster for cluster in clusters}
+    moscow = by_cell[geo.geohash(55.751, 37.611, 4)]
+    assert (moscow.buildings, moscow.organizations, moscow.building_id) == (2, 2, None)
+    assert moscow.latitude == pytest.approx(55.7515)
+    petersburg = by_cell[geo.geohash(59.93, 30.31, 4)]
+    assert (petersburg.buildings, petersburg.building_id) == (1, far)
+    assert [cluster.geohash for cluster in clusters] == sorted(by_cell)
+    assert BuildingRepository(db).get_clusters(4, 0.0, 0.0, 10.0, 10.0) == []
+
+
+def test_clusters_across_antimeridian(client, db):
+    east, west = _buildings(db, (-16.5, 179.9), (-16.5, -179.9))
+
+    response = client.get("/buildings/clusters?bbox=179.5,-17,-179.5,-16&zoom=8")
+
+    assert response.status_code == 200
+    assert sorted(cluster["building_id"] for cluster in response.json()) == sorted(
+        [east, west]
+    )
+    assert (
+        client.get("/buildings/clusters?bbox=179.5,-16,-179.5,-17&zoom=8").status_code
+        == 400
+    )
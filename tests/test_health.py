@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from api import startup
+from api.routers import monitoring
+from config import settings
+
+
+@pytest.fixture
+def state(monkeypatch):
+    state = startup.StartupState()
+    monkeypatch.setattr(startup, "state", state)
+    return state
+
+
+@pytest.fixture
+def health_client(state):
+    app = FastAPI()
+    app.include_router(monitoring.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def _ping(error=None, delay=0.0):
+    async def ping():
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+
+    return ping
+
+
+def test_live_does_not_touch_database(health_client, monkeypatch):
+    monkeypatch.setattr(startup, "ping", _ping(OSError("нет сети")))
+
+    response = health_client.get("/health/live")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+
+def test_ready_waits_for_warm_up(health_client, state, monkeypatch):
+    monkeypatch.setattr(startup, "ping", _ping())
+    state.error = "connection refused"
+
+    response = health_client.get("/health/ready")
+
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+    assert response.json()["error"] == "connection refused"
+
+
+def test_ready_after_warm_up(health_client, state, monkeypatch):
+    monkeypatch.setattr(startup, "ping", _ping())
+    state.ready = True
+
+    response = health_client.get("/health/ready")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+@pytest.mark.parametrize(
+    "ping, error",
+    [
+        (_ping(OperationalError("SELECT 1", {}, Exception("gone"))), "gone"),
+        (_ping(delay=1.0), "TimeoutError"),
+    ],
+)
+def test_ready_reports_unavailable_database(
+    health_client, state, monkeypatch, ping, error
+):
+    monkeypatch.setattr(monitoring, "READY_CHECK_TIMEOUT", 0.05)
+    monkeypatch.setattr(startup, "ping", ping)
+    state.ready = True
+
+    response = health_client.get("/health/ready")
+
+    assert response.status_code == 503
+    assert response.json()["status"] == "unavailable"
+    assert error in response.json()["error"]
+
+
+def test_warm_up_retries_until_database_answers(state, monkeypatch):
+    failures = [OperationalError("SELECT 1", {}, Exception("starting up"))]
+
+    def warm_sync():
+        if failures:
+            raise failures.pop()
+
+    monkeypatch.setattr(startup, "_warm_sync", warm_sync)
+    monkeypatch.setattr(settings, "DATABASE_ASYNC", False)
+    monkeypatch.setattr(settings, "STARTUP_RETRY_INTERVAL", 0)
+
+    asyncio.run(startup.warm_up())
+
+    assert state.ready is True
+    assert state.attempts == 2
+    assert state.error is None
+    assert "warmup_s" in state.timings
@@ -0,0 +1,34 @@
+from sqlalchemy.exc import OperationalError
+
+from api.repositories.crud_resquests import ActivityRepository
+from database import models, schemas
+
+
+def test_activity_batch_error_reports_every_row(db, monkeypatch):
+    repository = ActivityRepository(db)
+    add = repository._add
+    calls = []
+
+    def failing_add(name, parent):
+        calls.append(name)
+        if len(calls) == 2:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        return add(name, parent)
+
+    monkeypatch.setattr(repository, "_add", failing_add)
+    rows = [
+        schemas.ActivityImport(name="Первый"),
+        schemas.ActivityImport(name="Сирота", parent_key="нет такого"),
+        schemas.ActivityImport(name="Второй"),
+        schemas.ActivityImport(name="Третий"),
+    ]
+
+    results = repository.create_many(rows=rows, keys={})
+
+    assert results == [
+        "Ошибка записи пачки: OperationalError",
+        "Родитель с key=нет такого не найден выше в файле",
+        "Ошибка записи пачки: OperationalError",
+        "Ошибка записи пачки: OperationalError",
+    ]
+    assert db.query(models.Activity).count() == 0
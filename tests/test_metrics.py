@@ -0,0 +1,118 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import metrics
+from api.metrics import LabeledHistogram
+from api.routers import monitoring, organizations
+from api.security.keys import key_store
+from config import settings
+from database.connection import get_db, get_read_db
+from tests.utils import create_test_organization
+
+ORGANIZATION_ROUTE = "/organizations/{organization_id}"
+
+
+@pytest.fixture
+def metrics_client(engine, session_factory):
+    app = FastAPI()
+    app.include_router(organizations.router)
+    app.include_router(monitoring.router)
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument(engine)
+
+    def get_test_db():
+        with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_read_db] = get_test_db
+    key_store.session_factory = session_factory
+    key_store.invalidate()
+    with TestClient(app, headers={"X-API-Key": settings.API_KEY}) as client:
+        yield client
+
+
+def _value(client, series: str) -> float:
+    # Гистограммы общие на процесс: тесты сравнивают значения до и после
+    for line in client.get("/metrics").text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_requests_are_counted_by_route_template(metrics_client, db):
+    organization = create_test_organization(db)
+    series = (
+        "http_request_duration_seconds_count"
+        f'{{method="GET",route="{ORGANIZATION_ROUTE}",status="200"}}'
+    )
+    missing = (
+        "http_request_duration_seconds_count"
+        f'{{method="GET",route="{ORGANIZATION_ROUTE}",status="404"}}'
+    )
+    before, before_missing = _value(metrics_client, series), _value(
+        metrics_client, missing
+    )
+
+    metrics_client.get(f"/organizations/{organization.id}")
+    metrics_client.get(f"/organizations/{organization.id}")
+    metrics_client.get(f"/organizations/{organization.id + 1}")
+
+    assert _value(metrics_client, series) == before + 2
+    assert _value(metrics_client, missing) == before_missing + 1
+
+
+def test_unknown_paths_share_one_label(metrics_client):
+    series = (
+        "http_request_duration_seconds_count"
+        f'{{method="GET",route="{metrics.UNMATCHED_ROUTE}",status="404"}}'
+    )
+    before = _value(metrics_client, series)
+
+    metrics_client.get("/no/such/path/1")
+    metrics_client.get("/no/such/path/2")
+
+    assert _value(metrics_client, series) == before + 2
+
+
+def test_sql_statements_are_attributed_to_request(metrics_client, db):
+    organization = create_test_organization(db)
+    labels = f'{{method="GET",route="{ORGANIZATION_ROUTE}"}}'
+    count = _value(metrics_client, f"http_request_sql_statements_count{labels}")
+    statements = _value(metrics_client, f"http_request_sql_statements_sum{labels}")
+
+    metrics_client.get(f"/organizations/{organization.id}")
+
+    assert _value(metrics_client, f"http_request_sql_statements_count{labels}") == (
+        count + 1
+    )
+    assert _value(metrics_client, f"http_request_sql_statements_sum{labels}") > (
+        statements
+    )
+
+
+def test_metrics_are_prometheus_text_without_api_key(metrics_client):
+    response = metrics_client.get("/metrics", headers={"X-API-Key": ""})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert "# TYPE db_pool_checkouts_total counter" in response.text
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = LabeledHistogram("test_seconds", "Тест", ("route",), (0.1, 1.0))
+    histogram.observe(('/a"b',), 0.05)
+    histogram.observe(('/a"b',), 0.5)
+    histogram.observe(('/a"b',), 5.0)
+
+    assert histogram.render() == [
+        "# HELP test_seconds Тест",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'test_seconds_bucket{route="/a\\"b",le="1.0"} 2',
+        'test_seconds_bucket{route="/a\\"b",le="+Inf"} 3',
+        'test_seconds_sum{route="/a\\"b"} 5.55',
+        'test_seconds_count{route="/a\\"b"} 3',
+    ]
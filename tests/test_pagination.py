@@ -0,0 +1,63 @@
+import pytest
+
+from api.routers.params import NEXT_CURSOR_HEADER, encode_cursor
+from tests.utils import create_test_building, create_test_organization
+
+
+def _pages(client, url, limit):
+    """Проходит список по курсору до конца; возвращает страницы id."""
+    pages, cursor = [], None
+    while True:
+        page_url = f"{url}{'&' if '?' in url else '?'}limit={limit}"
+        if cursor is not None:
+            page_url += f"&after={cursor}"
+        response = client.get(page_url)
+        assert response.status_code == 200
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def same_names(db):
+    building = create_test_building(db)
+    # Одинаковые названия: порядок и курсор держатся только на id
+    return [
+        create_test_organization(db, name="Аптека", building_id=building.id).id
+        for _ in range(7)
+    ], building.id
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/organizations/",
+        "/organizations/search_by_name/?name=Аптека",
+        "/organizations/by_building/{building_id}",
+    ],
+)
+def test_cursor_pages_without_gaps_or_repeats(client, same_names, url):
+    ids, building_id = same_names
+
+    pages = _pages(client, url.format(building_id=building_id), limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [id for page in pages for id in page] == sorted(ids)
+
+
+def test_full_last_page_ends_with_empty_page(client, same_names):
+    ids, _ = same_names
+
+    pages = _pages(client, "/organizations/", limit=7)
+
+    assert pages == [sorted(ids), []]
+
+
+@pytest.mark.parametrize(
+    "cursor", ["не-курсор", "e30", encode_cursor(1)[:-2] + "!!", "eyJpZCI6ImEifQ"]
+)
+def test_malformed_cursor_is_rejected(client, cursor):
+    response = client.get(f"/organizations/?limit=3&after={cursor}")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Некорректный курсор"
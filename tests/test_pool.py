@@ -0,0 +1,57 @@
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from database import pool
+
+CONNECT_SECONDS = 0.2
+
+
+@pytest.fixture
+def metrics():
+    metrics = pool.PoolMetrics("test")
+
+    def slow_connect():
+        time.sleep(CONNECT_SECONDS)
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    options = {"pool_size": 1, "max_overflow": 0, "pool_timeout": 0.1}
+    engine = create_engine(
+        "sqlite://",
+        creator=slow_connect,
+        poolclass=pool.instrumented_pool_class(QueuePool, metrics),
+        **options,
+    )
+    pool.instrument(engine, metrics, options)
+    yield engine, metrics
+    engine.dispose()
+
+
+def test_wait_excludes_opening_connections(metrics):
+    engine, metrics = metrics
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    wait = metrics.wait.snapshot()
+    assert wait["count"] == 2
+    assert wait["sum"] < CONNECT_SECONDS / 2
+    assert metrics.counters["opened"] == 1
+
+
+def test_timeout_counts_full_wait(metrics):
+    engine, metrics = metrics
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    assert metrics.counters["timeouts"] == 1
+    assert metrics.wait.count == 2
+    assert metrics.wait.sum >= 0.1
+    snapshot = metrics.snapshot()
+    assert (snapshot["size"], snapshot["max_overflow"]) == (1, 0)
@@ -0,0 +1,46 @@
+import pytest
+
+from api.repositories import crud_resquests
+from tests.utils import (
+    assert_constant_queries,
+    create_test_activity,
+    create_test_building,
+    create_test_organizations,
+)
+
+ENDPOINTS = [
+    "/organizations/?limit={size}",
+    "/buildings/?limit={size}",
+    "/activities/?limit={size}",
+    "/organizations/by_building/1?limit={size}",
+    "/organizations/by_activity/1?include_children=true&limit={size}",
+    "/organizations/search_by_activity/?activity_name=test&limit={size}",
+    "/organizations/search_by_name/?name=organization&limit={size}",
+    "/organizations/search?activity_id=1&name=organization&limit={size}",
+]
+
+
+@pytest.fixture
+def directory(db):
+    create_test_organizations(db, 60)
+    # Обе страницы каждого списка должны заполниться целиком
+    for number in range(60):
+        create_test_building(db, address=f"Test Building {number}")
+        create_test_activity(db, name=f"Test Activity {number}")
+    # Индексы в памяти строятся при запуске; здесь - до замеров, чтобы их
+    # загрузка не попала в число запросов первой страницы
+    crud_resquests.warm_up(db)
+
+
+@pytest.mark.parametrize("url", ENDPOINTS)
+def test_list_queries_do_not_depend_on_page_size(engine, client, directory, url):
+    # Первый запрос проверяет ключ API и прогревает всё лениво загружаемое
+    assert client.get(url.format(size=2)).status_code == 200
+
+    def call(size: int):
+        response = client.get(url.format(size=size))
+        assert response.status_code == 200
+        assert len(response.json()) == size
+        return response
+
+    assert_constant_queries(engine, call, sizes=(5, 50))
@@ -0,0 +1,85 @@
+from collections import Counter
+
+import pytest
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.pool import StaticPool
+
+from database import models
+from database.replicas import Replica, ReplicaSet, RoutingSession
+
+
+def _engine(name, executed):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    models.Base.metadata.create_all(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, *args):
+        executed[name] += 1
+
+    return engine
+
+
+@pytest.fixture
+def engines():
+    executed = Counter()
+    primary = _engine("primary", executed)
+    replica = _engine("replica", executed)
+    executed.clear()
+    yield primary, replica, executed
+    primary.dispose()
+    replica.dispose()
+
+
+def _session(primary, replica):
+    return RoutingSession(
+        ReplicaSet([Replica("replica", replica, retry_interval=60)]), bind=primary
+    )
+
+
+def test_reads_go_to_replica(engines):
+    primary, replica, executed = engines
+    with _session(primary, replica) as session:
+        session.scalars(select(models.Building)).all()
+        session.scalars(select(models.Organization)).all()
+        assert not session.wrote
+
+    assert executed == {"replica": 2}
+
+
+def test_session_stays_on_primary_after_flush(engines):
+    primary, replica, executed = engines
+    with _session(primary, replica) as session:
+        session.scalars(select(models.Building)).all()
+        session.add(models.Building(address="Ленина, 1", latitude=0, longitude=0))
+        session.flush()
+        executed.clear()
+
+        # Реплика ещё не видит здание: читать после записи - с основной базы
+        assert session.scalars(select(models.Building.address)).all() == ["Ленина, 1"]
+        assert session.wrote
+        assert executed == {"primary": 1}
+
+
+def test_session_stays_on_primary_after_write_statement(engines):
+    primary, replica, executed = engines
+    with _session(primary, replica) as session:
+        session.execute(
+            insert(models.Building).values(address="Ленина, 1", latitude=0, longitude=0)
+        )
+        session.scalars(select(models.Building)).all()
+
+    assert executed == {"primary": 2}
+
+
+def test_reads_fall_back_to_primary_when_replica_is_down(engines):
+    primary, replica, executed = engines
+    replicas = ReplicaSet([Replica("replica", replica, retry_interval=60)])
+    replicas.replicas[0].mark_down(RuntimeError("нет соединения"))
+    with RoutingSession(replicas, bind=primary) as session:
+        session.scalars(select(models.Building)).all()
+
+    assert executed == {"primary": 1}
@@ -0,0 +1,207 @@
+import pytest
+
+from database.search import (
+    FUZZY_THRESHOLD,
+    NgramIndex,
+    PrefixIndex,
+    normalize,
+    word_similarity,
+)
+from tests.utils import create_test_organization
+
+NAMES = {
+    1: "ООО «Рога и Копыта»",
+    2: "Рыбный рынок",
+    3: "ИП Рогов",
+    4: "Молочный двор",
+    5: "Straße Café",
+    6: "Café Straße",
+    7: "Кафе «Рассвет»",
+}
+
+
+def _index(chunk_size=2):
+    index = PrefixIndex()
+    # Маленькие куски: вставки и удаления переходят границы кусков
+    index.CHUNK_SIZE = chunk_size
+    return index
+
+
+def _pairs(index):
+    return [
+        (index._key(chunk, position), chunk[1][position])
+        for chunk in index._chunks
+        for position in range(len(chunk[0]))
+    ]
+
+
+def _assert_consistent(index, names):
+    pairs = _pairs(index)
+    assert [key for key, _ in pairs] == sorted(key for key, _ in pairs)
+    expected = sorted(
+        (normalize(name[offset:]), id, offset)
+        for id, name in names.items()
+        for offset in PrefixIndex._words(name)
+    )
+    assert [(word, id, offset) for (word, id), offset in pairs] == expected
+    assert all(len(ids) for ids, _ in index._chunks)
+
+
+def test_load_keeps_sort_order_when_normalization_changes_lengths():
+    # «e» с акутом сливается в «é», а «ß» становится «ss»: длина названия
+    # после нормализации та же, но смещения слов сдвигаются
+    names = {6: NAMES[6], 8: "e\u0301 ß strasse"}
+    assert len(normalize(names[8])) == len(names[8])
+
+    index = _index()
+    index.load(names.items())
+
+    _assert_consistent(index, names)
+    assert index.suggest("strasse", 10) == [(6, names[6]), (8, names[8])]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1024])
+def test_add_and_remove_match_load(chunk_size):
+    loaded = _index(chunk_size)
+    loaded.load(NAMES.items())
+    built = _index(chunk_size)
+    for id, name in reversed(NAMES.items()):
+        built.add(id, name)
+
+    assert _pairs(built) == _pairs(loaded)
+    _assert_consistent(built, NAMES)
+
+    names = dict(NAMES)
+    for id in (3, 1, 6):
+        built.remove(id)
+        del names[id]
+        _assert_consistent(built, names)
+    built.add(2, "Рыбная лавка")
+    names[2] = "Рыбная лавка"
+    _assert_consistent(built, names)
+    assert len(built) == len(names)
+
+
+def test_remove_deletes_only_its_own_entries():
+    index = _index()
+    # Одинаковые слова у разных id и повтор слова внутри одного названия
+    names = {10: "Рог Рог", 11: "Рог", 12: "Рог Рог"}
+    index.load(names.items())
+
+    index.remove(11)
+    del names[11]
+    _assert_consistent(index, names)
+    index.remove(11)
+    _assert_consistent(index, names)
+    index.remove(10)
+    _assert_consistent(index, {12: names[12]})
+
+
+def test_suggest_finds_any_word_once_in_order():
+    index = _index()
+    index.load(NAMES.items())
+
+    assert index.suggest("рог", 10) == [(1, NAMES[1]), (3, NAMES[3])]
+    # По алфавиту найденных слов: «рассвет», «рога», «рогов», «рыбный»
+    assert index.suggest("Р", 10) == [
+        (7, NAMES[7]),
+        (1, NAMES[1]),
+        (3, NAMES[3]),
+        (2, NAMES[2]),
+    ]
+    assert index.suggest("р", 2) == [(7, NAMES[7]), (1, NAMES[1])]
+    assert index.suggest("caf", 10) == [(5, NAMES[5]), (6, NAMES[6])]
+    assert index.suggest("  ", 10) == []
+    assert index.suggest("нет", 10) == []
+
+
+def _ngram_index(names):
+    index = NgramIndex()
+    index.load(names.items())
+    return index
+
+
+def test_ngram_search_ranks_closer_names_first():
+    index = _ngram_index(
+        {
+            1: "Стоматология «Улыбка» на Ленина",
+            2: "Стоматология",
+            3: "Детская стоматология",
+            4: "Аптека",
+        }
+    )
+
+    assert index.search("СТОМАТОЛОГИЯ") == [2, 3, 1]
+    assert index.search("улыб") == [1]
+    assert index.search("нет такой") == []
+
+
+def test_ngram_search_finds_substrings_only_without_fuzzy():
+    index = _ngram_index({1: "Стоматология", 2: "Стаматология"})
+
+    assert index.search("стоматология") == [1]
+    assert index.search("стоматология", fuzzy=True) == [1, 2]
+
+
+def test_fuzzy_search_tolerates_typos_in_long_words():
+    index = _ngram_index(
+        {
+            1: "Детская стоматология",
+            2: "Стоматолог Иванов",
+            3: "Ветеринарная клиника",
+            4: "Автомойка",
+        }
+    )
+
+    # Замена, пропуск и лишняя буква в середине слова
+    assert index.search("стаматология", fuzzy=True) == [1]
+    assert index.search("ветеринаная", fuzzy=True) == [3]
+    assert index.search("автомоойка", fuzzy=True) == [4]
+    # Вхождение идёт раньше похожего слова с другим окончанием
+    assert index.search("стоматологи", fuzzy=True) == [1, 2]
+    # Опечатка в коротком слове меняет слишком большую его долю
+    assert index.search("аптека", fuzzy=True) == []
+
+
+def test_index_changes_are_searchable():
+    index = _ngram_index({1: "Стоматология"})
+
+    index.add(2, "Стоматология на Ленина")
+    index.add(1, "Аптека")
+    assert index.search("стоматология") == [2]
+    index.remove(2)
+    assert index.search("стоматология", fuzzy=True) == []
+
+
+def test_word_similarity_compares_whole_words():
+    assert word_similarity("стоматология", "Детская стоматология") == 1.0
+    assert word_similarity("стаматология", "стоматология") >= FUZZY_THRESHOLD
+    assert word_similarity("аптика", "аптека") < FUZZY_THRESHOLD
+    assert word_similarity("", "аптека") == 0.0
+
+
+def test_ranked_name_search_puts_exact_matches_before_typos(client, db):
+    typo = create_test_organization(db, name="Стаматология").id
+    longer = create_test_organization(db, name="Стоматология «Улыбка»").id
+    exact = create_test_organization(db, name="Стоматология").id
+    create_test_organization(db, name="Аптека")
+
+    response = client.get(
+        "/organizations/search_by_name/?name=стоматология&sort=relevance"
+    )
+    plain = client.get("/organizations/search_by_name/?name=стоматология")
+
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [exact, longer, typo]
+    assert [item["id"] for item in plain.json()] == [longer, exact]
+
+
+def test_ranked_name_search_respects_limit(client, db):
+    for _ in range(3):
+        create_test_organization(db, name="Стоматология")
+
+    response = client.get(
+        "/organizations/search_by_name/?name=стоматология&sort=relevance&limit=2"
+    )
+
+    assert len(response.json()) == 2
@@ -0,0 +1,143 @@
+import pytest
+
+from database import models
+from tests.utils import create_test_activity, create_test_building
+
+
+@pytest.fixture
+def directory(db):
+    """Еда с дочерним Мясо, три здания к северу от точки (55.75, 37.62)."""
+    food = create_test_activity(db, name="Еда")
+    meat = create_test_activity(db, name="Мясо")
+    meat.parent_id, meat.level = food.id, 2
+    db.add(models.ActivityClosure(ancestor_id=food.id, descendant_id=meat.id, depth=1))
+    near = create_test_building(db, "Близко", latitude=55.751, longitude=37.62)
+    middle = create_test_building(db, "Средне", latitude=55.76, longitude=37.62)
+    far = create_test_building(db, "Далеко", latitude=55.80, longitude=37.62)
+
+    def organization(name, building, *activities):
+        organization = models.Organization(name=name, building_id=building.id)
+        organization.activities.extend(activities)
+        db.add(organization)
+        db.flush()
+        return organization.id
+
+    ids = {
+        "far_meat": organization("Мясная лавка", far, meat),
+        "near_shop": organization("Мясная лавка", near, food),
+        "middle_meat": organization("Мясная лавка", middle, meat),
+        "near_bank": organization("Банк", near),
+    }
+    db.commit()
+    return {"food": food.id, "meat": meat.id, "near": near.id, **ids}
+
+
+def _ids(response):
+    assert response.status_code == 200
+    return [item["id"] for item in response.json()]
+
+
+def test_filters_are_combined(client, directory):
+    response = client.get(
+        "/organizations/search",
+        params={"name": "лавка", "activity_id": directory["meat"], "sort": "id"},
+    )
+
+    assert _ids(response) == sorted([directory["far_meat"], directory["middle_meat"]])
+
+
+def test_activity_filter_includes_children_unless_disabled(client, directory):
+    params = {"activity_id": directory["food"], "sort": "id"}
+
+    with_children = _ids(client.get("/organizations/search", params=params))
+    only_food = _ids(
+        client.get(
+            "/organizations/search", params={**params, "include_children": False}
+        )
+    )
+
+    assert with_children == sorted(
+        [directory["far_meat"], directory["near_shop"], directory["middle_meat"]]
+    )
+    assert only_food == [directory["near_shop"]]
+
+
+def test_radius_and_building_filters(client, directory):
+    point = {"latitude": 55.75, "longitude": 37.62}
+
+    in_radius = client.get(
+        "/organizations/search", params={**point, "radius_km": 2, "name": "лавка"}
+    )
+    in_building = client.get(
+        "/organizations/search",
+        params={"building_id": directory["near"], "activity_name": "Еда"},
+    )
+
+    assert _ids(in_radius) == [directory["near_shop"], directory["middle_meat"]]
+    assert _ids(in_building) == [directory["near_shop"]]
+
+
+def test_distance_sort_puts_nearest_first(client, directory):
+    response = client.get(
+        "/organizations/search",
+        params={"latitude": 55.75, "longitude": 37.62, "name": "лавка"},
+    )
+
+    assert _ids(response) == [
+        directory["near_shop"],
+        directory["middle_meat"],
+        directory["far_meat"],
+    ]
+
+
+def test_name_sort_breaks_ties_by_id(client, directory):
+    response = client.get(
+        "/organizations/search",
+        params={"building_id": directory["near"], "sort": "name"},
+    )
+
+    assert _ids(response) == [directory["near_bank"], directory["near_shop"]]
+
+
+def test_filter_without_matches_returns_nothing(client, directory):
+    response = client.get(
+        "/organizations/search",
+        params={"name": "лавка", "activity_name": "Нет такого вида"},
+    )
+
+    assert _ids(response) == []
+
+
+def test_explain_reports_filters_and_plan(client, directory):
+    response = client.get(
+        "/organizations/search",
+        params={"name": "лавка", "building_id": directory["near"], "explain": True},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["filter"] for item in body["filters"]] == ["building", "name"]
+    assert body["filters"][1] == {"filter": "name", "estimate": 3, "exact": True}
+    assert body["skipped"] is False
+    assert "organizations" in body["sql"]
+    assert body["plan"]
+
+
+def test_explain_marks_empty_search_as_skipped(client, directory):
+    response = client.get(
+        "/organizations/search",
+        params={"activity_name": "Нет такого вида", "explain": True},
+    )
+
+    assert response.json()["skipped"] is True
+    assert response.json()["filters"] == [
+        {"filter": "activity_name", "estimate": 0, "exact": True}
+    ]
+
+
+def test_search_requires_a_filter(client):
+    assert client.get("/organizations/search").status_code == 400
+    assert (
+        client.get("/organizations/search", params={"sort": "distance"}).status_code
+        == 400
+    )
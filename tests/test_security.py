@@ -0,0 +1,49 @@
+from threading import Event
+
+from api.security.keys import Consumer, key_store
+from api.security.limits import limiter_for
+from config import settings
+
+
+def _consumer(**limits):
+    values = {"rate_limit": 10.0, "burst": 10, "max_concurrency": 2, **limits}
+    return Consumer(id=1000, name="partner", **values)
+
+
+def test_limit_change_keeps_in_flight_requests():
+    limiter = limiter_for(_consumer())
+    assert limiter.enter() and limiter.enter()
+
+    raised = limiter_for(_consumer(max_concurrency=3))
+    assert raised is limiter
+    assert raised.enter()
+    assert not raised.enter()
+
+    lowered = limiter_for(_consumer(max_concurrency=1))
+    for _ in range(3):
+        lowered.exit()
+    assert lowered.active == 0
+    assert lowered.enter()
+    assert not lowered.enter()
+    lowered.exit()
+
+
+def test_stale_keys_refresh_in_background(client, monkeypatch):
+    assert client.get("/activities/").status_code == 200
+    started, release = Event(), Event()
+
+    def slow_refresh():
+        started.set()
+        release.wait(5)
+
+    monkeypatch.setattr(key_store, "refresh", slow_refresh)
+    monkeypatch.setattr(
+        key_store, "_loaded_at", key_store._loaded_at - settings.API_KEY_CACHE_TTL
+    )
+    try:
+        # Запрос не ждёт чтения ключей: оно ещё идёт в фоне
+        assert client.get("/activities/").status_code == 200
+        assert started.wait(5)
+        assert not release.is_set()
+    finally:
+        release.set()
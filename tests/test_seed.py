@@ -0,0 +1,64 @@
+import pytest
+
+from database import models, seed
+from tests.utils import create_test_directory
+
+
+def _rows(directory):
+    return (
+        directory.activities,
+        list(directory.closure()),
+        list(directory.buildings()),
+        list(directory.organizations()),
+    )
+
+
+def test_same_spec_produces_same_rows():
+    spec = seed.SeedSpec(organizations=50, buildings=10, seed=7)
+
+    assert _rows(seed.SyntheticDirectory(spec)) == _rows(seed.SyntheticDirectory(spec))
+    other = seed.SyntheticDirectory(seed.SeedSpec(organizations=50, buildings=10))
+    assert _rows(other) != _rows(seed.SyntheticDirectory(spec))
+
+
+def test_offsets_shift_ids_only():
+    spec = seed.SeedSpec(organizations=5, buildings=2)
+    plain = seed.SyntheticDirectory(spec)
+    shifted = seed.SyntheticDirectory(
+        spec, {"activities": 100, "buildings": 10, "organizations": 1000}
+    )
+
+    assert [id for id, *_ in shifted.buildings()] == [11, 12]
+    assert [
+        (id - 1000, name, building_id - 10)
+        for (id, name, building_id), _, _ in shifted.organizations()
+    ] == [organization for organization, _, _ in plain.organizations()]
+
+
+def test_seeded_database_matches_directory(db):
+    directory = create_test_directory(db, organizations=30, buildings=5, seed=3)
+
+    organizations = db.query(models.Organization).order_by(models.Organization.id)
+    assert [
+        (organization.id, organization.name, organization.building_id)
+        for organization in organizations
+    ] == [organization for organization, _, _ in directory.organizations()]
+    assert db.query(models.Activity).count() == len(directory.activities)
+
+
+@pytest.mark.parametrize(
+    "counts",
+    [
+        {"organizations": 0, "buildings": 1},
+        {"organizations": 1, "buildings": 0},
+        {"organizations": 1, "buildings": 1, "activity_levels": 0},
+        {"organizations": 1, "buildings": 1, "phones_per_organization": -1},
+    ],
+)
+def test_spec_rejects_counts_below_one(counts):
+    with pytest.raises(ValueError, match="не меньше 1"):
+        seed.SeedSpec(**counts)
+
+
+def test_spec_accepts_any_seed():
+    assert seed.SeedSpec(organizations=1, buildings=1, seed=0).seed == 0
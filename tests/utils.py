@@ -1,9 +1,19 @@
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
-from database import models
+from database import models, seed
 
 
-def create_test_organization(db: Session, name: str = "Test Organization"):
-    organization = models.Organization(name=name)
+def create_test_organization(
+    db: Session, name: str = "Test Organization", building_id: Optional[int] = None
+):
+    # Организация без здания невалидна: создаём здание, если его не передали
+    if building_id is None:
+        building_id = create_test_building(db).id
+    organization = models.Organization(name=name, building_id=building_id)
     db.add(organization)
     db.commit()
     db.refresh(organization)
@@ -27,6 +37,76 @@ def create_test_building(
 def create_test_activity(db: Session, name: str = "Test Activity"):
     activity = models.Activity(name=name)
     db.add(activity)
+    db.flush()
+    db.add(
+        models.ActivityClosure(
+            ancestor_id=activity.id, descendant_id=activity.id, depth=0
+        )
+    )
     db.commit()
     db.refresh(activity)
     return activity
+
+
+def create_test_organizations(
+    db: Session, count: int, phones_per_organization: int = 2
+):
+    """Организации со зданием, видом деятельности и телефонами - для проверок N+1."""
+    building = create_test_building(db)
+    activity = create_test_activity(db)
+    for i in range(count):
+        organization = models.Organization(
+            name=f"Test Organization {i}", building_id=building.id
+        )
+        organization.activities.append(activity)
+        for j in range(phones_per_organization):
+            organization.phone_numbers.append(models.PhoneNumber(number=f"{i}-{j}"))
+        db.add(organization)
+    db.commit()
+
+
+def create_test_directory(db: Session, organizations: int = 100, **spec):
+    """Связанный синтетический справочник одной загрузкой (см. database/seed.py).
+
+    Остальные параметры - поля seed.SeedSpec, например buildings или seed.
+    """
+    spec.setdefault("buildings", max(organizations // 5, 1))
+    directory = seed.seed(
+        db.connection(), seed.SeedSpec(organizations=organizations, **spec)
+    )
+    db.commit()
+    return directory
+
+
+@contextmanager
+def count_queries(engine: Engine):
+    """Собирает SQL запросы, выполненные через engine внутри блока."""
+    statements: List[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def assert_constant_queries(
+    engine: Engine, call: Callable[[int], object], sizes: Iterable[int] = (1, 10, 50)
+) -> Dict[int, int]:
+    """Проверяет, что call(size) выполняет одно и то же число запросов для любого size.
+
+    Например, для списка организаций:
+    assert_constant_queries(engine, lambda n: client.get(f"/organizations/?limit={n}"))
+    """
+    counts = {}
+    for size in sizes:
+        with count_queries(engine) as statements:
+            call(size)
+        counts[size] = len(statements)
+    assert (
+        len(set(counts.values())) == 1
+    ), f"Число запросов зависит от размера страницы: {counts}"
+    return counts